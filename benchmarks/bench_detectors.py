@@ -0,0 +1,175 @@
+# -*- coding: utf-8 -*-
+"""
+Benchmark: backends de détection de HybridTracker (detectors.py).
+
+Compare par image:
+- latence (ms) de UltralyticsDetector (PyTorch) et OnnxDetector (cv2.dnn)
+- accord des résultats: boîtes appariées par classe (IoU >= --iou),
+  IoU moyen, écart de confiance, et même cible retenue (plus grande boîte
+  de --target) que _detect_with_yolo_sync
+
+Images: --images <dossier|fichier|vidéo>, sinon les images d'exemple
+d'Ultralytics (bus.jpg, zidane.jpg) redimensionnées à la caméra (400x240).
+
+Usage:
+    python benchmarks/bench_detectors.py --model yolo11n.pt [--onnx yolo11n.onnx] [--images dir] [--frames 100]
+"""
+
+import os
+import sys
+import glob
+import time
+import argparse
+
+import numpy as np
+import cv2
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "controllers", "drone_controller"))
+
+from detectors import UltralyticsDetector, OnnxDetector, onnx_path_for, largest_box  # noqa: E402
+
+IMAGE_EXTS = (".jpg", ".jpeg", ".png", ".bmp")
+
+
+def load_frames(source, frames, size):
+    """Liste d'images BGR: dossier, image, vidéo, ou exemples Ultralytics"""
+    images = []
+    if source is None:
+        from ultralytics.utils import ASSETS
+        paths = sorted(str(p) for p in ASSETS.glob("*.jpg"))
+    elif os.path.isdir(source):
+        paths = sorted(p for p in glob.glob(os.path.join(source, "*")) if p.lower().endswith(IMAGE_EXTS))
+    elif source.lower().endswith(IMAGE_EXTS):
+        paths = [source]
+    else:
+        cap = cv2.VideoCapture(source)
+        while len(images) < frames:
+            ok, img = cap.read()
+            if not ok:
+                break
+            images.append(img)
+        cap.release()
+        paths = []
+    for p in paths:
+        img = cv2.imread(p)
+        if img is not None:
+            images.append(img)
+    if not images:
+        raise SystemExit("No images found in {}".format(source))
+    if size:
+        images = [cv2.resize(img, size) for img in images]
+    # Répète la liste jusqu'à `frames` images
+    return [images[i % len(images)] for i in range(frames)]
+
+
+def iou_matrix(a, b):
+    """IoU (len(a), len(b)) entre deux tableaux xyxy"""
+    if not len(a) or not len(b):
+        return np.zeros((len(a), len(b)), dtype=np.float32)
+    x1 = np.maximum(a[:, None, 0], b[None, :, 0])
+    y1 = np.maximum(a[:, None, 1], b[None, :, 1])
+    x2 = np.minimum(a[:, None, 2], b[None, :, 2])
+    y2 = np.minimum(a[:, None, 3], b[None, :, 3])
+    inter = np.clip(x2 - x1, 0, None) * np.clip(y2 - y1, 0, None)
+    area_a = (a[:, 2] - a[:, 0]) * (a[:, 3] - a[:, 1])
+    area_b = (b[:, 2] - b[:, 0]) * (b[:, 3] - b[:, 1])
+    return inter / np.maximum(area_a[:, None] + area_b[None, :] - inter, 1e-9)
+
+
+def match(ref, other, iou_thr):
+    """Appariement glouton par classe -> liste de (i_ref, j_other, iou)"""
+    (ref_xyxy, ref_conf, ref_cls), (xyxy, conf, cls) = ref, other
+    ious = iou_matrix(ref_xyxy, xyxy)
+    ious[ref_cls[:, None] != cls[None, :]] = 0.0
+    pairs = []
+    while ious.size and ious.max() >= iou_thr:
+        i, j = np.unravel_index(ious.argmax(), ious.shape)
+        pairs.append((i, j, float(ious[i, j])))
+        ious[i, :] = 0.0
+        ious[:, j] = 0.0
+    return pairs
+
+
+def target_box(dets, target_id, min_size):
+    """Plus grande boîte de la classe cible (logique de _detect_with_yolo_sync)"""
+    xyxy, _, cls = dets
+    xyxy = xyxy[cls == target_id]
+    best = largest_box(xyxy, min_size)
+    return xyxy[best] if best >= 0 else None
+
+
+def time_backend(detector, frames, conf, warmup):
+    for img in frames[:warmup]:
+        detector.detect(img, conf)
+    latencies, results = [], []
+    for img in frames:
+        t0 = time.perf_counter()
+        results.append(detector.detect(img, conf))
+        latencies.append((time.perf_counter() - t0) * 1e3)
+    return np.asarray(latencies), results
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Latence et accord Ultralytics vs cv2.dnn ONNX")
+    parser.add_argument("--model", default="yolo11n.pt", help="modèle Ultralytics (.pt)")
+    parser.add_argument("--onnx", help="export ONNX (défaut: à côté du .pt, exporté si absent)")
+    parser.add_argument("--images", help="dossier, image ou vidéo (défaut: exemples Ultralytics)")
+    parser.add_argument("--frames", type=int, default=50)
+    parser.add_argument("--warmup", type=int, default=5)
+    parser.add_argument("--size", default="400x240", help="redimensionnement WxH (caméra), '' pour garder")
+    parser.add_argument("--conf", type=float, default=0.25)
+    parser.add_argument("--iou", type=float, default=0.5, help="IoU min pour apparier deux boîtes")
+    parser.add_argument("--target", default="person", help="classe suivie par HybridTracker")
+    parser.add_argument("--min-size", type=int, default=15)
+    args = parser.parse_args(argv)
+
+    from ultralytics import YOLO
+    model = YOLO(args.model)
+    onnx_path = args.onnx or onnx_path_for(args.model)
+    if not os.path.exists(onnx_path):
+        onnx_path = model.export(format="onnx")
+
+    size = tuple(int(v) for v in args.size.lower().split("x")) if args.size else None
+    frames = load_frames(args.images, args.frames, size)
+    backends = [UltralyticsDetector(model), OnnxDetector(onnx_path, model.names)]
+    print("frames={} size={} conf={} onnx={}".format(len(frames), args.size or "native", args.conf, onnx_path))
+
+    runs = {}
+    for detector in backends:
+        latencies, results = time_backend(detector, frames, args.conf, args.warmup)
+        runs[detector.backend] = results
+        print("{:<12} mean {:7.2f} ms  p50 {:7.2f}  p95 {:7.2f}  max {:7.2f}  ({:.1f} FPS)".format(
+            detector.backend, latencies.mean(), np.percentile(latencies, 50), np.percentile(latencies, 95),
+            latencies.max(), 1e3 / latencies.mean()))
+
+    ref_name, other_name = backends[0].backend, backends[1].backend
+    target_id = next((i for i, n in model.names.items() if n == args.target), None)
+    n_ref = n_other = n_matched = 0
+    ious, dconf = [], []
+    same_target = target_frames = 0
+    for ref, other in zip(runs[ref_name], runs[other_name]):
+        pairs = match(ref, other, args.iou)
+        n_ref += len(ref[0])
+        n_other += len(other[0])
+        n_matched += len(pairs)
+        ious.extend(p[2] for p in pairs)
+        dconf.extend(abs(float(ref[1][i]) - float(other[1][j])) for i, j, _ in pairs)
+        if target_id is not None:
+            a, b = target_box(ref, target_id, args.min_size), target_box(other, target_id, args.min_size)
+            if a is not None or b is not None:
+                target_frames += 1
+                if a is not None and b is not None and iou_matrix(a[None], b[None])[0, 0] >= args.iou:
+                    same_target += 1
+
+    print("agreement ({} vs {}):".format(other_name, ref_name))
+    print("  boxes      ref={} other={} matched={} recall={:.3f} precision={:.3f}".format(
+        n_ref, n_other, n_matched, n_matched / max(n_ref, 1), n_matched / max(n_other, 1)))
+    print("  matched    mean IoU={:.3f}  mean |dconf|={:.4f}".format(
+        np.mean(ious) if ious else 0.0, np.mean(dconf) if dconf else 0.0))
+    if target_id is not None:
+        print("  target     '{}' same box on {}/{} frames".format(args.target, same_target, target_frames))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
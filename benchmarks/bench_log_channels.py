@@ -0,0 +1,90 @@
+# -*- coding: utf-8 -*-
+"""
+Microbenchmark: coût par pas de contrôle des canaux haute fréquence
+(imu_data, altitude_control, control_commands, motor_velocities).
+
+Compare:
+- canaux OFF, payloads paresseux (chemin actuel de _control_step)
+- canaux OFF, dicts construits à chaque pas (ancien chemin)
+- canaux ON,  payloads paresseux, chaque pas (rate_hz=0)
+- canaux ON,  payloads paresseux, décimation par défaut (DEFAULT_EVENT_RATES)
+
+Usage (sans Webots):
+    python benchmarks/bench_log_channels.py [steps]
+"""
+
+import os
+import sys
+import time
+import tempfile
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "controllers", "drone_controller"))
+
+from flight_logger import DroneActionLogger, STORAGE_JSONL  # noqa: E402
+
+CHANNELS = ("imu_data", "altitude_control", "control_commands", "motor_velocities")
+
+
+def imu_payload(roll, pitch, yaw):
+    return {"roll": round(roll, 4), "pitch": round(pitch, 4), "yaw": round(yaw, 4)}
+
+
+def altitude_payload(target, current, vertical_input):
+    return {"target": round(target, 2), "current": round(current, 2),
+            "error": round(target - current, 3), "vertical_input": round(vertical_input, 3)}
+
+
+def commands_payload(pitch_corr, yaw_corr, pitch_input, yaw_input, roll_input, vertical_input, mode):
+    return {"pitch_corr": round(pitch_corr, 4), "yaw_corr": round(yaw_corr, 4),
+            "pitch_input": round(pitch_input, 4), "yaw_input": round(yaw_input, 4),
+            "roll_input": round(roll_input, 4), "vertical_input": round(vertical_input, 4), "mode": mode}
+
+
+def motors_payload(fl, fr, rl, rr):
+    return {"front_left": round(fl, 2), "front_right": round(fr, 2),
+            "rear_left": round(rl, 2), "rear_right": round(rr, 2)}
+
+
+def step_lazy(log, i):
+    v = i * 1e-4
+    log.log_event("imu_data", imu_payload, v, -v, 0.5 + v)
+    log.log_event("altitude_control", altitude_payload, 1.5, 1.4 + v, 0.01)
+    log.log_event("control_commands", commands_payload, v, -v, 0.2, 0.1, 0.3, 0.01, "follow")
+    log.log_event("motor_velocities", motors_payload, 72.1 + v, -72.2, -72.3, 72.4)
+
+
+def step_eager(log, i):
+    v = i * 1e-4
+    log.log_event("imu_data", imu_payload(v, -v, 0.5 + v))
+    log.log_event("altitude_control", altitude_payload(1.5, 1.4 + v, 0.01))
+    log.log_event("control_commands", commands_payload(v, -v, 0.2, 0.1, 0.3, 0.01, "follow"))
+    log.log_event("motor_velocities", motors_payload(72.1 + v, -72.2, -72.3, 72.4))
+
+
+def run(label, step, enabled, steps, workdir, rate_hz=0.0):
+    log = DroneActionLogger(os.path.join(workdir, label + ".json"), storage=STORAGE_JSONL,
+                            queue_capacity=1 << 16)
+    for ch in CHANNELS:
+        log.set_event_filter(ch, enabled, rate_hz)
+    t0 = time.perf_counter()
+    for i in range(steps):
+        step(log, i)
+    dt = time.perf_counter() - t0
+    log.close()
+    stats = log.get_stats()
+    print("{:<28} {:8.2f} us/step   written={:<8} dropped={}".format(
+        label, dt / steps * 1e6, stats["written"], stats["dropped"]))
+
+
+def main():
+    steps = int(sys.argv[1]) if len(sys.argv) > 1 else 20000
+    print("steps={} (125 Hz control loop => 8000 us budget per step)".format(steps))
+    with tempfile.TemporaryDirectory() as workdir:
+        run("channels_off_lazy", step_lazy, False, steps, workdir)
+        run("channels_off_eager_dicts", step_eager, False, steps, workdir)
+        run("channels_on_lazy", step_lazy, True, steps, workdir)
+        run("channels_on_lazy_decimated", step_lazy, True, steps, workdir, None)
+
+
+if __name__ == "__main__":
+    main()
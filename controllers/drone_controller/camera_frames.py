@@ -0,0 +1,284 @@
+# -*- coding: utf-8 -*-
+"""
+📷 CAMERA FRAMES - acquisition unique par pas de simulation
+===========================================================
+
+L'image caméra est convertie (BGRA Webots -> BGR) une seule fois par pas de
+_control_step puis publiée dans un FrameCache. Tous les consommateurs
+(HybridTracker, VideoRecorder, take_photo, clients MJPEG) relisent la même
+Frame en lecture seule et comparent son numéro de séquence pour savoir
+s'ils ont déjà vu cette image.
+
+Seul le thread de contrôle touche à la caméra Webots; les threads Flask se
+contentent de latest() / wait_newer().
+
+Les images vivent dans un FrameRing de buffers BGR préalloués: la conversion
+écrit en place (cv2.cvtColor(..., dst=buffer)) et un buffer n'est réutilisé
+que lorsque plus personne n'en détient de référence. Le cache garde une
+référence sur la dernière image; un consommateur qui la garde au-delà du pas
+courant (thread YOLO, client MJPEG, photo) prend un bail avec lease=True
+puis appelle frame.release().
+"""
+
+import time
+import threading
+
+import numpy as np
+
+
+# ============================================================================
+# DÉCODAGE
+# ============================================================================
+
+# Position (B, G, R) dans un pixel selon l'ordre des canaux du buffer brut
+CHANNEL_LAYOUTS = {
+    "BGRA": (0, 1, 2),
+    "RGBA": (2, 1, 0),
+    "ARGB": (3, 2, 1),
+    "ABGR": (1, 2, 3),
+    "BGR": (0, 1, 2),
+    "RGB": (2, 1, 0),
+}
+
+# Alignement (octets) exigé d'un stride déduit de la taille du buffer
+STRIDE_ALIGN = 4
+
+
+def _infer_stride(size, row, height):
+    """
+    Stride déduit de la taille du buffer: lignes compactes (size == row * height)
+    ou `height` lignes paddées, plus longues qu'une ligne utile et alignées sur
+    STRIDE_ALIGN. Toute autre taille est ambiguë -> None (on ne devine pas).
+    """
+    if size == row * height:
+        return row
+    if size % height == 0:
+        stride = size // height
+        if stride > row and stride % STRIDE_ALIGN == 0:
+            return stride
+    return None
+
+
+def decode_camera_image(raw, width, height, layout="BGRA", dst=None, stride=None):
+    """
+    Décode un buffer caméra brut en image BGR (height, width, 3) avec des
+    vues NumPy, sans appel par pixel. Gère:
+    - les lignes avec padding: stride explicite, ou déduit quand le buffer se
+      divise en `height` lignes plus longues que width * canaux et alignées
+      sur STRIDE_ALIGN octets
+    - un buffer 3 canaux alors qu'un layout 4 canaux est annoncé
+    - les ordres de canaux de CHANNEL_LAYOUTS
+    Écrit dans dst si fourni. Lève ValueError si le buffer est trop court ou
+    si sa taille ne correspond à aucun stride valide (sans stride explicite).
+    """
+    buf = np.frombuffer(raw, dtype=np.uint8)
+    channels = len(layout)
+    if channels == 4 and buf.size == width * height * 3:
+        layout = layout.replace("A", "")
+        channels = 3
+    b, g, r = CHANNEL_LAYOUTS[layout]
+
+    row = width * channels
+    if buf.size < row * height:
+        raise ValueError("Camera buffer too small: {} bytes for {}x{} {}".format(buf.size, width, height, layout))
+    if stride is None:
+        stride = _infer_stride(buf.size, row, height)
+        if stride is None:
+            raise ValueError("Unexpected camera buffer size: {} bytes for {}x{} {} (no valid stride)".format(
+                buf.size, width, height, layout))
+    elif stride < row or buf.size < stride * (height - 1) + row:
+        raise ValueError("Invalid camera stride {} for {}x{} {} ({} bytes)".format(
+            stride, width, height, layout, buf.size))
+    if stride == row:
+        pixels = buf[:row * height].reshape(height, width, channels)
+    else:
+        pixels = np.lib.stride_tricks.as_strided(
+            buf, shape=(height, width, channels), strides=(stride, channels, 1), writeable=False)
+
+    if dst is None:
+        dst = np.empty((height, width, 3), dtype=np.uint8)
+    if g == b + 1 and r == b + 2:
+        np.copyto(dst, pixels[:, :, b:b + 3])
+    else:
+        dst[:, :, 0] = pixels[:, :, b]
+        dst[:, :, 1] = pixels[:, :, g]
+        dst[:, :, 2] = pixels[:, :, r]
+    return dst
+
+
+class FrameRing:
+    """Anneau de buffers BGR préalloués, réutilisés selon leur compteur de références"""
+
+    def __init__(self, width, height, slots=8):
+        self.shape = (height, width, 3)
+        self._buffers = [np.empty(self.shape, dtype=np.uint8) for _ in range(slots)]
+        # Vues lecture seule remises aux consommateurs
+        self._views = []
+        for buf in self._buffers:
+            view = buf.view()
+            view.flags.writeable = False
+            self._views.append(view)
+        self._refs = [0] * slots
+        self._next = 0
+        self._lock = threading.Lock()
+        self.overflow = 0
+
+    def claim(self):
+        """Réserve un slot libre pour l'écriture (référence tenue par l'appelant), None si tous pris"""
+        with self._lock:
+            n = len(self._buffers)
+            for i in range(n):
+                slot = (self._next + i) % n
+                if self._refs[slot] == 0:
+                    self._refs[slot] = 1
+                    self._next = (slot + 1) % n
+                    return slot
+            self.overflow += 1
+            return None
+
+    def buffer(self, slot):
+        return self._buffers[slot]
+
+    def view(self, slot):
+        return self._views[slot]
+
+    def retain(self, slot):
+        with self._lock:
+            self._refs[slot] += 1
+
+    def release(self, slot):
+        with self._lock:
+            if self._refs[slot] > 0:
+                self._refs[slot] -= 1
+
+    def stats(self):
+        with self._lock:
+            return {"slots": len(self._refs), "leased": sum(1 for r in self._refs if r), "overflow": self.overflow}
+
+
+class Frame:
+    """Image BGR partagée (lecture seule) + métadonnées d'acquisition"""
+
+    __slots__ = ("image", "seq", "step", "sim_time", "timestamp", "_ring", "_slot")
+
+    def __init__(self, image, seq, step, sim_time, timestamp, ring=None, slot=None):
+        self.image = image
+        self.seq = seq
+        self.step = step
+        self.sim_time = sim_time
+        self.timestamp = timestamp
+        self._ring = ring
+        self._slot = slot
+
+    def retain(self):
+        if self._slot is not None:
+            self._ring.retain(self._slot)
+        return self
+
+    def release(self):
+        """Rend le bail (le buffer redevient réutilisable sans référence)"""
+        if self._slot is not None:
+            self._ring.release(self._slot)
+
+
+class FrameCache:
+    """Dernière image publiée + demande d'acquisition des consommateurs"""
+
+    def __init__(self, width=None, height=None, slots=8):
+        self.ring = FrameRing(width, height, slots) if width and height else None
+        self._cond = threading.Condition()
+        self._frame = None
+        self._seq = 0
+        self._clients = 0
+        self._requests = 0
+        self.published = 0
+
+    # ------------------------------------------------------------------
+    # Côté thread de contrôle
+    # ------------------------------------------------------------------
+
+    def wanted(self):
+        """Un consommateur attend-il des images? (clients MJPEG, photo en attente)"""
+        return self._clients > 0 or self._requests > 0
+
+    def claim(self):
+        """(slot, buffer BGR préalloué) où convertir l'image, (None, None) si l'anneau est plein"""
+        if self.ring is None:
+            return None, None
+        slot = self.ring.claim()
+        if slot is None:
+            return None, None
+        return slot, self.ring.buffer(slot)
+
+    def abandon(self, slot):
+        """Rend un slot réservé par claim() mais jamais publié"""
+        if slot is not None:
+            self.ring.release(slot)
+
+    def publish(self, image, step, sim_time, slot=None):
+        """
+        Publie l'image du pas courant. Avec un slot de claim(), l'image est
+        la vue lecture seule du buffer; sinon elle est verrouillée telle quelle.
+        """
+        if slot is not None:
+            image = self.ring.view(slot)
+        else:
+            image.flags.writeable = False
+        with self._cond:
+            self._seq += 1
+            frame = Frame(image, self._seq, step, sim_time, time.time(), self.ring, slot)
+            previous = self._frame
+            self._frame = frame
+            self._requests = 0
+            self.published += 1
+            self._cond.notify_all()
+        # La référence du cache passe à la nouvelle image
+        if previous is not None:
+            previous.release()
+        return frame
+
+    # ------------------------------------------------------------------
+    # Côté consommateurs
+    # ------------------------------------------------------------------
+
+    def latest(self, lease=False):
+        """Dernière image; avec lease=True l'appelant doit appeler frame.release()"""
+        with self._cond:
+            frame = self._frame
+            if lease and frame is not None:
+                frame.retain()
+        return frame
+
+    def wait_newer(self, seq, timeout=None, lease=False):
+        """Attend une image plus récente que `seq` (None si timeout)"""
+        with self._cond:
+            if self._frame is None or self._frame.seq <= seq:
+                self._requests += 1
+                self._cond.wait_for(lambda: self._frame is not None and self._frame.seq > seq, timeout)
+            frame = self._frame
+            if frame is None or frame.seq <= seq:
+                return None
+            if lease:
+                frame.retain()
+        return frame
+
+    def add_client(self):
+        with self._cond:
+            self._clients += 1
+
+    def remove_client(self):
+        with self._cond:
+            self._clients = max(0, self._clients - 1)
+
+    def stats(self):
+        frame = self._frame
+        stats = {
+            "seq": frame.seq if frame else 0,
+            "sim_time": frame.sim_time if frame else None,
+            "clients": self._clients,
+            "published": self.published,
+        }
+        if self.ring is not None:
+            stats["ring"] = self.ring.stats()
+        return stats
+
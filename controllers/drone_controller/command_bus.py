@@ -0,0 +1,131 @@
+# -*- coding: utf-8 -*-
+"""
+📨 COMMAND BUS - commandes HTTP exécutées par le thread de contrôle
+===================================================================
+
+Les handlers Flask ne touchent plus aux devices Webots: ils déposent une
+commande dans le bus et répondent immédiatement avec son identifiant.
+_control_step vide le bus en début de pas, donc toute la logique de
+commande (et tout accès à l'API Webots) reste sur un seul thread.
+
+La file est une collections.deque: append()/popleft() sont atomiques,
+aucun verrou sur le chemin submit -> drain. Seul l'historique des
+commandes récentes (consultable par /command/<id>) est protégé.
+"""
+
+import time
+import itertools
+import threading
+from collections import deque
+
+
+PENDING = "pending"
+DONE = "done"
+ERROR = "error"
+
+
+class CommandFuture:
+    """Résultat d'une commande: état, résultat ou erreur, attente optionnelle"""
+
+    __slots__ = ("id", "name", "args", "kwargs", "state", "result", "error",
+                 "submitted", "completed", "_event")
+
+    def __init__(self, cmd_id, name, args, kwargs):
+        self.id = cmd_id
+        self.name = name
+        self.args = args
+        self.kwargs = kwargs
+        self.state = PENDING
+        self.result = None
+        self.error = None
+        self.submitted = time.time()
+        self.completed = None
+        self._event = threading.Event()
+
+    def done(self):
+        return self.state != PENDING
+
+    def wait(self, timeout=None):
+        """Attend l'exécution (thread Flask uniquement, jamais le thread de contrôle)"""
+        self._event.wait(timeout)
+        return self.done()
+
+    def _set(self, state, result=None, error=None):
+        self.state = state
+        self.result = result
+        self.error = error
+        self.completed = time.time()
+        self._event.set()
+
+    def to_dict(self):
+        return {
+            "id": self.id,
+            "command": self.name,
+            "state": self.state,
+            "result": self.result,
+            "error": self.error,
+            "latency_ms": round((self.completed - self.submitted) * 1000, 1) if self.completed else None,
+        }
+
+
+class CommandBus:
+    """File de commandes multi-producteurs (Flask) / consommateur unique (contrôle)"""
+
+    def __init__(self, history=256, max_per_step=32):
+        self._queue = deque()
+        self._ids = itertools.count(1)
+        self._history = {}
+        self._order = deque()
+        self._history_size = history
+        self._history_lock = threading.Lock()
+        self.max_per_step = max_per_step
+        self.submitted = 0
+        self.executed = 0
+        self.failed = 0
+
+    def submit(self, name, *args, **kwargs):
+        """Dépose une commande (non bloquant) et retourne son CommandFuture"""
+        future = CommandFuture(next(self._ids), name, args, kwargs)
+        with self._history_lock:
+            self._history[future.id] = future
+            self._order.append(future.id)
+            while len(self._order) > self._history_size:
+                self._history.pop(self._order.popleft(), None)
+            self.submitted += 1
+        self._queue.append(future)
+        return future
+
+    def get(self, cmd_id):
+        with self._history_lock:
+            return self._history.get(cmd_id)
+
+    def pending(self):
+        return len(self._queue)
+
+    def drain(self, dispatch):
+        """
+        Exécute les commandes en attente via dispatch(name, *args, **kwargs)
+        (thread de contrôle). Au plus max_per_step commandes par pas.
+        """
+        queue = self._queue
+        for _ in range(self.max_per_step):
+            try:
+                future = queue.popleft()
+            except IndexError:
+                break
+            try:
+                result = dispatch(future.name, *future.args, **future.kwargs)
+            except Exception as e:
+                self.failed += 1
+                future._set(ERROR, error=str(e))
+            else:
+                self.executed += 1
+                future._set(DONE, result=result)
+
+    def stats(self):
+        return {
+            "pending": len(self._queue),
+            "submitted": self.submitted,
+            "executed": self.executed,
+            "failed": self.failed,
+        }
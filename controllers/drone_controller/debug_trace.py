@@ -0,0 +1,180 @@
+# -*- coding: utf-8 -*-
+"""
+🔬 DEBUG TRACE - traces de debug échantillonnées (FOLLOW / SEARCH)
+==================================================================
+
+Remplace les print() du pas de contrôle. Chaque trace appartient à un
+topic ("follow.zone", "search.lock"...) et porte un état discret (zone de
+distance, recentrage en cours...). Une trace n'est retenue que si:
+
+- l'état du topic a changé (transition: toujours retenue), ou
+- la période du topic est écoulée (au plus rate_hz traces par seconde
+  de simulation; rate_hz = 0 -> transitions uniquement)
+
+Les traces retenues vont dans un anneau en mémoire (deque bornée). Le
+message n'est formaté qu'à la lecture (fmt + args immuables): une trace
+écartée ne coûte qu'une lecture de dict et une comparaison. Le nombre de
+traces écartées depuis la précédente est conservé dans chaque entrée.
+
+    tracer.trace("follow.zone", sim_time, "optimal", "OPTIMAL ZONE ({:.1f}%)", bbox_percent)
+
+Lecture (thread Flask): entries(since, topics, limit), dump(path), stats().
+"""
+
+import json
+import time
+import threading
+import itertools
+from collections import deque
+
+
+# Hz max par topic (défaut: DEFAULT_RATE_HZ). 0 = transitions d'état uniquement
+DEFAULT_TOPIC_RATES = {
+    "follow.yaw": 2.0,
+    "follow.zone": 0.0,
+    "follow.debug": 1.0,
+    "follow.safety": 0.0,
+    "search.lock": 0.0,
+    "search.aim": 1.0,
+}
+DEFAULT_RATE_HZ = 2.0
+
+
+class _Topic:
+    """État d'échantillonnage d'un topic"""
+
+    __slots__ = ("rate_hz", "period", "next_due", "state", "emitted", "suppressed", "pending")
+
+    def __init__(self, rate_hz):
+        self.state = None
+        self.next_due = float("-inf")
+        self.emitted = 0
+        self.suppressed = 0
+        self.pending = 0  # écartées depuis la dernière trace retenue
+        self.set_rate(rate_hz)
+
+    def set_rate(self, rate_hz):
+        self.rate_hz = max(0.0, float(rate_hz))
+        self.period = 1.0 / self.rate_hz if self.rate_hz > 0 else float("inf")
+
+
+class TraceBuffer:
+    """Anneau de traces échantillonnées par topic (écriture: thread de contrôle)"""
+
+    def __init__(self, capacity=2000, rates=None, default_rate_hz=DEFAULT_RATE_HZ, enabled=True, echo=False):
+        self._ring = deque(maxlen=capacity)
+        self._seq = itertools.count(1)
+        self._rates = dict(DEFAULT_TOPIC_RATES if rates is None else rates)
+        self.default_rate_hz = default_rate_hz
+        self._topics = {}
+        self._lock = threading.Lock()  # configuration des topics uniquement
+        self.enabled = enabled
+        self.echo = echo  # recopie aussi les traces retenues sur stdout
+        self.last_seq = 0
+
+    def __len__(self):
+        return len(self._ring)
+
+    # ------------------------------------------------------------------
+    # Écriture (thread de contrôle)
+    # ------------------------------------------------------------------
+
+    def trace(self, topic, now, state, fmt, *args):
+        """
+        Retient la trace si l'état du topic change ou si sa période est
+        écoulée (now: temps simulation). Retourne True si retenue.
+        """
+        if not self.enabled:
+            return False
+        t = self._topics.get(topic)
+        if t is None:
+            t = self._add_topic(topic)
+        if state == t.state and now < t.next_due:
+            t.suppressed += 1
+            t.pending += 1
+            return False
+        seq = next(self._seq)
+        self._ring.append((seq, now, time.time(), topic, state, fmt, args, t.pending))
+        self.last_seq = seq
+        t.state = state
+        t.next_due = now + t.period
+        t.emitted += 1
+        t.pending = 0
+        if self.echo:
+            print("[{}] {}".format(topic, fmt.format(*args)))
+        return True
+
+    def _add_topic(self, topic):
+        with self._lock:
+            t = self._topics.get(topic)
+            if t is None:
+                t = self._topics[topic] = _Topic(self._rates.get(topic, self.default_rate_hz))
+            return t
+
+    # ------------------------------------------------------------------
+    # Configuration / lecture (thread Flask)
+    # ------------------------------------------------------------------
+
+    def set_enabled(self, enabled):
+        self.enabled = bool(enabled)
+
+    def set_rate(self, topic, rate_hz):
+        """Hz max d'un topic (0 = transitions uniquement), appliqué au prochain pas"""
+        with self._lock:
+            self._rates[topic] = max(0.0, float(rate_hz))
+            t = self._topics.get(topic)
+            if t is not None:
+                t.set_rate(rate_hz)
+
+    def clear(self):
+        self._ring.clear()
+
+    def entries(self, since=0, topics=None, limit=None):
+        """Traces de seq > since (formatées), les plus récentes si limit"""
+        # Copie de la deque en C sous le GIL: pas de verrou côté écriture
+        out = []
+        for seq, now, wall, topic, state, fmt, args, suppressed in tuple(self._ring):
+            if seq <= since or (topics and topic not in topics):
+                continue
+            out.append({
+                "seq": seq,
+                "sim_time": round(now, 3),
+                "time": time.strftime("%H:%M:%S", time.localtime(wall)),
+                "topic": topic,
+                "state": state,
+                "message": _format(fmt, args),
+                "suppressed": suppressed,
+            })
+        if limit:
+            out = out[-limit:]
+        return out
+
+    def dump(self, path, topics=None):
+        """Écrit l'anneau en JSONL, retourne le nombre de traces"""
+        entries = self.entries(topics=topics)
+        with open(path, 'w') as f:
+            for entry in entries:
+                f.write(json.dumps(entry, ensure_ascii=False) + "\n")
+        return len(entries)
+
+    def stats(self):
+        with self._lock:
+            topics = {
+                name: {"rate_hz": t.rate_hz, "state": t.state, "emitted": t.emitted, "suppressed": t.suppressed}
+                for name, t in self._topics.items()
+            }
+        return {
+            "enabled": self.enabled,
+            "echo": self.echo,
+            "size": len(self._ring),
+            "capacity": self._ring.maxlen,
+            "last_seq": self.last_seq,
+            "topics": topics,
+        }
+
+
+def _format(fmt, args):
+    try:
+        return fmt.format(*args)
+    except (IndexError, KeyError, ValueError) as e:
+        return "{} {!r} ({})".format(fmt, args, e)
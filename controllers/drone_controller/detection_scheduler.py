@@ -0,0 +1,169 @@
+# -*- coding: utf-8 -*-
+"""
+⏲️ DETECTION SCHEDULER - intervalle adaptatif des re-détections YOLO
+====================================================================
+
+Pendant le tracking KCF, HybridTracker ne relance YOLO que pour confirmer
+la cible. L'intervalle entre deux confirmations s'adapte:
+
+- allongé progressivement (jusqu'à max_interval) tant que KCF tient, que la
+  bbox bouge lentement et que la dernière confirmation YOLO est d'accord
+  avec KCF (IoU élevé)
+- raccourci sur mouvement rapide de la bbox ou changement d'échelle
+- ramené à min_interval sur échec KCF ou désaccord KCF/YOLO
+
+Budget CPU: au plus max_rate_hz appels détecteur par seconde et au plus
+max_busy (fraction d'un cœur) de temps détecteur, estimé par EMA du coût
+d'une passe. Le budget s'applique aussi aux détections de recherche (hors
+tracking), qui tourneraient sinon en continu.
+
+Écriture: thread de contrôle (observe, on_detection, due, allow) et thread
+de détection (record_pass). Lecture: stats() depuis Flask.
+"""
+
+import math
+import time
+from collections import deque
+
+
+def bbox_iou(a, b):
+    """IoU de deux bbox (x1, y1, x2, y2, ...)"""
+    ix = max(0, min(a[2], b[2]) - max(a[0], b[0]))
+    iy = max(0, min(a[3], b[3]) - max(a[1], b[1]))
+    inter = ix * iy
+    union = (a[2] - a[0]) * (a[3] - a[1]) + (b[2] - b[0]) * (b[3] - b[1]) - inter
+    return inter / union if union > 0 else 0.0
+
+
+class DetectionScheduler:
+    """Intervalle de re-détection adaptatif + budget CPU du détecteur"""
+
+    def __init__(self, base_interval=0.3, min_interval=0.1, max_interval=1.5,
+                 max_rate_hz=6.0, max_busy=0.5, growth=0.5,
+                 fast_motion=0.6, fast_scale=0.4, min_agreement=0.5, rate_window=2.0, sample_period=0.1):
+        self.base_interval = base_interval
+        self.min_interval = min_interval
+        self.max_interval = max_interval
+        self.max_rate_hz = max_rate_hz    # appels détecteur / s
+        self.max_busy = max_busy          # fraction d'un cœur occupée par le détecteur
+        self.growth = growth              # s d'intervalle gagnées par seconde de suivi stable
+        self.fast_motion = fast_motion    # déplacement du centre en diagonales de bbox / s
+        self.fast_scale = fast_scale      # |d ln(aire)| / s
+        self.min_agreement = min_agreement  # IoU KCF/YOLO minimal
+        self.rate_window = rate_window
+        self.sample_period = sample_period  # mouvement mesuré sur >= 100 ms (bruit KCF pas à pas)
+        self.interval = base_interval
+        self.reason = "init"
+        self.cost_s = 0.0
+        self._prev = None  # (t, cx, cy, diag, aire)
+        self._passes = deque()
+        self.reasons = {"stable": 0, "motion": 0, "scale": 0, "kcf_failure": 0, "disagreement": 0}
+
+    def configure(self, **params):
+        """Mise à jour à chaud des seuils / budgets (clés = attributs du constructeur)"""
+        for key, value in params.items():
+            if key in ("base_interval", "min_interval", "max_interval", "max_rate_hz", "max_busy",
+                       "growth", "fast_motion", "fast_scale", "min_agreement"):
+                setattr(self, key, float(value))
+            else:
+                raise ValueError("Unknown scheduler parameter: {}".format(key))
+        self.interval = min(max(self.interval, self.min_interval), self.max_interval)
+
+    def reset(self):
+        """Nouvelle cible / tracker réinitialisé"""
+        self.interval = self.base_interval
+        self._prev = None
+
+    # ------------------------------------------------------------------
+    # Thread de contrôle
+    # ------------------------------------------------------------------
+
+    def observe(self, now, kcf_ok, bbox=None):
+        """Mesure KCF du pas: adapte l'intervalle au mouvement et à l'échelle de la bbox"""
+        if not kcf_ok:
+            self._tighten("kcf_failure", self.min_interval)
+            self._prev = None
+            return
+        x1, y1, x2, y2 = bbox[:4]
+        w, h = max(x2 - x1, 1), max(y2 - y1, 1)
+        cur = (now, (x1 + x2) / 2.0, (y1 + y2) / 2.0, math.hypot(w, h), w * h)
+        prev = self._prev
+        if prev is None:
+            self._prev = cur
+            return
+        dt = now - prev[0]
+        if dt < self.sample_period:
+            return
+        self._prev = cur
+        motion = math.hypot(cur[1] - prev[1], cur[2] - prev[2]) / prev[3] / dt
+        scale = abs(math.log(cur[4] / prev[4])) / dt
+        if motion > self.fast_motion:
+            self._tighten("motion", self.interval * 0.5)
+        elif scale > self.fast_scale:
+            self._tighten("scale", self.interval * 0.5)
+        else:
+            self.interval = min(self.max_interval, self.interval + self.growth * dt)
+            if self.reason != "stable":
+                self.reason = "stable"
+                self.reasons["stable"] += 1
+
+    def on_detection(self, iou):
+        """Confirmation YOLO arrivée pendant le tracking: IoU avec la bbox KCF"""
+        if iou < self.min_agreement:
+            self._tighten("disagreement", self.min_interval)
+
+    def _tighten(self, reason, interval):
+        self.interval = max(self.min_interval, min(self.interval, interval))
+        if self.reason != reason:
+            self.reasons[reason] += 1
+        self.reason = reason
+
+    def budget_interval(self):
+        """Intervalle minimal imposé par le budget (appels/s et fraction CPU)"""
+        by_rate = 1.0 / self.max_rate_hz if self.max_rate_hz > 0 else 0.0
+        by_busy = self.cost_s / self.max_busy if self.max_busy > 0 else 0.0
+        return max(by_rate, by_busy)
+
+    def allow(self, now, last_request):
+        """Le budget autorise-t-il un nouvel appel détecteur?"""
+        return now - last_request >= self.budget_interval()
+
+    def due(self, now, last_detection, last_request):
+        """Confirmation due: intervalle adaptatif écoulé et budget respecté"""
+        return now - last_detection >= self.interval and self.allow(now, last_request)
+
+    # ------------------------------------------------------------------
+    # Thread de détection
+    # ------------------------------------------------------------------
+
+    def record_pass(self, cost_s, now=None):
+        """Une passe détecteur terminée (coût en s)"""
+        now = time.time() if now is None else now
+        self.cost_s = cost_s if not self.cost_s else self.cost_s + 0.2 * (cost_s - self.cost_s)
+        passes = self._passes
+        passes.append(now)
+        while passes and passes[0] < now - self.rate_window:
+            passes.popleft()
+
+    # ------------------------------------------------------------------
+    # Lecture
+    # ------------------------------------------------------------------
+
+    def detection_rate(self, now=None):
+        """Passes détecteur par seconde sur la fenêtre glissante"""
+        now = time.time() if now is None else now
+        recent = [t for t in tuple(self._passes) if t >= now - self.rate_window]
+        return len(recent) / self.rate_window
+
+    def stats(self):
+        rate = self.detection_rate()
+        return {
+            "interval_s": round(self.interval, 3),
+            "reason": self.reason,
+            "detection_rate_hz": round(rate, 2),
+            "detector_ms": round(self.cost_s * 1000, 2),
+            "cpu_busy": round(rate * self.cost_s, 3),
+            "budget": {"max_rate_hz": self.max_rate_hz, "max_busy": self.max_busy,
+                       "min_interval_s": round(self.budget_interval(), 3)},
+            "reasons": dict(self.reasons),
+        }
@@ -0,0 +1,277 @@
+# -*- coding: utf-8 -*-
+"""
+🧠 DETECTORS - backends d'inférence pour HybridTracker
+======================================================
+
+Interface commune: detect(image, conf, classes, imgsz) -> (xyxy, scores, cls)
+- xyxy   float32 (N, 4) en pixels de l'image d'entrée
+- scores float32 (N,)
+- cls    int32   (N,)
+et `names` ({id: nom}) pour résoudre les classes. imgsz (optionnel) réduit
+la taille d'entrée du réseau pour les petites images (re-détection sur ROI).
+detect_batch(images, conf, classes, imgsz) -> une liste de résultats, en une
+seule inférence quand le backend le permet (cf. inference_service.py).
+
+Backends:
+- UltralyticsDetector: modèle YOLO Ultralytics/PyTorch (chemin historique)
+- OnnxDetector: export ONNX du même modèle via cv2.dnn.readNetFromONNX,
+  prétraitement CPU (letterbox + blob) et NMS OpenCV, sans PyTorch
+
+Sélection: variable d'environnement DETECTOR=ultralytics|onnx
+(cf. create_detector). Comparaison des deux backends:
+    python benchmarks/bench_detectors.py --model yolo11n.pt
+"""
+
+import os
+
+import numpy as np
+import cv2
+
+
+BACKEND_ULTRALYTICS = "ultralytics"
+BACKEND_ONNX = "onnx"
+
+# Classes COCO de yolo11n (ordre des sorties du modèle exporté)
+COCO_NAMES = (
+    "person", "bicycle", "car", "motorcycle", "airplane", "bus", "train", "truck", "boat",
+    "traffic light", "fire hydrant", "stop sign", "parking meter", "bench", "bird", "cat", "dog",
+    "horse", "sheep", "cow", "elephant", "bear", "zebra", "giraffe", "backpack", "umbrella",
+    "handbag", "tie", "suitcase", "frisbee", "skis", "snowboard", "sports ball", "kite",
+    "baseball bat", "baseball glove", "skateboard", "surfboard", "tennis racket", "bottle",
+    "wine glass", "cup", "fork", "knife", "spoon", "bowl", "banana", "apple", "sandwich", "orange",
+    "broccoli", "carrot", "hot dog", "pizza", "donut", "cake", "chair", "couch", "potted plant",
+    "bed", "dining table", "toilet", "tv", "laptop", "mouse", "remote", "keyboard", "cell phone",
+    "microwave", "oven", "toaster", "sink", "refrigerator", "book", "clock", "vase", "scissors",
+    "teddy bear", "hair drier", "toothbrush",
+)
+
+LETTERBOX_COLOR = 114
+
+
+def empty_detections():
+    return (np.empty((0, 4), dtype=np.float32), np.empty(0, dtype=np.float32), np.empty(0, dtype=np.int32))
+
+
+# ============================================================================
+# PRÉ / POST-TRAITEMENT (NumPy + OpenCV)
+# ============================================================================
+
+def letterbox(image, size, dst=None):
+    """
+    Redimensionne en conservant le ratio dans un carré size x size bordé de
+    gris (comme Ultralytics). Retourne (canvas, scale, pad_x, pad_y).
+    """
+    h, w = image.shape[:2]
+    scale = min(size / h, size / w)
+    new_w, new_h = int(round(w * scale)), int(round(h * scale))
+    pad_x, pad_y = (size - new_w) // 2, (size - new_h) // 2
+    if dst is None:
+        dst = np.empty((size, size, 3), dtype=np.uint8)
+    dst.fill(LETTERBOX_COLOR)
+    roi = dst[pad_y:pad_y + new_h, pad_x:pad_x + new_w]
+    if (new_w, new_h) == (w, h):
+        np.copyto(roi, image)
+    else:
+        cv2.resize(image, (new_w, new_h), dst=roi, interpolation=cv2.INTER_LINEAR)
+    return dst, scale, pad_x, pad_y
+
+
+def decode_yolo_output(output, conf=0.25, classes=None, iou=0.45, scale=1.0, pad=(0, 0),
+                       image_shape=None, max_det=300):
+    """
+    Sortie brute YOLOv8/11 (1, 4 + nc, anchors) -> (xyxy, scores, cls) après
+    seuil de confiance, filtre de classes et NMS par classe, dans le repère
+    de l'image d'origine (letterbox annulé).
+    """
+    pred = output[0] if output.ndim == 3 else output
+    pred = pred.T  # (anchors, 4 + nc)
+    class_scores = pred[:, 4:]
+    if classes is not None:
+        class_ids = np.asarray(classes, dtype=np.int32)
+        sub = class_scores[:, class_ids]
+        best = sub.argmax(axis=1)
+        cls = class_ids[best]
+        scores = sub[np.arange(len(sub)), best]
+    else:
+        cls = class_scores.argmax(axis=1).astype(np.int32)
+        scores = class_scores[np.arange(len(class_scores)), cls]
+    keep = scores >= conf
+    if not keep.any():
+        return empty_detections()
+    boxes, scores, cls = pred[keep, :4], scores[keep].astype(np.float32), cls[keep]
+
+    # cx, cy, w, h (entrée réseau) -> x1, y1, x2, y2 (image d'origine)
+    xyxy = np.empty((len(boxes), 4), dtype=np.float32)
+    half = boxes[:, 2:4] * 0.5
+    xyxy[:, 0:2] = boxes[:, 0:2] - half
+    xyxy[:, 2:4] = boxes[:, 0:2] + half
+    xyxy[:, [0, 2]] -= pad[0]
+    xyxy[:, [1, 3]] -= pad[1]
+    xyxy /= scale
+    if image_shape is not None:
+        h, w = image_shape[:2]
+        xyxy[:, [0, 2]] = np.clip(xyxy[:, [0, 2]], 0, w)
+        xyxy[:, [1, 3]] = np.clip(xyxy[:, [1, 3]], 0, h)
+
+    xywh = np.concatenate([xyxy[:, :2], xyxy[:, 2:] - xyxy[:, :2]], axis=1)
+    idx = cv2.dnn.NMSBoxesBatched(xywh.tolist(), scores.tolist(), cls.tolist(), conf, iou)
+    idx = np.asarray(idx, dtype=np.int64).reshape(-1)[:max_det]
+    return xyxy[idx], scores[idx], cls[idx].astype(np.int32)
+
+
+def resolve_class_id(names, label):
+    """Identifiant de classe d'un nom (insensible à la casse), None si inconnu"""
+    label = label.lower()
+    for cls_id, name in names.items():
+        if name.lower() == label:
+            return int(cls_id)
+    return None
+
+
+def largest_box(xyxy, min_size):
+    """
+    Indice de la plus grande boîte dont largeur et hauteur >= min_size
+    (coordonnées tronquées en pixels entiers), -1 si aucune. Vectorisé.
+    """
+    if not len(xyxy):
+        return -1
+    boxes = xyxy.astype(np.int32)
+    wh = boxes[:, 2:4] - boxes[:, 0:2]
+    area = wh[:, 0] * wh[:, 1]
+    area[(wh < min_size).any(axis=1)] = -1
+    best = int(area.argmax())
+    return best if area[best] >= 0 else -1
+
+
+def expand_roi(bbox, frame_w, frame_h, scale=2.0, min_size=96):
+    """
+    Zone de re-détection autour d'une bbox: agrandie de `scale` autour de
+    son centre (au moins min_size px de côté), bornée à l'image -> (x1, y1, x2, y2)
+    """
+    x1, y1, x2, y2 = bbox[:4]
+    cx, cy = (x1 + x2) / 2.0, (y1 + y2) / 2.0
+    half_w = min(max((x2 - x1) * scale, min_size), frame_w) / 2.0
+    half_h = min(max((y2 - y1) * scale, min_size), frame_h) / 2.0
+    # Décale la zone plutôt que la rogner quand elle dépasse un bord
+    cx = min(max(cx, half_w), frame_w - half_w)
+    cy = min(max(cy, half_h), frame_h - half_h)
+    return (int(cx - half_w), int(cy - half_h), int(round(cx + half_w)), int(round(cy + half_h)))
+
+
+def roi_imgsz(roi, step=32, min_size=160, max_size=640):
+    """Taille d'entrée réseau pour une ROI: plus grand côté arrondi au multiple de step"""
+    side = max(roi[2] - roi[0], roi[3] - roi[1])
+    return int(min(max(-(-side // step) * step, min_size), max_size))
+
+
+# ============================================================================
+# BACKENDS
+# ============================================================================
+
+class UltralyticsDetector:
+    """Modèle YOLO Ultralytics (PyTorch)"""
+
+    backend = BACKEND_ULTRALYTICS
+
+    def __init__(self, model):
+        self.model = model
+        self.names = dict(model.names)
+
+    def detect(self, image, conf=0.25, classes=None, imgsz=None):
+        return self.detect_batch([image], conf, classes, imgsz)[0]
+
+    def detect_batch(self, images, conf=0.25, classes=None, imgsz=None):
+        """Une inférence pour toutes les images (batch Ultralytics)"""
+        kwargs = {"imgsz": imgsz} if imgsz else {}
+        results = self.model(list(images), conf=conf, classes=classes, verbose=False, **kwargs)
+        return [self._parse(result) for result in results]
+
+    @staticmethod
+    def _parse(result):
+        boxes = result.boxes
+        if boxes is None or len(boxes) == 0:
+            return empty_detections()
+        return (boxes.xyxy.cpu().numpy().astype(np.float32),
+                boxes.conf.cpu().numpy().astype(np.float32),
+                boxes.cls.cpu().numpy().astype(np.int32))
+
+
+class OnnxDetector:
+    """Export ONNX exécuté par cv2.dnn (CPU), letterbox + NMS OpenCV"""
+
+    backend = BACKEND_ONNX
+
+    def __init__(self, onnx_path, names=None, input_size=640, iou=0.45):
+        self.net = cv2.dnn.readNetFromONNX(onnx_path)
+        self.net.setPreferableBackend(cv2.dnn.DNN_BACKEND_OPENCV)
+        self.net.setPreferableTarget(cv2.dnn.DNN_TARGET_CPU)
+        self.onnx_path = onnx_path
+        self.names = dict(names) if names else dict(enumerate(COCO_NAMES))
+        self.input_size = input_size
+        self.iou = iou
+        self._canvases = {}  # un canvas letterbox réutilisé par taille d'entrée
+        self.dynamic = self._accepts_size(input_size // 2)
+        self.batched = None  # batch > 1 accepté? (sondé au premier detect_batch)
+
+    def _accepts_size(self, size):
+        """Export dynamique (dynamic=True)? Sinon imgsz est ignoré (entrée fixe input_size)"""
+        try:
+            self.net.setInput(np.zeros((1, 3, size, size), dtype=np.float32))
+            self.net.forward()
+            return True
+        except cv2.error:
+            return False
+
+    def _canvas(self, size, slot=0):
+        canvas = self._canvases.get((size, slot))
+        if canvas is None:
+            canvas = self._canvases[(size, slot)] = np.empty((size, size, 3), dtype=np.uint8)
+        return canvas
+
+    def detect(self, image, conf=0.25, classes=None, imgsz=None):
+        size = imgsz if imgsz and self.dynamic else self.input_size
+        canvas, scale, pad_x, pad_y = letterbox(image, size, self._canvas(size))
+        blob = cv2.dnn.blobFromImage(canvas, 1.0 / 255.0, swapRB=True)
+        self.net.setInput(blob)
+        output = self.net.forward()
+        return decode_yolo_output(output, conf, classes, self.iou, scale, (pad_x, pad_y), image.shape)
+
+    def detect_batch(self, images, conf=0.25, classes=None, imgsz=None):
+        """
+        Un blob (N, 3, S, S) et une passe réseau si l'export accepte un batch
+        dynamique, sinon une passe par image.
+        """
+        if len(images) == 1 or self.batched is False:
+            return [self.detect(image, conf, classes, imgsz) for image in images]
+        size = imgsz if imgsz and self.dynamic else self.input_size
+        boxes = [letterbox(image, size, self._canvas(size, i)) for i, image in enumerate(images)]
+        blob = cv2.dnn.blobFromImages([b[0] for b in boxes], 1.0 / 255.0, swapRB=True)
+        try:
+            self.net.setInput(blob)
+            output = self.net.forward()
+            self.batched = True
+        except cv2.error:
+            self.batched = False  # export à batch fixe (1)
+            return [self.detect(image, conf, classes, imgsz) for image in images]
+        return [decode_yolo_output(output[i], conf, classes, self.iou, scale, (pad_x, pad_y), image.shape)
+                for i, (image, (_, scale, pad_x, pad_y)) in enumerate(zip(images, boxes))]
+
+
+def onnx_path_for(model_path):
+    return os.path.splitext(model_path)[0] + ".onnx"
+
+
+def create_detector(backend, yolo_model=None, onnx_path=None, names=None):
+    """
+    Construit le backend demandé. Pour "onnx", exporte le modèle Ultralytics
+    si le fichier .onnx est absent. Lève ValueError si le backend est inconnu.
+    """
+    backend = (backend or BACKEND_ULTRALYTICS).lower()
+    if backend == BACKEND_ULTRALYTICS:
+        return UltralyticsDetector(yolo_model)
+    if backend == BACKEND_ONNX:
+        if not onnx_path or not os.path.exists(onnx_path):
+            onnx_path = yolo_model.export(format="onnx")
+        return OnnxDetector(onnx_path, names or (yolo_model.names if yolo_model is not None else None))
+    raise ValueError("Unknown detector backend: {}".format(backend))
+
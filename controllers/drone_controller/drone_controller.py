@@ -28,16 +28,14 @@ import time
 import math
 import threading
 import logging
-import json
 import yaml
 from collections import deque
 from dataclasses import dataclass
 from enum import Enum
-from datetime import datetime
 
 import numpy as np
 import cv2
-from flask import Flask, Response, request, redirect, jsonify, render_template_string, send_file
+from flask import Flask, Response, request, redirect, jsonify, render_template_string, send_file, stream_with_context
 
 try:
     from ultralytics import YOLO
@@ -46,120 +44,19 @@ except:
 
 from controller import Robot
 
+from flight_logger import DroneActionLogger, STORAGE_JSONL
+from telemetry_recorder import TelemetryRecorder
+from camera_frames import FrameCache, decode_camera_image
+from loop_profiler import LoopProfiler, LoadShedder
+from command_bus import CommandBus
+from debug_trace import TraceBuffer
+from detection_scheduler import DetectionScheduler, bbox_iou
+from detectors import (create_detector, onnx_path_for, resolve_class_id, largest_box, expand_roi, roi_imgsz,
+                       BACKEND_ULTRALYTICS)
+from inference_service import InferenceService
 
-# ============================================================================
 
 # ============================================================================
-# DRONE ACTION LOGGER
-# ============================================================================
-
-class DroneActionLogger:
-    def __init__(self, log_file="drone_flight_log.json"):
-        self.log_file = log_file
-        self.sesifon_id = datetime.now().strftime("%Y%m%d_%H%M%S")
-        self.logs = []
-        self.lock = __import__('threading').Lock()
-        self.start_time = __import__('time').time()
-        
-        # 🆕 REAL-TIME ACTIVATABLE EVENT FILTERS
-        self.event_filters = {
-            "takeoff": True,
-            "land": True,
-            "emergency": True,
-            "detection": False,
-            "velocity": False,  # Disabled by default for performance
-            "position": False,
-            "mode_change": False,
-            "tracking": False,
-            "command": False,
-            "photo": False,
-            "video": False,
-            "waypoint": False,
-            "geofence": False,
-            "battery": False,
-            "imu_data": False,           # 🆕 IMU data (very high frequency)
-            "altitude_control": False,   # 🆕 Altitude control (very high frequency)
-            "control_commands": False,
-            "motor_velocities": False,   # 🆕 Motor speeds (very high frequency)
-            "follow_active": False,
-            "other": False
-        }
-        
-        self._init_log_file()
-    
-    def _init_log_file(self):
-        import json
-        with open(self.log_file, 'w') as f:
-            json.dump({
-                "sesifon_id": self.sesifon_id, 
-                "start_time": datetime.now().isoformat(), 
-                "events": [],
-                "event_filters": self.event_filters.copy()
-            }, f, indent=2)
-    
-    def set_event_filter(self, event_type, enabled):
-        """Enable/disable an event type in real-time"""
-        with self.lock:
-            if event_type in self.event_filters:
-                self.event_filters[event_type] = enabled
-                return True
-            return False
-    
-    def get_event_filters(self):
-        """Return current filter state"""
-        with self.lock:
-            return self.event_filters.copy()
-    
-    def log_event(self, event_type, data):
-        """Log an event only if its filter is enabled"""
-        import time
-        
-        # 🆕 FILTER CHECK
-        with self.lock:
-            # Categorize event
-            category = event_type
-            if event_type not in self.event_filters:
-                category = "other"
-            
-            # Ne logger que if le filtre est enabled
-            if not self.event_filters.get(category, True):
-                return
-            
-            event = {
-                "timestamp": datetime.now().isoformat(), 
-                "elapsed_time": round(time.time() - self.start_time, 3), 
-                "event_type": event_type, 
-                "data": data
-            }
-            self.logs.append(event)
-            if len(self.logs) % 10 == 0 or event_type in ['takeoff', 'land', 'emergency', 'detection']:
-                self._flush_to_file()
-    
-    def _flush_to_file(self):
-        import json
-        try:
-            with open(self.log_file, 'r') as f:
-                data = json.load(f)
-            data['events'].extend(self.logs)
-            data['last_update'] = datetime.now().isoformat()
-            data['total_events'] = len(data['events'])
-            with open(self.log_file, 'w') as f:
-                json.dump(data, f, indent=2)
-            self.logs = []
-        except: pass
-    
-    def finalize(self):
-        import json, time
-        self._flush_to_file()
-        try:
-            with open(self.log_file, 'r') as f:
-                data = json.load(f)
-            data['end_time'] = datetime.now().isoformat()
-            data['total_duration'] = round(time.time() - self.start_time, 2)
-            with open(self.log_file, 'w') as f:
-                json.dump(data, f, indent=2)
-        except: pass
-
 # CONFIGURATION & CONSTANTS
 # ============================================================================
 
@@ -180,6 +77,10 @@ class DroneMode(Enum):
     RTH = "return_to_home"
 
 
+# Codes entiers des modes pour la télémétrie binaire (colonne "mode")
+MODE_CODES = {mode: i for i, mode in enumerate(DroneMode)}
+
+
 @dataclass
 class Waypoint:
     x: float
@@ -189,6 +90,33 @@ class Waypoint:
     params: dict = None
 
 
+@dataclass(frozen=True)
+class DroneSnapshot:
+    """État publié une fois par pas par le thread de contrôle (lu sans verrou par l'UI)"""
+    step: int = 0
+    sim_time: float = 0.0
+    timestamp: float = 0.0
+    flying: bool = False
+    mode: DroneMode = DroneMode.MANUAL
+    x: float = 0.0
+    y: float = 0.0
+    z: float = 0.0
+    roll: float = 0.0
+    pitch: float = 0.0
+    yaw: float = 0.0
+    roll_rate: float = 0.0
+    pitch_rate: float = 0.0
+    yaw_rate: float = 0.0
+    speed: float = 0.0
+    target_alt: float = 0.0
+    bbox: tuple = None
+    search_target: str = None
+    tracking: bool = False
+    battery: float = 100.0
+    fps: float = 0.0
+    recording: bool = False
+
+
 LABEL_MAPPING = {
     "personne": "person", "voiture": "car", "auto": "car", "camion": "truck",
     "bus": "bus", "velo": "bicycle", "moto": "motorcycle", "chien": "dog",
@@ -202,6 +130,54 @@ def normalize_label(text):
         text = text.replace(color, "").strip()
     return LABEL_MAPPING.get(text, text)
 
+
+# ============================================================================
+# LAZY LOG PAYLOADS (évalués par le thread d'écriture, seulement si le canal est actif)
+# ============================================================================
+
+def imu_payload(roll, pitch, yaw):
+    return {"roll": round(roll, 4), "pitch": round(pitch, 4), "yaw": round(yaw, 4)}
+
+
+def altitude_payload(target, current, vertical_input):
+    return {
+        "target": round(target, 2),
+        "current": round(current, 2),
+        "error": round(target - current, 3),
+        "vertical_input": round(vertical_input, 3)
+    }
+
+
+def control_commands_payload(pitch_corr, yaw_corr, pitch_input, yaw_input, roll_input, vertical_input, mode):
+    return {
+        "pitch_corr": round(pitch_corr, 4),
+        "yaw_corr": round(yaw_corr, 4),
+        "pitch_input": round(pitch_input, 4),
+        "yaw_input": round(yaw_input, 4),
+        "roll_input": round(roll_input, 4),
+        "vertical_input": round(vertical_input, 4),
+        "mode": mode
+    }
+
+
+def motor_velocities_payload(fl, fr, rl, rr):
+    return {"front_left": round(fl, 2), "front_right": round(fr, 2),
+            "rear_left": round(rl, 2), "rear_right": round(rr, 2)}
+
+
+def position_payload(x, y, z, mode):
+    return {"x": round(x, 2), "y": round(y, 2), "z": round(z, 2), "mode": mode, "battery": 100}
+
+
+def follow_active_payload(cx, cy, bbox_width, bbox_height, bbox_percent):
+    return {
+        "target_center_x": round(cx, 1),
+        "target_center_y": round(cy, 1),
+        "bbox_width": round(bbox_width, 1),
+        "bbox_height": round(bbox_height, 1),
+        "bbox_percent": round(bbox_percent, 2)
+    }
+
 # ============================================================================
 # CACHED STATUS DATA (FIX POUR /status LENT)
 # ============================================================================
@@ -234,18 +210,30 @@ class CachedStatus:
 class HybridTracker:
     """STABLE hybrid detector with YOLO + KCF fusion"""
     
-    def __init__(self, yolo_model, target_class, min_bbox_size=15):
+    def __init__(self, detector, target_class, min_bbox_size=15, scheduler_config=None):
         import queue as q
         
-        self.yolo = yolo_model
+        self.detector = detector  # 🆕 Backend d'inférence (detectors.py) ou client d'InferenceService (même interface)
         self.target_class = target_class
         self.min_bbox_size = min_bbox_size
         
+        # 🆕 Classe cible résolue une seule fois: le modèle ne sort que cette classe
+        self.target_class_id = resolve_class_id(detector.names, target_class)
+        self.target_classes = [self.target_class_id] if self.target_class_id is not None else None
+        self.target_name = detector.names[self.target_class_id] if self.target_class_id is not None else target_class
+        if self.target_class_id is None:
+            print(f"[HybridTracker] Unknown class '{target_class}': detection disabled")
+        
         # Tracking
         self.tracker = None
         self.tracking_active = False
         self.last_detection_time = 0
-        self.redetect_interval = 0.3  # 🔧 REDUCED for reactive tracking
+        self.redetect_interval = 0.3  # 🔧 REDUCED for reactive tracking (🆕 intervalle de base du scheduler)
+        self.last_request_time = 0
+        # 🆕 Intervalle de re-détection adaptatif + budget CPU du détecteur
+        self.scheduler = DetectionScheduler(base_interval=self.redetect_interval)
+        if scheduler_config:
+            self.scheduler.configure(**scheduler_config)
         
         # State
         self.bbox = None
@@ -263,6 +251,16 @@ class HybridTracker:
         self.detection_history = []
         self.history_size = 5
         
+        # 🆕 Re-détection sur ROI pendant le tracking KCF (passe plein cadre périodique ou après des ratés)
+        self.roi_redetect = True
+        self.roi_scale = 2.0           # ROI = bbox agrandie x2 autour de son centre
+        self.roi_min_size = 96         # px
+        self.full_frame_every = 5      # 1 confirmation sur 5 en plein cadre
+        self.roi_max_misses = 2        # ratés ROI consécutifs avant une passe plein cadre
+        self._roi_passes_since_full = 0
+        self.roi_misses = 0
+        self.detect_stats = {"roi": 0, "full": 0, "roi_hits": 0, "roi_ms": 0.0, "full_ms": 0.0}
+        
         # Queue for asynchronous YOLO detections
         self.detection_queue = q.Queue(maxsize=1)
         self.frame_queue = q.Queue(maxsize=1)
@@ -276,19 +274,35 @@ class HybridTracker:
             self.detection_thread = threading.Thread(target=self._detection_loop, daemon=True)
             self.detection_thread.start()
     
-    def stop_detection_thread(self):
-        """Arrête le thread de détection"""
+    def stop_detection_thread(self, wait=True):
+        """Arrête le thread de détection (wait=False depuis le thread de contrôle)"""
         self.detection_running = False
-        if self.detection_thread:
+        if wait and self.detection_thread:
             self.detection_thread.join(timeout=1.0)
-    
+        self._release_pending_frame()
+        # 🆕 Client du service d'inférence partagé: libère sa place (requêtes en attente abandonnées)
+        close = getattr(self.detector, "close", None)
+        if close:
+            close()
+    
+    def _release_pending_frame(self):
+        """Rendre le bail d'une frame restée en file"""
+        import queue as q
+        try:
+            self.frame_queue.get_nowait()[0].release()
+        except q.Empty:
+            pass
+
     def _detection_loop(self):
         """Boucle de détection YOLO en arrière-plan"""
         import queue as q
         while self.detection_running:
             try:
-                frame = self.frame_queue.get(timeout=0.1)
-                bbox = self._detect_with_yolo_sync(frame)
+                frame, roi = self.frame_queue.get(timeout=0.1)
+                try:
+                    bbox = self._detect_with_yolo_sync(frame.image, roi)
+                finally:
+                    frame.release()
                 try:
                     self.detection_queue.put_nowait(bbox)
                 except q.Full:
@@ -298,46 +312,84 @@ class HybridTracker:
             except Exception as e:
                 print(f"[HybridTracker] Detection error: {e}")
                 time.sleep(0.1)
-    
-    def _detect_with_yolo_sync(self, frame):
-        """Detection YOLO synchrone"""
+        self._release_pending_frame()
+    
+    def _detect_with_yolo_sync(self, frame, roi=None):
+        """
+        Detection YOLO synchrone (filtre de classe côté modèle, sélection vectorisée).
+        roi=(x1, y1, x2, y2): inférence sur le crop seulement, boîtes ramenées au repère image.
+        """
+        if self.target_classes is None:
+            return None
         try:
-            results = self.yolo(frame, conf=0.25, verbose=False)[0]
-            best_box = None
-            best_area = -1.0
-            
-            for box in results.boxes:
-                cls_id = int(box.cls[0])
-                cls_name = self.yolo.names[cls_id]
-                conf = float(box.conf[0])
-                
-                if cls_name.lower() != self.target_class.lower():
-                    continue
-                
-                x1, y1, x2, y2 = box.xyxy[0].cpu().numpy().astype(int)
-                w = x2 - x1
-                h = y2 - y1
-                
-                if w < self.min_bbox_size or h < self.min_bbox_size:
-                    continue
-                
-                area = w * h
-                if area > best_area:
-                    best_area = area
-                    best_box = (x1, y1, x2, y2, cls_name, conf)
-            
-            return best_box
+            t0 = time.perf_counter()
+            if roi is not None:
+                rx1, ry1, rx2, ry2 = roi
+                crop = np.ascontiguousarray(frame[ry1:ry2, rx1:rx2])
+                xyxy, scores, _ = self.detector.detect(crop, conf=0.25, classes=self.target_classes,
+                                                       imgsz=roi_imgsz(roi))
+                xyxy[:, [0, 2]] += rx1
+                xyxy[:, [1, 3]] += ry1
+            else:
+                xyxy, scores, _ = self.detector.detect(frame, conf=0.25, classes=self.target_classes)
+            best = largest_box(xyxy, self.min_bbox_size)
+            self._count_pass(roi, best >= 0, time.perf_counter() - t0)
+            if best < 0:
+                return None
+            x1, y1, x2, y2 = (int(v) for v in xyxy[best])
+            return (x1, y1, x2, y2, self.target_name, float(scores[best]))
         except Exception as e:
             print(f"[HybridTracker] YOLO error: {e}")
             return None
     
-    def request_detection(self, frame):
-        """Demande une détection YOLO (non-bloquant)"""
+    def _count_pass(self, roi, hit, dt):
+        """Compteurs ROI / plein cadre (thread de détection)"""
+        stats = self.detect_stats
+        kind = "full" if roi is None else "roi"
+        stats[kind] += 1
+        stats[kind + "_ms"] += dt * 1000
+        self.scheduler.record_pass(dt)
+        if roi is None:
+            self.roi_misses = 0
+        elif hit:
+            stats["roi_hits"] += 1
+            self.roi_misses = 0
+        else:
+            self.roi_misses += 1
+    
+    def _redetect_roi(self, frame_shape):
+        """ROI de la prochaine confirmation, None pour une passe plein cadre"""
+        if not self.roi_redetect or self.bbox is None:
+            return None
+        if self.roi_misses >= self.roi_max_misses or self._roi_passes_since_full >= self.full_frame_every - 1:
+            self._roi_passes_since_full = 0
+            return None
+        self._roi_passes_since_full += 1
+        h_img, w_img = frame_shape[:2]
+        return expand_roi(self.bbox, w_img, h_img, self.roi_scale, self.roi_min_size)
+    
+    def request_detection(self, frame, roi=None):
+        """Demande une détection YOLO (non-bloquant, bail sur la Frame au lieu d'une copie)"""
         import queue as q
         try:
-            self.frame_queue.put_nowait(frame.copy())
+            self.frame_queue.put_nowait((frame.retain(), roi))
+            self.last_request_time = time.time()
         except q.Full:
-            pass
+            frame.release()
+    
+    def stats(self):
+        """Passes de détection ROI / plein cadre et coût moyen"""
+        stats = dict(self.detect_stats)
+        roi, full = stats["roi"], stats["full"]
+        return {
+            "tracking": self.tracking_active,
+            "roi_passes": roi,
+            "full_passes": full,
+            "roi_hit_ratio": round(stats["roi_hits"] / roi, 3) if roi else None,
+            "roi_ms": round(stats["roi_ms"] / roi, 2) if roi else None,
+            "full_ms": round(stats["full_ms"] / full, 2) if full else None,
+            "scheduler": self.scheduler.stats(),
+        }
     
     def get_detection_result(self):
         """Récupère le résultat de détection YOLO"""
@@ -359,6 +411,7 @@ class HybridTracker:
         self.confidence = score
         self.last_detection_time = time.time()
         self.track_id += 1
+        self.scheduler.reset()
     
     def _add_to_history(self, bbox):
         """Ajoute une détection à l'historique"""
@@ -383,11 +436,14 @@ class HybridTracker:
         return (int(x1_avg), int(y1_avg), int(x2_avg), int(y2_avg), last_det[4], last_det[5])
     
     def update(self, frame):
-        """Mise à jour STABLE du tracker avec fusion YOLO + KCF"""
+        """Mise à jour STABLE du tracker avec fusion YOLO + KCF (frame: camera_frames.Frame)"""
         current_time = time.time()
+        image = frame.image
         
         # Check if une nouvelle détection YOLO est disponible
         yolo_result = self.get_detection_result()
+        # 🆕 Validité de la dernière détection >= 2 intervalles de re-détection
+        validity = max(self.validity_duration, 2 * self.scheduler.interval)
         
         if yolo_result:
             # NOUVELLE DÉTECTION YOLO
@@ -400,9 +456,11 @@ class HybridTracker:
             
             # Reset or mettre update le tracker
             if not self.tracking_active:
-                self.init_tracker(frame, yolo_result)
+                self.init_tracker(image, yolo_result)
             else:
                 # FUSION: mise update without réinit
+                if self.bbox:
+                    self.scheduler.on_detection(bbox_iou(self.bbox, yolo_result))
                 self.bbox = yolo_result
                 self.confidence = yolo_result[5]
                 self.tracking_failures = 0
@@ -413,19 +471,23 @@ class HybridTracker:
         # No new détection YOLO
         if not self.tracking_active:
             # NOUVEAU: Utiliser dernière détection valide if récente
-            if self.last_valid_bbox and (current_time - self.last_valid_time) < self.validity_duration:
-                self.request_detection(frame)
+            # 🆕 Détections de recherche bornées par le budget CPU du scheduler
+            searching = self.scheduler.allow(current_time, self.last_request_time)
+            if self.last_valid_bbox and (current_time - self.last_valid_time) < validity:
+                if searching:
+                    self.request_detection(frame)
                 return self.last_valid_bbox
             
-            self.request_detection(frame)
+            if searching:
+                self.request_detection(frame)
             return None
         
-        # Demander re-détection périodique
-        if current_time - self.last_detection_time > self.redetect_interval:
-            self.request_detection(frame)
+        # Demander re-détection (🆕 intervalle adaptatif, sur ROI autour de la bbox, plein cadre périodiquement)
+        if self.scheduler.due(current_time, self.last_detection_time, self.last_request_time):
+            self.request_detection(frame, self._redetect_roi(image.shape))
         
         # Mise update du tracker KCF
-        success, tracker_bbox = self.tracker.update(frame)
+        success, tracker_bbox = self.tracker.update(image)
         
         if success:
             x, y, w, h = [int(v) for v in tracker_bbox]
@@ -433,7 +495,7 @@ class HybridTracker:
             x2, y2 = x + w, y + h
             
             # Clamp aux limites
-            h_img, w_img = frame.shape[:2]
+            h_img, w_img = image.shape[:2]
             x1 = max(0, min(x1, w_img - 1))
             x2 = max(0, min(x2, w_img - 1))
             y1 = max(0, min(y1, h_img - 1))
@@ -446,6 +508,7 @@ class HybridTracker:
             conf = self.confidence  # Garde confiance YOLO
             
             self.bbox = (x1, y1, x2, y2, name, conf)
+            self.scheduler.observe(current_time, True, self.bbox)
             
             # Ajouter at l'historique
             self._add_to_history(self.bbox)
@@ -458,9 +521,10 @@ class HybridTracker:
         else:
             # Tracking a failed
             self.tracking_failures += 1
+            self.scheduler.observe(current_time, False)
             
             # NOUVEAU: Utiliser dernière détection valide if récente
-            if self.last_valid_bbox and (current_time - self.last_valid_time) < self.validity_duration:
+            if self.last_valid_bbox and (current_time - self.last_valid_time) < validity:
                 return self.last_valid_bbox
             
             # Trop d'échecs: désactiver tracking
@@ -505,7 +569,15 @@ class VideoRecorder:
 # ============================================================================
 
 class MisifonExecutor:
-    """Exécuteur de missions automatisées"""
+    """Exécuteur de missions automatisées, avancé d'un pas par _control_step (temps simulation)"""
+    
+    IDLE = "idle"
+    NAVIGATING = "navigating"
+    HOLDING = "holding"  # hover / stabilisation avant photo, minuté en temps simulation
+    DONE = "done"
+    
+    PHOTO_SETTLE = 0.5  # s de stabilisation avant la photo
+    ACTIONS = ("goto", "search", "photo", "hover")
     
     def __init__(self, drone):
         self.drone = drone
@@ -513,6 +585,9 @@ class MisifonExecutor:
         self.current_step = 0
         self.running = False
         self.waypoint_threshold = 0.3  # mètres
+        self.altitude_threshold = 0.5  # mètres
+        self.state = self.IDLE
+        self._hold_until = 0.0
     
     def add_waypoint(self, wp):
         self.mission.append(wp)
@@ -521,43 +596,165 @@ class MisifonExecutor:
         self.mission = []
         self.current_step = 0
         self.running = False
+        self.state = self.IDLE
     
     def start(self):
         if not self.mission:
             return False
         self.running = True
         self.current_step = 0
+        self.state = self.NAVIGATING
         return True
     
     def stop(self):
         self.running = False
+        self.state = self.IDLE
     
-    def update(self):
-        if not self.running or not self.mission:
-            return False
-        
-        if self.current_step >= len(self.mission):
-            self.running = False
-            return False
+    def update(self, sim_time, x, y, z, yaw):
+        """
+        Avance la mission d'un pas avec la pose déjà lue par le pas de
+        contrôle. Retourne (pitch_corr, yaw_corr); (0, 0) une fois terminée.
+        """
+        if not self.running or self.current_step >= len(self.mission):
+            self._finish()
+            return 0.0, 0.0
         
         wp = self.mission[self.current_step]
-        x, y, z = self.drone.gps.getValues()
+        drone = self.drone
+        drone.target_alt = wp.z
+        
+        if self.state == self.HOLDING:
+            if sim_time < self._hold_until:
+                return 0.0, 0.0
+            if wp.action == "photo":
+                drone.take_photo()
+            self._advance()
+            return 0.0, 0.0
         
         dist = distance_2d((x, y), (wp.x, wp.y))
         alt_diff = abs(z - wp.z)
         
-        if dist < self.waypoint_threshold and alt_diff < 0.5:
-            if wp.action == "photo":
-                self.drone.take_photo()
-            elif wp.action == "hover":
-                time.sleep(wp.params.get("duration", 2.0) if wp.params else 2.0)
-            
-            self.current_step += 1
+        if dist < self.waypoint_threshold and alt_diff < self.altitude_threshold:
+            drone.action_logger.log_event("waypoint_reached", {
+                "index": self.current_step, "action": wp.action,
+                "x": round(wp.x, 2), "y": round(wp.y, 2), "z": round(wp.z, 2)})
+            params = wp.params or {}
+            if wp.action == "hover":
+                self.state = self.HOLDING
+                self._hold_until = sim_time + params.get("duration", 2.0)
+            elif wp.action == "photo":
+                self.state = self.HOLDING
+                self._hold_until = sim_time + params.get("settle", self.PHOTO_SETTLE)
+            elif wp.action == "search":
+                # La recherche prend la main: fin de mission
+                self.running = False
+                self.state = self.DONE
+                drone._cmd_start_search(params.get("target", "person"))
+            else:
+                self._advance()
+            return 0.0, 0.0
+        
+        # Navigation vers le waypoint (même loi que RTH)
+        yaw_error = math.atan2(wp.y - y, wp.x - x) - yaw
+        yaw_error = math.atan2(math.sin(yaw_error), math.cos(yaw_error))
+        return -0.05, 0.3 * yaw_error
+    
+    def _advance(self):
+        self.current_step += 1
+        self.state = self.NAVIGATING
+        if self.current_step >= len(self.mission):
+            self._finish()
+    
+    def _finish(self):
+        """Fin de mission: le drone reste en vol stationnaire en mode manuel"""
+        if self.state == self.DONE:
+            return
+        self.running = False
+        self.state = self.DONE
+        drone = self.drone
+        if drone.drone_mode == DroneMode.WAYPOINT:
+            drone.drone_mode = DroneMode.MANUAL
+            drone.action_logger.log_event("mode_change", {"mode": "manual", "reason": "mission_complete"})
+            drone._ring(logging.INFO, "🏁 Mission complete ({} waypoints)".format(len(self.mission)))
+    
+    def to_dict(self):
+        mission, step = self.mission, self.current_step  # lu depuis Flask: références locales
+        wp = mission[step] if step < len(mission) else None
+        return {
+            "state": self.state,
+            "running": self.running,
+            "step": step,
+            "waypoints": len(mission),
+            "current": {"x": wp.x, "y": wp.y, "z": wp.z, "action": wp.action} if wp else None,
+        }
+
+
+# ============================================================================
+# DESCENT SEQUENCE
+# ============================================================================
+
+class DescentSequence:
+    """Atterrissage / descente d'urgence pilotés pas à pas par le temps simulation"""
+    
+    DESCENDING = "descending"
+    SPIN_DOWN = "spin_down"
+    DONE = "done"
+    
+    LOOKAHEAD = 0.05       # s: anticipation de la consigne d'altitude (ancienne période de boucle)
+    SPIN_DOWN_STEP = 0.02  # s de simulation par palier de réduction moteurs
+    
+    def __init__(self, kind, start_time, target_height, descent_rate, spin_down,
+                 level, message, timeout=30.0):
+        self.kind = kind
+        self.start_time = start_time
+        self.target_height = target_height
+        self.descent_rate = descent_rate
+        self.spin_down = spin_down
+        self.level = level
+        self.message = message
+        self.timeout = timeout
+        self.state = self.DESCENDING
+        self._velocity = 10
+        self._next_time = 0.0
+    
+    def update(self, drone, sim_time, z):
+        """Avance d'un pas; False quand la séquence est terminée"""
+        if self.state == self.DESCENDING:
+            if z > self.target_height and sim_time - self.start_time < self.timeout:
+                drone.target_alt = max(self.target_height, z - self.descent_rate * self.LOOKAHEAD)
+                return True
+            drone.flying = False
+            drone.is_flying = False
+            if not self.spin_down:
+                drone._set_idle_motors()
+                self.state = self.DONE
+                return False
+            self.state = self.SPIN_DOWN
+            self._next_time = sim_time
+        
+        if self.state == self.SPIN_DOWN:
+            if sim_time >= self._next_time:
+                if self._velocity > 0:
+                    # Réduction rapide des moteurs: paliers of 2 (1.0 -> 0.2)
+                    for m in drone.motors.values():
+                        m.setVelocity(self._velocity / 10.0)
+                    self._velocity -= 2
+                    self._next_time = sim_time + self.SPIN_DOWN_STEP
+                else:
+                    drone._set_idle_motors()
+                    self.state = self.DONE
+                    return False
             return True
         
-        # Navigation vers le waypoint
-        self.drone._navigate_to(wp.x, wp.y, wp.z)
-        return True
+        return False
+    
+    def to_dict(self, sim_time=None):
+        return {
+            "kind": self.kind,
+            "state": self.state,
+            "target_height": self.target_height,
+            "elapsed": round(sim_time - self.start_time, 2) if sim_time is not None else None,
+        }
 
 
 # ============================================================================
@@ -632,12 +829,14 @@ class UltimateDroneController(Robot):
     ORBIT_SPEED = 0.2
     
     HTTP_PORT = int(os.getenv("PORT", "5010"))
+    DETECTOR_BACKEND = os.getenv("DETECTOR", BACKEND_ULTRALYTICS)  # 🆕 ultralytics | onnx (cv2.dnn)
+    CAMERA_ERROR_LOG_PERIOD = 5.0  # s de simulation entre deux logs d'erreur de décodage caméra
     
     def __init__(self):
         super().__init__()
 
         # Logger système
-        self.action_logger = DroneActionLogger("drone_flight_log.json")
+        self.action_logger = DroneActionLogger("drone_flight_log.json", storage=STORAGE_JSONL, compression="gzip")
         self._last_movement_log_time = time.time()
         
         self.time_step = int(self.getBasicTimeStep())
@@ -696,8 +895,19 @@ class UltimateDroneController(Robot):
         else:
             self.yolo_model = YOLO(model_path)
         
+        # 🆕 Backend d'inférence partagé par les HybridTracker (repli sur Ultralytics si l'ONNX échoue)
+        try:
+            self.detector = create_detector(self.DETECTOR_BACKEND, self.yolo_model, onnx_path_for(model_path))
+        except Exception as e:
+            print(f"[Detector] '{self.DETECTOR_BACKEND}' unavailable ({e}), using Ultralytics")
+            self.detector = create_detector(BACKEND_ULTRALYTICS, self.yolo_model)
+        print(f"[Detector] Backend: {self.detector.backend}")
+        # 🆕 Service d'inférence: un seul thread possède le modèle, les trackers y soumettent leurs images en batch
+        self.inference = InferenceService(self.detector)
+        
         self.hybrid_tracker = None
         self.search_target = None
+        self.detection_budget = {}  # 🆕 Réglages DetectionScheduler appliqués à chaque nouveau HybridTracker
         
         # Batterie
         self.battery = BatteryManager()
@@ -714,6 +924,8 @@ class UltimateDroneController(Robot):
         # Recording
         self.video_recorder = None
         self.photo_counter = 0
+        self.telemetry_recorder = None  # 🆕 Télémétrie binaire haute fréquence
+        self._step_count = 0
         
         # UI
         self.HTTP_PORT = 5010
@@ -726,8 +938,36 @@ class UltimateDroneController(Robot):
         
         # FPS
         self._det_times = deque(maxlen=30)
-        self._last_frame = None
-        self._frame_lock = threading.Lock()
+        self.profiler = LoopProfiler(self.time_step)  # 🆕 Histogrammes par phase (désactivé par défaut)
+        self.load_shedder = LoadShedder(self.time_step)  # 🆕 Délestage du travail soft hors budget
+        self.tracer = TraceBuffer()  # 🆕 Traces FOLLOW/SEARCH échantillonnées (remplace les print)
+        
+        # 🆕 Bus de commandes: Flask dépose, _control_step exécute (un seul thread touche Webots)
+        self.command_bus = CommandBus()
+        self._command_handlers = {
+            "takeoff": self._cmd_takeoff,
+            "land": self._cmd_land,
+            "emergency": self._cmd_emergency_stop,
+            "rth": self._cmd_return_home,
+            "stop": self._cmd_stop_search,
+            "follow": self._cmd_follow_mode,
+            "orbit": self._cmd_orbit_mode,
+            "manual": self._cmd_manual_mode,
+            "photo": self.take_photo,
+            "record": self._cmd_toggle_recording,
+            "telemetry": self._cmd_toggle_telemetry,
+            "search": self._cmd_start_search,
+            "set_target_altitude": self._cmd_set_target_altitude,
+            "mission_start": self._cmd_start_mission,
+            "mission_stop": self._cmd_stop_mission,
+        }
+        self._descent = None  # DescentSequence en cours (land/emergency), avancée à chaque pas
+        self._pose = (0.0, 0.0, 0.0)  # Dernière position GPS lue par le thread de contrôle
+        self._snapshot = DroneSnapshot()  # 🆕 Remplacé (jamais modifié) à chaque pas
+        self.frame_cache = FrameCache(self.cam_w, self.cam_h)  # 🆕 Anneau BGR préalloué, une conversion par pas
+        self._camera_errors = 0  # erreurs de décodage caméra (total)
+        self._camera_errors_pending = 0  # non loguées depuis le dernier log
+        self._camera_error_next = float("-inf")  # prochain log autorisé (temps simulation)
         
         # Controls manuels (ENHANCED)
         self.manual_controls = {
@@ -754,8 +994,8 @@ class UltimateDroneController(Robot):
         avg = sum(self._det_times) / len(self._det_times)
         return 1.0 / avg if avg > 1e-6 else 0.0
     
-    def get_camera_bgr(self):
-        """Récupère l'image de la caméra (VERSION ORIGINALE QUI FONCTIONNAIT)"""
+    def get_camera_bgr(self, dst=None):
+        """Récupère l'image de la caméra (écrite dans dst si fourni, sans allocation)"""
         try:
             raw = self.camera.getImage()
         except (ValueError, AttributeError):
@@ -764,130 +1004,209 @@ class UltimateDroneController(Robot):
             return None
         buf = np.frombuffer(raw, dtype=np.uint8)
         if buf.size != self.cam_w * self.cam_h * 4:
-            img = np.zeros((self.cam_h, self.cam_w, 3), np.uint8)
-            for y in range(self.cam_h):
-                for x in range(self.cam_w):
-                    r = self.camera.imageGetRed(raw, self.cam_w, x, y)
-                    g = self.camera.imageGetGreen(raw, self.cam_w, x, y)
-                    b = self.camera.imageGetBlue(raw, self.cam_w, x, y)
-                    img[y, x] = [b, g, r]
-            bgr = img
+            # Stride/padding ou layout inattendu: décodage vectorisé (plus de boucle par pixel)
+            try:
+                bgr = decode_camera_image(raw, self.cam_w, self.cam_h, dst=dst)
+            except ValueError as e:
+                self._camera_decode_error(e)
+                return None
         else:
             bgra = buf.reshape((self.cam_h, self.cam_w, 4))
-            bgr = bgra[:, :, :3].copy(order="C")
-        
-        with self._frame_lock:
-            self._last_frame = bgr
+            bgr = cv2.cvtColor(bgra, cv2.COLOR_BGRA2BGR, dst=dst)
         return bgr
     
+    def _camera_decode_error(self, error):
+        """Première erreur loguée, puis au plus une fois par CAMERA_ERROR_LOG_PERIOD avec le compte"""
+        self._camera_errors += 1
+        self._camera_errors_pending += 1
+        now = self.getTime()
+        if now < self._camera_error_next:
+            return
+        self._camera_error_next = now + self.CAMERA_ERROR_LOG_PERIOD
+        count = self._camera_errors_pending
+        self._camera_errors_pending = 0
+        suffix = " ({} since last report, {} total)".format(count, self._camera_errors) if count > 1 else ""
+        self._ring(logging.WARNING, "Camera decode error: {}{}".format(error, suffix))
+    
+    def current_frame(self):
+        """Frame du pas courant, convertie au plus une fois par pas (thread de contrôle)"""
+        frame = self.frame_cache.latest()
+        if frame is not None and frame.step == self._step_count:
+            return frame
+        slot, dst = self.frame_cache.claim()
+        bgr = self.get_camera_bgr(dst)
+        if bgr is None:
+            self.frame_cache.abandon(slot)
+            return None
+        return self.frame_cache.publish(bgr, self._step_count, self.getTime(), slot)
+    
     def take_photo(self):
-        """Prend une photo"""
-        frame = self.get_camera_bgr()
+        """Prend une photo (thread de contrôle: commande du bus ou action de mission)"""
+        frame = self.current_frame()
         if frame is not None:
             filename = "photo_{:04d}.jpg".format(self.photo_counter)
-            cv2.imwrite(filename, frame)
+            cv2.imwrite(filename, frame.image)
             self.photo_counter += 1
             self._ring(logging.INFO, "📸 Photo saved: {}".format(filename))
     
     def _cmd_takeoff(self):
         """Takeoff"""
         self.action_logger.log_event("takeoff", {"message": "Drone taking off"})
+        self._descent = None  # Annule une descente / un spin-down en cours
         with self._state_lock:
             self.flying = True
             self.is_flying = True  # Pour compatibilité
             self.drone_mode = DroneMode.MANUAL
+            x, y, z = self.gps.getValues()
+            self._pose = (x, y, z)  # Pose de départ (vitesse / descente) avant le premier pas en vol
             if self.home_position is None:
-                x, y, z = self.gps.getValues()
                 self.home_position = (x, y, 0)
         
         self._ring(logging.INFO, "🛫 Taking off...")
     
     def _cmd_land(self):
-        """Landing en douceur (ENHANCED)"""
+        """Landing en douceur (ENHANCED): démarre la séquence, avancée à chaque pas"""
+        if self._descent is not None:
+            # Déjà en descente (land ou emergency): rien à faire
+            return self._descent.state
+        if not self.flying:
+            return "landed"
+        
         self.action_logger.log_event("land", {"message": "Drone landing"})
         self._ring(logging.INFO, "🛬 Landing...")
-        
-        with self._state_lock:
-            if self.hybrid_tracker:
-                self.hybrid_tracker.stop_detection_thread()
-                self.hybrid_tracker = None
-            self.drone_mode = DroneMode.MANUAL
-            self._bbox = None
-            self._bbox_ema = None
+        self._stop_tracking_for_descent()
         
         # ENHANCED: Descente progresifve
-        try:
-            x, y, z = self.gps.getValues()
-            target_height = 0.3
-            descent_rate = 1.5  # m/s (more rapide)
-            
-            while z > target_height and not self._shutdown:
-                x, y, z = self.gps.getValues()
-                self.target_alt = max(target_height, z - descent_rate * 0.05)
-                time.sleep(0.05)  # Mise update more fréquente
-            
-            self.flying = False
-            self.is_flying = False
-            
-            # Réduction rapide des moteurs
-            for velocity in range(10, 0, -2):  # Par pas of 2 au lieu of 1
-                for m in self.motors.values():
-                    m.setVelocity(velocity / 10.0)
-                time.sleep(0.02)  # Plus rapide
-            
-            for m in self.motors.values():
-                m.setVelocity(1.0)
-            
-            self._ring(logging.INFO, "✅ Landed safely")
-        except Exception as e:
-            self._ring(logging.ERROR, f"Land error: {e}")
-            self.flying = False
-            self.is_flying = False
+        self._descent = DescentSequence(
+            "land", self.getTime(),
+            target_height=0.3,
+            descent_rate=1.5,  # m/s (more rapide)
+            spin_down=True,
+            level=logging.INFO,
+            message="✅ Landed safely",
+        )
+        return self._descent.state
     
     def _cmd_emergency_stop(self):
-        """Arrêt d'urgence avec descente contrôlée (ENHANCED)"""
+        """Arrêt d'urgence avec descente contrôlée (ENHANCED): prend le pas sur un land en cours"""
+        if self._descent is not None and self._descent.kind == "emergency":
+            return self._descent.state
+        if not self.flying and self._descent is None:
+            return "landed"
+        
         self.action_logger.log_event("emergency", {"message": "Emergency stop"})
         self._ring(logging.WARNING, "🚨 EMERGENCY LANDING!")
+        self._stop_tracking_for_descent()
         
+        # ENHANCED: Descente d'urgence mais contrôlée
+        self._descent = DescentSequence(
+            "emergency", self.getTime(),
+            target_height=0.2,
+            descent_rate=2.5,  # Descente rapide (5x more rapide)
+            spin_down=False,
+            level=logging.WARNING,
+            message="⚠️ Emergency landing completed",
+        )
+        return self._descent.state
+    
+    def _stop_tracking_for_descent(self):
+        """Coupe le tracking sans attendre le thread YOLO (thread de contrôle)"""
         with self._state_lock:
             if self.hybrid_tracker:
-                self.hybrid_tracker.stop_detection_thread()
+                self.hybrid_tracker.stop_detection_thread(wait=False)
                 self.hybrid_tracker = None
             self.drone_mode = DroneMode.MANUAL
-        
-        # ENHANCED: Descente d'urgence mais contrôlée
-        try:
-            x, y, z = self.gps.getValues()
-            target_height = 0.2
-            descent_rate = 2.5  # Descente rapide (5x more rapide)
-            
-            while z > target_height and not self._shutdown:
-                x, y, z = self.gps.getValues()
-                self.target_alt = max(target_height, z - descent_rate * 0.05)
-                time.sleep(0.05)
-            
-            self.flying = False
-            self.is_flying = False
-            
-            for m in self.motors.values():
-                m.setVelocity(1.0)
-            
-            self._ring(logging.WARNING, "⚠️ Emergency landing completed")
-        except Exception as e:
-            self._ring(logging.ERROR, f"Emergency error: {e}")
-            for m in self.motors.values():
-                m.setVelocity(0.0)
-            self.flying = False
-            self.is_flying = False
+            self._bbox = None
+            self._bbox_ema = None
+        self.misifon_executor.stop()
+    
+    def _set_idle_motors(self):
+        """Rotation lente au sol (mode idle)"""
+        for m in self.motors.values():
+            m.setVelocity(1.0)
+    
+    def _publish_snapshot(self, sim_time, attitude=None, rates=None):
+        """Publie l'état du pas (thread de contrôle); attitude/rates du snapshot précédent si absents"""
+        prev = self._snapshot
+        x, y, z = self._pose
+        roll, pitch, yaw = attitude if attitude else (prev.roll, prev.pitch, prev.yaw)
+        roll_rate, pitch_rate, yaw_rate = rates if rates else (prev.roll_rate, prev.pitch_rate, prev.yaw_rate)
+        dt = sim_time - prev.sim_time
+        # Vitesse entre deux pas en vol seulement (au décollage, la pose précédente n'est pas une mesure)
+        if not (self.flying and prev.flying):
+            speed = 0.0
+        elif dt > 0:
+            speed = distance_2d((x, y), (prev.x, prev.y)) / dt
+        else:
+            speed = prev.speed
+        tracker = self.hybrid_tracker
+        self._snapshot = DroneSnapshot(
+            step=self._step_count,
+            sim_time=sim_time,
+            timestamp=time.time(),
+            flying=self.flying,
+            mode=self.drone_mode,
+            x=x, y=y, z=z,
+            roll=roll, pitch=pitch, yaw=yaw,
+            roll_rate=roll_rate, pitch_rate=pitch_rate, yaw_rate=yaw_rate,
+            speed=speed,
+            target_alt=self.target_alt,
+            bbox=self._bbox_ema if self._bbox_ema is not None else self._bbox,
+            search_target=self.search_target,
+            tracking=bool(tracker and tracker.tracking_active),
+            battery=self.battery.get_percentage(),
+            fps=self.det_fps(),
+            recording=self.video_recorder is not None,
+        )
+    
+    def _cmd_manual_mode(self):
+        """Repasse en mode manuel"""
+        with self._state_lock:
+            self.drone_mode = DroneMode.MANUAL
+        self.action_logger.log_event("mode_change", {"mode": "manual", "reason": "command"})
+    
+    def _cmd_set_target_altitude(self, altitude):
+        """Altitude cible (bornée 0.5-5 m)"""
+        altitude = max(0.5, min(5.0, altitude))
+        self.target_alt = altitude
+        self.target_altitude = altitude
+        return altitude
+    
+    def _cmd_toggle_recording(self):
+        if self.video_recorder:
+            self._cmd_stop_recording()
+        else:
+            self._cmd_start_recording()
+        return self.video_recorder is not None
+    
+    def _cmd_toggle_telemetry(self):
+        if self.telemetry_recorder:
+            self._cmd_stop_telemetry()
+        else:
+            self._cmd_start_telemetry()
+        return self.telemetry_recorder is not None
+    
+    def _dispatch_command(self, name, *args, **kwargs):
+        """Exécute une commande du bus (thread de contrôle)"""
+        handler = self._command_handlers.get(name)
+        if handler is None:
+            raise ValueError("Unknown command: {}".format(name))
+        return handler(*args, **kwargs)
     
     def _cmd_start_search(self, query):
         """Lance une recherche d'objet"""
         normalized = normalize_label(query)
         self.search_target = normalized
         
-        self.hybrid_tracker = HybridTracker(self.yolo_model, normalized)
+        # 🆕 Nouvelle recherche: l'ancien tracker rend son thread et son client d'inférence
+        previous = self.hybrid_tracker
+        if previous:
+            previous.stop_detection_thread(wait=False)
+        self.hybrid_tracker = HybridTracker(self.inference.register(normalized), normalized,
+                                            scheduler_config=self.detection_budget)
         self.hybrid_tracker.start_detection_thread()  # CRITICAL: Start le thread
         self.drone_mode = DroneMode.SEARCH
+        self.action_logger.log_event("mode_change", {"mode": "search", "reason": "command", "target": normalized})
         
         self._ring(logging.INFO, "🔍 Searching for: {}".format(normalized))
     
@@ -906,18 +1225,21 @@ class UltimateDroneController(Robot):
             self._yaw_override = 0.0
             self.manual_yaw = 0.0
         
+        self.action_logger.log_event("mode_change", {"mode": "manual", "reason": "stop_search"})
         self._ring(logging.INFO, "⏹ Search stopped")
     
     def _cmd_follow_mode(self):
         """Active le mode Follow"""
         if self.hybrid_tracker and self.hybrid_tracker.tracking_active:
             self.drone_mode = DroneMode.FOLLOW
+            self.action_logger.log_event("mode_change", {"mode": "follow", "reason": "command"})
             self._ring(logging.INFO, "🎯 Follow mode activated")
     
     def _cmd_orbit_mode(self):
         """Active le mode Orbit"""
         if self.hybrid_tracker and self.hybrid_tracker.tracking_active:
             self.drone_mode = DroneMode.ORBIT
+            self.action_logger.log_event("mode_change", {"mode": "orbit", "reason": "command"})
             self._ring(logging.INFO, "🔄 Orbit mode activated")
     
     def _cmd_return_home(self):
@@ -925,8 +1247,56 @@ class UltimateDroneController(Robot):
         self.action_logger.log_event("return_to_home", {"message": "RTH"})
         if self.home_position:
             self.drone_mode = DroneMode.RTH
+            self.action_logger.log_event("mode_change", {"mode": "return_to_home", "reason": "command"})
             self._ring(logging.INFO, "🏠 Returning home...")
     
+    def _cmd_start_mission(self, waypoints=None):
+        """Démarre une mission (waypoints: liste de dicts x, y, z, action, params)"""
+        executor = self.misifon_executor
+        # Validation complète avant de toucher à la mission mémorisée
+        if not self.flying:
+            raise ValueError("Drone not flying")
+        if waypoints is not None:
+            waypoints = self._parse_waypoints(waypoints)
+            executor.clear_misifon()
+            for wp in waypoints:
+                executor.add_waypoint(wp)
+        if not executor.start():
+            raise ValueError("Empty mission")
+        self.drone_mode = DroneMode.WAYPOINT
+        self.action_logger.log_event("mode_change", {"mode": "waypoint", "reason": "command",
+                                                     "waypoints": len(executor.mission)})
+        self._ring(logging.INFO, "🗺️ Mission started ({} waypoints)".format(len(executor.mission)))
+        return executor.to_dict()
+    
+    def _parse_waypoints(self, waypoints):
+        """Liste de dicts {x, y, z, action, params} -> [Waypoint]; ValueError si invalide"""
+        if not isinstance(waypoints, (list, tuple)):
+            raise ValueError("Waypoints must be a list")
+        if not waypoints:
+            raise ValueError("Empty mission")
+        parsed = []
+        for i, wp in enumerate(waypoints):
+            try:
+                wp = Waypoint(**wp)
+                wp.x, wp.y, wp.z = float(wp.x), float(wp.y), float(wp.z)
+            except (TypeError, ValueError) as e:
+                raise ValueError("Invalid waypoint {}: {}".format(i, e))
+            if wp.action not in MisifonExecutor.ACTIONS:
+                raise ValueError("Invalid waypoint {}: unknown action '{}'".format(i, wp.action))
+            if wp.params is not None and not isinstance(wp.params, dict):
+                raise ValueError("Invalid waypoint {}: params must be an object".format(i))
+            parsed.append(wp)
+        return parsed
+    
+    def _cmd_stop_mission(self):
+        """Interrompt la mission en cours (vol stationnaire)"""
+        self.misifon_executor.stop()
+        if self.drone_mode == DroneMode.WAYPOINT:
+            self.drone_mode = DroneMode.MANUAL
+            self.action_logger.log_event("mode_change", {"mode": "manual", "reason": "mission_stop"})
+        self._ring(logging.INFO, "⏹ Mission stopped")
+    
     def _cmd_start_recording(self):
         """Démarre l'enregistrement vidéo"""
         if not self.video_recorder:
@@ -943,59 +1313,43 @@ class UltimateDroneController(Robot):
             self._ring(logging.INFO, "⏹ Recording stopped: {} ({:.1f}s, {} frames)".format(
                 fname, duration, frames))
     
-    def _navigate_to(self, target_x, target_y, target_z):
-        """Navigation vers un point"""
-        x, y, z = self.gps.getValues()
-        
-        dx = target_x - x
-        dy = target_y - y
-        dz = target_z - z
-        
-        dist_2d = math.sqrt(dx**2 + dy**2)
-        
-        if dist_2d > 0.1:
-            vx = dx / dist_2d * 0.5
-            vy = dy / dist_2d * 0.5
-        else:
-            vx, vy = 0.0, 0.0
-        
-        vz = dz * 2.0
-        
-        self._apply_velocity(vx, vy, vz, 0.0)
-    
-    def _apply_velocity(self, vx, vy, vz, yaw_rate):
-        """Applique une vélocité au drone"""
-        vx = clamp(vx, -1.0, 1.0)
-        vy = clamp(vy, -1.0, 1.0)
-        vz = clamp(vz, -2.0, 2.0)
-        yaw_rate = clamp(yaw_rate, -1.0, 1.0)
-        
-        # CORRECTION: base_speed augmentée for assurer le vol
-        base_speed = 68.0  # Speed nécessaire for maintenir le vol
-        
-        # Calculate ifmplifié des vitesses moteurs
-        m1 = base_speed + vz * 10 + vy * 5 - vx * 5 + yaw_rate * 5
-        m2 = base_speed + vz * 10 - vy * 5 - vx * 5 - yaw_rate * 5
-        m3 = base_speed + vz * 10 - vy * 5 + vx * 5 + yaw_rate * 5
-        m4 = base_speed + vz * 10 + vy * 5 + vx * 5 - yaw_rate * 5
-        
-        self.motors["front_left"].setVelocity(m1)
-        self.motors["front_right"].setVelocity(m2)
-        self.motors["rear_left"].setVelocity(m3)
-        self.motors["rear_right"].setVelocity(m4)
-    
-    def _check_geofence(self):
-        """Vérifie le geofencing"""
-        if not self.home_position:
+    def _cmd_start_telemetry(self):
+        """Démarre l'enregistrement télémétrie binaire (.npy)"""
+        if not self.telemetry_recorder:
+            out_dir = "telemetry_{}".format(time.strftime("%Y%m%d_%H%M%S"))
+            self.telemetry_recorder = TelemetryRecorder(out_dir, metadata={
+                "sesifon_id": self.action_logger.sesifon_id,
+                "basic_time_step_ms": self.time_step,
+                "mode_codes": {mode.value: code for mode, code in MODE_CODES.items()},
+            })
+            self.action_logger.log_event("telemetry_start", {"out_dir": out_dir})
+            self._ring(logging.INFO, "📈 Telemetry started: {}".format(out_dir))
+    
+    def _cmd_stop_telemetry(self, wait=False):
+        """Arrête l'enregistrement télémétrie (sans attendre les écritures depuis le thread de contrôle)"""
+        recorder = self.telemetry_recorder
+        if recorder:
+            self.telemetry_recorder = None
+            recorder.close(wait=wait, on_closed=self._telemetry_closed)
+    
+    def _telemetry_closed(self, recorder):
+        """Appelé par le writer de télémétrie une fois les derniers chunks écrits"""
+        samples = sum(ch["samples"] for ch in recorder.stats().values())
+        self.action_logger.log_event("telemetry_stop", {"out_dir": recorder.out_dir, "samples": samples})
+        self._ring(logging.INFO, "⏹ Telemetry stopped: {} ({} samples)".format(recorder.out_dir, samples))
+    
+    def _check_geofence(self, x, y):
+        """Vérifie le geofencing avec la pose du pas (RTH déclenché une seule fois par sortie)"""
+        if not self.home_position or self.drone_mode == DroneMode.RTH or self._descent is not None:
             return True
         
-        x, y, _ = self.gps.getValues()
         home_x, home_y, _ = self.home_position
         
         dist = distance_2d((x, y), (home_x, home_y))
         
         if dist > self.geofence_radius:
             self._ring(logging.WARNING, "⚠️ Geofence breach! Returning home...")
+            self.misifon_executor.stop()
             self._cmd_return_home()
             return False
         
@@ -1005,42 +1359,72 @@ class UltimateDroneController(Robot):
         """Control loop principale (DEPUIS FICHIER ORIGINAL)"""
         # Mesure FPS (VERSION ORIGINALE)
         t0 = time.time()
-        
-        # Mode idle if pas en vol
+        # 🆕 Profilage par phase (prof = None si désactivé: un simple test par point de mesure)
+        prof = self.profiler.begin_step()
+        if prof:
+            t = prof.step_start
+        shed = self.load_shedder
+        shed.begin_step()
+        self._step_count += 1
+        sim_time = self.getTime()
+        self.action_logger.sim_time = sim_time  # 🆕 Corrélation événements <-> pas de simulation
+        
+        # 🆕 Commandes HTTP en attente (exécutées ici, jamais sur les threads Flask)
+        if self.command_bus.pending():
+            self.command_bus.drain(self._dispatch_command)
+        
+        # 🆕 Acquisition caméra unique pour ce pas si un client MJPEG / une photo attend
+        if self.frame_cache.wanted():
+            self.current_frame()
+        if prof:
+            t = prof.mark("camera", t)
+        
+        # 🆕 Séquence land/emergency (descente puis spin-down), pilotée par le temps simulation
+        descent = self._descent
+        if descent is not None and not descent.update(self, sim_time, self._pose[2]):
+            self._descent = None
+            self._ring(descent.level, descent.message)
+        
+        # Mode idle if pas en vol (sauf pendant le spin-down)
         if not self.flying:
-            for m in self.motors.values():
-                m.setVelocity(1.0)
+            if self._descent is None:
+                self._set_idle_motors()
+            self._publish_snapshot(sim_time)
+            shed.end_step()
+            if prof:
+                prof.end_step()
             return
         
         # Lecture capteurs
         roll, pitch, yaw = self.imu.getRollPitchYaw()
-        
-        # LOG 32: IMU data
-        self.action_logger.log_event("imu_data", {
-            "roll": round(roll, 4),
-            "pitch": round(pitch, 4),
-            "yaw": round(yaw, 4)
-        })
-        
         x, y, z = self.gps.getValues()
         roll_rate, pitch_rate, yaw_rate = self.gyro.getValues()
+        self._pose = (x, y, z)
+        if prof:
+            t = prof.mark("sensors", t)
+        
+        # 🆕 Logging haute fréquence délesté si le pas précédent a dépassé le budget
+        log_ok = shed.allow("telemetry")
+        
+        # LOG 32: IMU data (payload paresseux: ~gratuit si le canal est off)
+        if log_ok:
+            self.action_logger.log_event("imu_data", imu_payload, roll, pitch, yaw)
         
         # Trace GPS
         self._gps_trace.append((x, y, time.time()))
         
-        # LOG 2: Position périodique (toutes les 2 secondes)
-        now = time.time()
-        if not hasattr(self, '_last_position_log'):
-            self._last_position_log = 0
-        if now - self._last_position_log > 2.0:
-            self.action_logger.log_event("position", {
-                "x": round(x, 2),
-                "y": round(y, 2),
-                "z": round(z, 2),
-                "mode": self.drone_mode.value,
-                "battery": 100
-            })
-            self._last_position_log = now
+        # 🆕 Télémétrie binaire (chunks NumPy, pas de JSON)
+        telemetry = self.telemetry_recorder if log_ok else None
+        if telemetry:
+            step = self._step_count
+            telemetry.record("imu", sim_time, step, roll, pitch, yaw)
+            telemetry.record("gyro", sim_time, step, roll_rate, pitch_rate, yaw_rate)
+            telemetry.record("gps", sim_time, step, x, y, z)
+        
+        # LOG 2: Position périodique (décimée par le logger, 0.5 Hz par défaut)
+        self.action_logger.log_event("position", position_payload, x, y, z, self.drone_mode.value)
+        if prof:
+            t = prof.mark("logging", t)
         
         # Control stabilisation (PID ORIGINAL)
         roll_disturbance = 0.0
@@ -1051,43 +1435,54 @@ class UltimateDroneController(Robot):
         pitch_input = self.K_PITCH_P * clamp(pitch, -1, 1) + pitch_rate + pitch_disturbance
         alt_err = clamp(self.target_alt - z + self.K_VERTICAL_OFFSET, -1, 1)
         vertical_input = self.K_VERTICAL_P * (alt_err ** 3)
+        if prof:
+            t = prof.mark("stabilization", t)
         
         # LOG 15: Altitude control
-        self.action_logger.log_event("altitude_control", {
-            "target": round(self.target_alt, 2),
-            "current": round(z, 2),
-            "error": round(self.target_alt - z, 3),
-            "vertical_input": round(vertical_input, 3)
-        })
+        if log_ok:
+            self.action_logger.log_event("altitude_control", altitude_payload, self.target_alt, z, vertical_input)
+        if telemetry:
+            telemetry.record("altitude_control", sim_time, step, self.target_alt, z, vertical_input)
+        if prof:
+            t = prof.mark("logging", t)
         
         yaw_corr = 0.0
         pitch_corr = 0.0
         
         # CRITICAL FIX: Update le hybrid_tracker for obtenir les détections
-        if self.hybrid_tracker:
-            frame_bgr = self.get_camera_bgr()
-            if frame_bgr is not None:
-                detection = self.hybrid_tracker.update(frame_bgr)
+        # 🆕 Mise à jour KCF différée d'un pas si elle ne tient plus dans le budget
+        t_task = shed.try_start("tracker") if self.hybrid_tracker else None
+        if t_task is not None:
+            frame = self.current_frame()
+            if prof:
+                t = prof.mark("camera", t)
+            if frame is not None:
+                detection = self.hybrid_tracker.update(frame)
                 if detection:
-                    with self._state_lock:
-                        self._bbox = detection
-                        # Smooth EMA
-                        if self._bbox_ema is None:
-                            self._bbox_ema = detection
-                        else:
-                            # EMA sur les coordonnées uniquement
-                            x1_new, y1_new, x2_new, y2_new, name, score = detection
-                            x1_old, y1_old, x2_old, y2_old, _, _ = self._bbox_ema
-                            alpha = 0.95  # 🔧 AUGMENTÉ: 0.7 → 0.95 for suivi ultra-réactif
-                            x1_ema = int(alpha * x1_new + (1 - alpha) * x1_old)
-                            y1_ema = int(alpha * y1_new + (1 - alpha) * y1_old)
-                            x2_ema = int(alpha * x2_new + (1 - alpha) * x2_old)
-                            y2_ema = int(alpha * y2_new + (1 - alpha) * y2_old)
-                            self._bbox_ema = (x1_ema, y1_ema, x2_ema, y2_ema, name, score)
+                    # 🆕 Écrit uniquement par le thread de contrôle: plus de verrou (l'UI lit le snapshot)
+                    self._bbox = detection
+                    # Smooth EMA
+                    if self._bbox_ema is None:
+                        self._bbox_ema = detection
+                    else:
+                        # EMA sur les coordonnées uniquement
+                        x1_new, y1_new, x2_new, y2_new, name, score = detection
+                        x1_old, y1_old, x2_old, y2_old, _, _ = self._bbox_ema
+                        alpha = 0.95  # 🔧 AUGMENTÉ: 0.7 → 0.95 for suivi ultra-réactif
+                        x1_ema = int(alpha * x1_new + (1 - alpha) * x1_old)
+                        y1_ema = int(alpha * y1_new + (1 - alpha) * y1_old)
+                        x2_ema = int(alpha * x2_new + (1 - alpha) * x2_old)
+                        y2_ema = int(alpha * y2_new + (1 - alpha) * y2_old)
+                        self._bbox_ema = (x1_ema, y1_ema, x2_ema, y2_ema, name, score)
+            shed.finish("tracker", t_task)
+            if prof:
+                t = prof.mark("tracker", t)
+        
+        # 🆕 Geofence: même pose que le reste du pas (RTH avant la logique de mode)
+        self._check_geofence(x, y)
         
-        with self._state_lock:
-            mode = self.drone_mode
-            det = self._bbox_ema if self._bbox_ema is not None else self._bbox
+        mode = self.drone_mode
+        det = self._bbox_ema if self._bbox_ema is not None else self._bbox
         
         # ENHANCED: Controls manuels en mode MANUAL with maintien position
         if mode == DroneMode.MANUAL:
@@ -1115,14 +1510,17 @@ class UltimateDroneController(Robot):
                     yaw_corr = 0.3 * yaw_error
                     pitch_corr = -0.05  # 🔧 INVERTED for avancer vers home
         
+        # 🆕 Mission: un pas de l'exécuteur avec la pose déjà lue (hover/photo minutés, non bloquants)
+        elif mode == DroneMode.WAYPOINT:
+            pitch_corr, yaw_corr = self.misifon_executor.update(sim_time, x, y, z, yaw)
+        
         elif mode in [DroneMode.SEARCH, DroneMode.FOLLOW, DroneMode.ORBIT]:
             if det:
                 # AUTO-SWITCH: Si en SEARCH and détection stable, passer en FOLLOW
                 if mode == DroneMode.SEARCH:
-                    with self._state_lock:
-                        self.drone_mode = DroneMode.FOLLOW
-                        mode = DroneMode.FOLLOW
-                        self._yaw_override = 0.0  # 🆕 Stop immédiatement la rotation
+                    self.drone_mode = DroneMode.FOLLOW
+                    mode = DroneMode.FOLLOW
+                    self._yaw_override = 0.0  # 🆕 Stop immédiatement la rotation
                     self._ring(logging.INFO, "🎯 Target acquired - Switching to FOLLOW mode")
                     self.action_logger.log_event("mode_change", {"mode": "follow", "reason": "auto_detection"})
                 
@@ -1151,13 +1549,10 @@ class UltimateDroneController(Robot):
 
                 elif mode == DroneMode.FOLLOW:
                         # LOG 23-25: Follow mode active with target info
-                        self.action_logger.log_event("follow_active", {
-                            "target_center_x": round(cx, 1),
-                            "target_center_y": round((y1 + y2) / 2, 1),
-                            "bbox_width": round(bbox_width, 1),
-                            "bbox_height": round(bbox_height, 1),
-                            "bbox_percent": round(bbox_percent, 2)
-                        })
+                        if log_ok:
+                            self.action_logger.log_event("follow_active", follow_active_payload,
+                                                         cx, (y1 + y2) / 2, bbox_width, bbox_height, bbox_percent)
+                        tracer = self.tracer
 
                         # 🎯 ACTIVE VISUAL TRACKING - Keep object centered in camera
 
@@ -1184,6 +1579,8 @@ class UltimateDroneController(Robot):
                             # Object well centered horizontally
                             yaw_corr = 0.0
                             self._yaw_override = 0.0
+                            tracer.trace("follow.yaw", sim_time, "centered",
+                                         "YAW centered: err_x={:.0f}px ({:.1f}%)", err_x, err_x_norm * 100)
                         else:
                             # Object off-center - rotate to center it
                             # Gains for le contrôle yaw
@@ -1201,7 +1598,9 @@ class UltimateDroneController(Robot):
                             yaw_corr = clamp(yaw_corr, -0.5, 0.5)  # Limitr la vitesse of rotation
                             self._yaw_override = yaw_corr
 
-                            print(f"[FOLLOW] YAW recentering: err_x={err_x:.0f}px ({err_x_norm*100:.1f}%), yaw_corr={yaw_corr:.3f}")
+                            tracer.trace("follow.yaw", sim_time, "recentering",
+                                         "YAW recentering: err_x={:.0f}px ({:.1f}%), yaw_corr={:.3f}",
+                                         err_x, err_x_norm * 100, yaw_corr)
 
                         # 🔧 CONTRÔLE ROLL - Déplacement lateral for centrer verticalement (optionnel)
                         # Note: On peut ausif ignorer l'error verticale and laisser le drone ajuster naturellement
@@ -1244,35 +1643,41 @@ class UltimateDroneController(Robot):
                         if bbox_percent > ZONE_TOO_CLOSE:
                             # Too close - back up
                             pitch_corr = +0.20
-                            print(f"[FOLLOW] TOO CLOSE ({bbox_percent:.1f}%) - Backing up")
+                            tracer.trace("follow.zone", sim_time, "too_close",
+                                         "TOO CLOSE ({:.1f}%) - Backing up", bbox_percent)
 
                         elif bbox_percent > ZONE_OPTIMAL_MAX:
                             # Near limit - slow down
                             pitch_corr = +0.05
-                            print(f"[FOLLOW] LIMIT ZONE ({bbox_percent:.1f}%) - Slowing down")
+                            tracer.trace("follow.zone", sim_time, "limit",
+                                         "LIMIT ZONE ({:.1f}%) - Slowing down", bbox_percent)
 
                         elif bbox_percent >= ZONE_OPTIMAL_MIN:
                             # Optimal zone - maintain
                             pitch_corr = 0.0  # No movement
-                            print(f"[FOLLOW] ✅ OPTIMAL ZONE ({bbox_percent:.1f}%) - Centered={abs(err_x_norm*100):.1f}%")
+                            tracer.trace("follow.zone", sim_time, "optimal",
+                                         "✅ OPTIMAL ZONE ({:.1f}%) - Centered={:.1f}%",
+                                         bbox_percent, abs(err_x_norm * 100))
 
                         elif bbox_percent > ZONE_FAR:
                             # A bit far - approach moderately
                             base_speed = self.SZ_KP * err_s
                             pitch_corr = max(-base_speed, -0.40)
-                            print(f"[FOLLOW] Approach modérée ({bbox_percent:.1f}%)")
+                            tracer.trace("follow.zone", sim_time, "approach",
+                                         "Approach modérée ({:.1f}%)", bbox_percent)
 
                         else:
                             # Very far - approach quickly
                             pitch_corr = -(self.SZ_KP * err_s + self.SZ_KD * derr_s)
                             pitch_corr = clamp(pitch_corr, -0.70, 0.30)
-                            print(f"[FOLLOW] Approach rapide ({bbox_percent:.1f}%)")
+                            tracer.trace("follow.zone", sim_time, "approach_fast",
+                                         "Approach rapide ({:.1f}%)", bbox_percent)
 
                         # Detailed debug
                         if bbox_percent < 35 or abs(err_x_norm) > 0.1:
-                            print(f"[FOLLOW DEBUG] bbox={bbox_percent:.1f}% | "
-                                  f"err_x={err_x:.0f}px({err_x_norm*100:+.1f}%) | "
-                                  f"yaw={yaw_corr:+.3f} | pitch={pitch_corr:+.3f}")
+                            tracer.trace("follow.debug", sim_time, None,
+                                         "bbox={:.1f}% | err_x={:.0f}px({:+.1f}%) | yaw={:+.3f} | pitch={:+.3f}",
+                                         bbox_percent, err_x, err_x_norm * 100, yaw_corr, pitch_corr)
 
                         # Sécurité: arrêter if objet trop près du bord
                         MARGIN = 50
@@ -1281,7 +1686,10 @@ class UltimateDroneController(Robot):
 
                         if near_edge and pitch_corr < 0:
                             pitch_corr = 0.0
-                            print(f"[FOLLOW] ⚠️ SAFETY: Object near edge - Arrêt approche")
+                            tracer.trace("follow.safety", sim_time, "near_edge",
+                                         "⚠️ SAFETY: Object near edge ({},{},{},{}) - Arrêt approche", x1, y1, x2, y2)
+                        else:
+                            tracer.trace("follow.safety", sim_time, "clear", "Edge margin clear")
 
                 else:  # SEARCH
                     err_x = cx_target - cx
@@ -1309,11 +1717,20 @@ class UltimateDroneController(Robot):
                         yaw_corr = 0.0
                         pitch_corr = 0.0
                         self._yaw_override = 0.0
+                        self.tracer.trace("search.lock", sim_time, "locked",
+                                          "Target locked: err_x={:.0f}px err_s={:.0f}px", err_x, err_s)
                     else:
                         pitch_corr = clamp(pitch_corr, -0.11, 0.11)
                         self._yaw_override = yaw_corr
+                        self.tracer.trace("search.lock", sim_time, "aiming",
+                                          "Aiming: err_x={:.0f}px err_s={:.0f}px", err_x, err_s)
+                    self.tracer.trace("search.aim", sim_time, None,
+                                      "err_x={:+.0f}px err_s={:+.0f}px | yaw={:+.3f} | pitch={:+.3f}",
+                                      err_x, err_s, yaw_corr, pitch_corr)
             else:
                 if mode == DroneMode.SEARCH:
+                    self.tracer.trace("search.lock", sim_time, "sweeping",
+                                      "Sweeping at {:.2f} rad/s, no detection", self.sweep_rate_adjustable)
                     target_rate = self.sweep_rate_adjustable  # Utiliser la vitesse réglable
                     # 🆕 RÉDUIT: ±5.0 → ±1.5 for rotation more douce
                     self._yaw_override = clamp(self.K_YAW_RATE * (target_rate - yaw_rate), -1.5, 1.5)
@@ -1323,18 +1740,20 @@ class UltimateDroneController(Robot):
         # Apply corrections UNIQUEMENT if pas en mode MANUAL
         if mode != DroneMode.MANUAL:
             pitch_input += pitch_corr
-        yaw_input = self._yaw_override if mode != DroneMode.RTH else yaw_corr
+        yaw_input = self._yaw_override if mode not in (DroneMode.RTH, DroneMode.WAYPOINT) else yaw_corr
+        if prof:
+            t = prof.mark("mode_logic", t)
         
         # LOG 13: Commands of contrôle calculées (CRITIQUE!)
-        self.action_logger.log_event("control_commands", {
-            "pitch_corr": round(pitch_corr, 4),
-            "yaw_corr": round(yaw_corr, 4),
-            "pitch_input": round(pitch_input, 4),
-            "yaw_input": round(yaw_input, 4),
-            "roll_input": round(roll_input, 4),
-            "vertical_input": round(vertical_input, 4),
-            "mode": mode.value
-        })
+        if log_ok:
+            self.action_logger.log_event("control_commands", control_commands_payload,
+                                         pitch_corr, yaw_corr, pitch_input, yaw_input,
+                                         roll_input, vertical_input, mode.value)
+        if telemetry:
+            telemetry.record("control_commands", sim_time, step, pitch_corr, yaw_corr, pitch_input,
+                             yaw_input, roll_input, vertical_input, MODE_CODES[mode])
+        if prof:
+            t = prof.mark("logging", t)
         
         # Motor commands (FORMULES ORIGINALES)
         fl = self.K_VERTICAL_THRUST + vertical_input - roll_input + pitch_input - yaw_input
@@ -1346,37 +1765,58 @@ class UltimateDroneController(Robot):
         self.motors['front_right'].setVelocity(fr)
         self.motors['rear_left'].setVelocity(rl)
         self.motors['rear_right'].setVelocity(rr)
+        if prof:
+            t = prof.mark("mixing", t)
         
         # LOG 14: Speeds moteurs (CRITIQUE!)
-        self.action_logger.log_event("motor_velocities", {
-            "front_left": round(fl, 2),
-            "front_right": round(fr, 2),
-            "rear_left": round(rl, 2),
-            "rear_right": round(rr, 2)
-        })
+        if log_ok:
+            self.action_logger.log_event("motor_velocities", motor_velocities_payload, fl, fr, rl, rr)
+        if telemetry:
+            telemetry.record("motor_velocities", sim_time, step, fl, fr, rl, rr)
+        if prof:
+            t = prof.mark("logging", t)
         
         # Recording vidéo
         if self.video_recorder:
-            frame = self.get_camera_bgr()
+            frame = self.current_frame()
+            if prof:
+                t = prof.mark("camera", t)
             if frame is not None:
-                annotated = self._annotate_frame(frame, self._bbox)
+                # 🆕 Hors budget: image brute (sans annotation) pour garder le rythme vidéo
+                t_task = shed.try_start("annotate")
+                if t_task is not None:
+                    annotated = self._annotate_frame(frame.image, self._bbox)
+                    shed.finish("annotate", t_task)
+                else:
+                    annotated = frame.image
+                if prof:
+                    t = prof.mark("annotate", t)
                 self.video_recorder.write(annotated)
+                if prof:
+                    t = prof.mark("video_write", t)
         
         # Mesure FPS (VERSION ORIGINALE)
         t1 = time.time()
         self._det_times.append(t1 - t0)
+        
+        # 🆕 Snapshot immuable pour l'UI (échange atomique de référence)
+        self._publish_snapshot(sim_time, (roll, pitch, yaw), (roll_rate, pitch_rate, yaw_rate))
+        shed.end_step()
+        if prof:
+            prof.end_step()
     
-    def _annotate_frame(self, img, bbox=None):
-        """Annote l'image avec les infos"""
+    def _annotate_frame(self, img, bbox=None, state=None):
+        """Annote l'image avec les infos (state: DroneSnapshot, dernier publié par défaut)"""
         img = img.copy()
+        state = state or self._snapshot
         
         # Texte of recherche
         label = None
-        if self.search_target:
-            label = "Searching: {}".format(self.search_target)
+        if state.search_target:
+            label = "Searching: {}".format(state.search_target)
         
-        is_tracking = self.hybrid_tracker and self.hybrid_tracker.tracking_active
-        mode = self.drone_mode
+        is_tracking = state.tracking
+        mode = state.mode
         
         if label:
             cv2.putText(img, label, (10, 34), cv2.FONT_HERSHEY_SIMPLEX, 1.0, (0, 140, 255), 2)
@@ -1491,19 +1931,21 @@ class UltimateDroneController(Robot):
             mode_text = "ORBIT"
         elif mode == DroneMode.RTH:
             mode_text = "RTH"
+        elif mode == DroneMode.WAYPOINT:
+            mode_text = "MISSION"
         
-        fps_text = "FPS: {:.0f} | {}".format(self.det_fps(), mode_text)
+        fps_text = "FPS: {:.0f} | {}".format(state.fps, mode_text)
         cv2.putText(img, fps_text, (10, self.cam_h-10), 
                    cv2.FONT_HERSHEY_SIMPLEX, 0.6, (255, 255, 255), 2)
         
         # Batterie
-        bat_pct = self.battery.get_percentage()
+        bat_pct = state.battery
         bat_color = (0, 255, 0) if bat_pct > 30 else (0, 165, 255) if bat_pct > 20 else (0, 0, 255)
         cv2.putText(img, "BAT: {:.0f}%".format(bat_pct), (self.cam_w - 120, 30),
                    cv2.FONT_HERSHEY_SIMPLEX, 0.6, bat_color, 2)
         
         # Recording indicator
-        if self.video_recorder:
+        if state.recording:
             cv2.circle(img, (self.cam_w - 30, self.cam_h - 30), 10, (0, 0, 255), -1)
         
         return img
@@ -1513,25 +1955,32 @@ class UltimateDroneController(Robot):
         app = Flask(__name__)
         
         def gen_mjpeg():
-            """Générateur MJPEG (VERSION ORIGINALE QUI FONCTIONNAIT)"""
-            while not self._shutdown:
-                try:
-                    frm = self.get_camera_bgr()
-                    if frm is None:
+            """Générateur MJPEG: une image encodée par nouvelle frame du cache"""
+            self.frame_cache.add_client()
+            seq = 0
+            try:
+                while not self._shutdown:
+                    try:
+                        frame = self.frame_cache.wait_newer(seq, timeout=0.5, lease=True)
+                        if frame is None:
+                            continue
+                        seq = frame.seq
+                        
+                        # CRITICAL FIX: Passer la bbox actuelle for l'affichage (snapshot, sans verrou)
+                        snapshot = self._snapshot
+                        
+                        try:
+                            frm = self._annotate_frame(frame.image, bbox=snapshot.bbox, state=snapshot)
+                        finally:
+                            frame.release()
+                        ok, buf = cv2.imencode(".jpg", frm)
+                        if ok:
+                            yield (b"--frame\r\nContent-Type: image/jpeg\r\n\r\n" + buf.tobytes() + b"\r\n")
+                    except Exception:
                         time.sleep(0.02)
                         continue
-                    
-                    # CRITICAL FIX: Passer la bbox actuelle for l'affichage
-                    with self._state_lock:
-                        current_bbox = self._bbox_ema if self._bbox_ema is not None else self._bbox
-                    
-                    frm = self._annotate_frame(frm, bbox=current_bbox)
-                    ok, buf = cv2.imencode(".jpg", frm)
-                    if ok:
-                        yield (b"--frame\r\nContent-Type: image/jpeg\r\n\r\n" + buf.tobytes() + b"\r\n")
-                except Exception:
-                    time.sleep(0.02)
-                    continue
+            finally:
+                self.frame_cache.remove_client()
         
         @app.route("/video_feed")
         def video_feed():
@@ -2008,6 +2457,7 @@ body { font-family: 'Segoe UI', system-ui, sans-serif; background: #0a0e14; colo
         <div class="search-buttons">
           <button class="btn btn-info btn-small" onclick="sendAction('photo')">📸 Photo</button>
           <button class="btn btn-danger btn-small" onclick="sendAction('record')" id="rec-btn">🔴 Rec</button>
+          <button class="btn btn-secondary btn-small" onclick="sendAction('telemetry')" id="telemetry-btn">📈 Telemetry</button>
         </div>
       </div>
       
@@ -2021,6 +2471,7 @@ body { font-family: 'Segoe UI', system-ui, sans-serif; background: #0a0e14; colo
         <div id="event-filters" style="max-height: 200px; overflow-y: auto; font-size: 11px;">
           <!-- Chargé dynamiquement via JavaScript -->
         </div>
+        <div id="log-stats" style="margin-top: 6px; font-size: 11px; color: #88c0d0;">Queue: -</div>
       </div>
     </div>
   </div>
@@ -2069,6 +2520,11 @@ body { font-family: 'Segoe UI', system-ui, sans-serif; background: #0a0e14; colo
     <div class="logs-panel">
       <div class="section-title">📜 LOGS</div>
       <div class="logs" id="logs">Loading...</div>
+      <!-- 🆕 Traces FOLLOW/SEARCH échantillonnées -->
+      <div class="section-title" style="margin-top: 10px;">🔬 TRACE
+        <button class="btn btn-small btn-secondary" onclick="window.location.href='/trace/dump'" style="float: right;">⬇ Dump</button>
+      </div>
+      <div class="logs" id="trace">-</div>
     </div>
   </div>
 </div>
@@ -2115,7 +2571,8 @@ function updateStatus() {
       document.getElementById('battery').textContent = data.battery + '%';
       document.getElementById('speed').textContent = data.speed + 'm/s';
       document.getElementById('mode-display').textContent = 'MODE: ' + data.mode;
-      document.getElementById('fps-display').textContent = data.fps + ' FPS';
+      document.getElementById('fps-display').textContent = data.fps + ' FPS' +
+        (data.detection_rate_hz != null ? ' | DET ' + data.detection_rate_hz + ' Hz' : '');
       
       // Battery color
       const batEl = document.getElementById('battery');
@@ -2131,12 +2588,28 @@ function updateStatus() {
       // GPS trace
       drawMap(data.gps_trace);
       
+      // 🆕 Flight log queue counters
+      updateLogStats(data.log_stats);
+      
+      // 🆕 Telemetry recorder state
+      document.getElementById('telemetry-btn').textContent = data.telemetry ? '⏹ Telemetry' : '📈 Telemetry';
+      
       // ENHANCED: Update viifbilité controls clavier
       updateControlsViifbility(data.mode);
     })
     .catch(err => console.error('Status error:', err));
 }
 
+function updateLogStats(stats) {
+  const el = document.getElementById('log-stats');
+  if (!el || !stats || stats.capacity === undefined) return;
+  el.textContent = 'Queue: ' + stats.queued + '/' + stats.capacity +
+    ' | Written: ' + stats.written +
+    ' | Dropped: ' + stats.dropped + ' (old ' + stats.dropped_oldest + ', new ' + stats.dropped_newest + ')' +
+    ' | Blocked: ' + stats.blocked;
+  el.style.color = stats.dropped > 0 ? '#ffc13a' : '#88c0d0';
+}
+
 function drawMap(trace) {
   const canvas = document.getElementById('map');
   const ctx = canvas.getContext('2d');
@@ -2197,6 +2670,30 @@ function drawMap(trace) {
 setInterval(updateStatus, 1000);
 updateStatus();
 
+// 🆕 Traces: seulement les nouvelles entrées depuis la dernière lecture
+let traceSeq = 0;
+function updateTrace() {
+  fetch('/trace?limit=200&since=' + traceSeq)
+    .then(r => r.json())
+    .then(data => {
+      if (!data.entries || !data.entries.length) return;
+      const el = document.getElementById('trace');
+      if (traceSeq === 0) el.innerHTML = '';
+      data.entries.forEach(e => {
+        const line = document.createElement('div');
+        line.className = 'log-line';
+        line.textContent = '[' + e.sim_time.toFixed(2) + 's] ' + e.topic + ' ' + e.message +
+          (e.suppressed ? ' (+' + e.suppressed + ')' : '');
+        el.appendChild(line);
+      });
+      while (el.childNodes.length > 200) el.removeChild(el.firstChild);
+      el.scrollTop = el.scrollHeight;
+      traceSeq = data.entries[data.entries.length - 1].seq;
+    })
+    .catch(err => console.error('Trace error:', err));
+}
+setInterval(updateTrace, 1000);
+
 // ============================================================================
 // ENHANCED: SLIDERS VERTICAUX (style avion/Windows)
 // ============================================================================
@@ -2367,13 +2864,13 @@ function loadEventFilters() {
         .then(response => response.json())
         .then(data => {
             if (data.status === 'ok') {
-                displayEventFilters(data.filters);
+                displayEventFilters(data.filters, data.rates || {});
             }
         })
         .catch(error => console.error('Error chargement filtres:', error));
 }
 
-function displayEventFilters(filters) {
+function displayEventFilters(filters, rates) {
     const container = document.getElementById('event-filters');
     if (!container) return;
     
@@ -2441,6 +2938,10 @@ function displayEventFilters(filters) {
                        onchange="toggleEventFilter('${eventType}', this.checked)"
                        style="margin-right: 6px; cursor: pointer;">
                 <span style="font-size: 12px;">${icon} ${label}</span>
+                ${rates[eventType] !== undefined ? `<input type="number" min="0" step="1" value="${rates[eventType]}"
+                       title="Max Hz (0 = every step)" onclick="event.stopPropagation()"
+                       onchange="setEventRate('${eventType}', this.value)"
+                       style="width: 38px; margin-left: auto; font-size: 10px; background: #0f1726; color: #e8eef5; border: 1px solid #3b4252; border-radius: 3px;">` : ''}
             </label>
         `;
     }
@@ -2460,7 +2961,7 @@ function toggleEventFilter(eventType, enabled) {
         if (data.status === 'ok') {
             // Visual update immédiate
             const container = document.getElementById('event-filters');
-            const label = container.querySelector(`input[onchange*="${eventType}"]`).parentElement;
+            const label = container.querySelector(`input[type="checkbox"][onchange*="${eventType}"]`).parentElement;
             label.style.background = enabled ? '#0a3d2a' : '#1a1d29';
             
             console.log(`✅ Filter "${eventType}" ${enabled ? 'enabled' : 'désenabled'}`);
@@ -2471,6 +2972,18 @@ function toggleEventFilter(eventType, enabled) {
     .catch(error => console.error('Error toggle filtre:', error));
 }
 
+function setEventRate(eventType, rateHz) {
+    fetch('/set_event_filter', {
+        method: 'POST',
+        headers: {'Content-Type': 'application/json'},
+        body: JSON.stringify({event_type: eventType, rate_hz: parseFloat(rateHz) || 0})
+    })
+    .then(response => response.json())
+    .then(data => {
+        if (data.status !== 'ok') console.error('Error:', data.message);
+    })
+    .catch(error => console.error('Error rate filtre:', error));
+}
 
 function toggleAllFilters(enabled) {
     fetch('/get_event_filters')
@@ -2508,71 +3021,88 @@ function downloadLogs() { if (confirm("Télécharger les logs?")) window.locatio
         
         @app.route("/action", methods=["POST"])
         def action():
+            """Dépose la commande dans le bus et répond immédiatement avec son id"""
             act = request.form.get("action", "")
-            if act == "takeoff":
-                self._cmd_takeoff()
-            elif act == "land":
-                self._cmd_land()
-            elif act == "emergency":
-                self._cmd_emergency_stop()
-            elif act == "rth":
-                self._cmd_return_home()
-            elif act == "stop":
-                self._cmd_stop_search()
-            elif act == "follow":
-                self._cmd_follow_mode()
-            elif act == "orbit":
-                self._cmd_orbit_mode()
-            elif act == "manual":
-                with self._state_lock:
-                    self.drone_mode = DroneMode.MANUAL
-            elif act == "photo":
-                self.take_photo()
-            elif act == "record":
-                if self.video_recorder:
-                    self._cmd_stop_recording()
-                else:
-                    self._cmd_start_recording()
-            return jsonify({"status": "ok"})
+            if act not in self._command_handlers or act in ("search", "set_target_altitude"):
+                return jsonify({"status": "error", "message": "Unknown action: {}".format(act)}), 400
+            future = self.command_bus.submit(act)
+            return jsonify({"status": "ok", "command_id": future.id})
         
         @app.route("/search", methods=["POST"])
         def search():
             query = request.form.get("query", "").strip()
             if query:
-                self._cmd_start_search(query)
+                future = self.command_bus.submit("search", query)
+                return jsonify({"status": "ok", "command_id": future.id})
             return jsonify({"status": "ok"})
         
+        # 🆕 MISSIONS (exécutées pas à pas par le thread de contrôle)
+        @app.route("/mission", methods=["GET", "POST"])
+        def mission():
+            """GET: état de la mission. POST: {waypoints: [{x, y, z, action, params}]} démarre la mission"""
+            if request.method == "POST":
+                data = request.get_json(silent=True) or {}
+                future = self.command_bus.submit("mission_start", data.get("waypoints"))
+                return jsonify({"status": "ok", "command_id": future.id})
+            return jsonify({"status": "ok", "mission": self.misifon_executor.to_dict()})
+        
+        @app.route("/mission/stop", methods=["POST"])
+        def mission_stop():
+            future = self.command_bus.submit("mission_stop")
+            return jsonify({"status": "ok", "command_id": future.id})
+        
+        @app.route("/command/<int:cmd_id>")
+        def command_status(cmd_id):
+            """État d'une commande du bus (?wait=secondes pour attendre son exécution)"""
+            future = self.command_bus.get(cmd_id)
+            if future is None:
+                return jsonify({"status": "error", "message": "Unknown command id"}), 404
+            wait = request.args.get("wait", type=float)
+            if wait:
+                future.wait(min(wait, 5.0))
+            return jsonify({"status": "ok", "command": future.to_dict()})
+        
         @app.route("/status")
         def status():
             def compute_status():
                 try:
-                    x, y, z = self.gps.getValues()
-                    speed = 0.0
-                    if len(self._gps_trace) >= 2:
-                        p1 = self._gps_trace[-1]
-                        p2 = self._gps_trace[-2]
-                        dt = p1[2] - p2[2]
-                        if dt > 0:
-                            dist = distance_2d((p1[0], p1[1]), (p2[0], p2[1]))
-                            speed = dist / dt
-                            
-                            # LOG 19, 34: Velocity
-                            self.action_logger.log_event("velocity", {"speed": round(speed, 3)})
+                    # 🆕 Snapshot du dernier pas: aucun verrou, aucun appel Webots
+                    snapshot = self._snapshot
+                    descent = self._descent
+                    tracker = self.hybrid_tracker
+                    speed = snapshot.speed
+                    if snapshot.flying:
+                        # LOG 19, 34: Velocity
+                        self.action_logger.log_event("velocity", {"speed": round(speed, 3)})
                     
                     return {
-                        "altitude": round(z, 2),
-                        "battery": int(self.battery.get_percentage()),
+                        "altitude": round(snapshot.z, 2),
+                        "battery": int(snapshot.battery),
                         "speed": round(speed, 2),
-                        "mode": self.drone_mode.value.upper(),
-                        "fps": int(self.det_fps()),
+                        "mode": snapshot.mode.value.upper(),
+                        "fps": int(snapshot.fps),
+                        "step": snapshot.step,
+                        "sim_time": round(snapshot.sim_time, 3),
                         "logs": list(self._ui_logs)[-30:],
-                        "gps_trace": [(p[0], p[1]) for p in list(self._gps_trace)]
+                        "gps_trace": [(p[0], p[1]) for p in list(self._gps_trace)],
+                        "log_stats": self.action_logger.get_stats(),
+                        "telemetry": self.telemetry_recorder is not None,
+                        "camera": self.frame_cache.stats(),
+                        "load_shedding": self.load_shedder.stats(),
+                        "trace": {"size": len(self.tracer), "last_seq": self.tracer.last_seq},
+                        "commands": self.command_bus.stats(),
+                        "descent": descent.to_dict(self.action_logger.sim_time) if descent else None,
+                        "mission": self.misifon_executor.to_dict(),
+                        "tracker": tracker.stats() if tracker else None,
+                        "detection_rate_hz": tracker.scheduler.stats()["detection_rate_hz"] if tracker else None,
+                        "inference": self.inference.stats()
                     }
                 except Exception as e:
                     return {
                         "altitude": 0.0, "battery": 100, "speed": 0.0,
                         "mode": "MANUAL", "fps": 0,
-                        "logs": ["Error: {}".format(str(e))], "gps_trace": []
+                        "logs": ["Error: {}".format(str(e))], "gps_trace": [],
+                        "log_stats": {}
                     }
             
             return jsonify(self._status_cache.get(compute_status))
@@ -2594,11 +3124,9 @@ function downloadLogs() { if (confirm("Télécharger les logs?")) window.locatio
             """Règle altitude cible (ENHANCED)"""
             try:
                 data = request.get_json()
-                altitude = float(data.get("altitude", 1.5))
-                altitude = max(0.5, min(5.0, altitude))
-                self.target_alt = altitude
-                self.target_altitude = altitude
-                return jsonify({"status": "ok", "altitude": altitude})
+                altitude = max(0.5, min(5.0, float(data.get("altitude", 1.5))))
+                future = self.command_bus.submit("set_target_altitude", altitude)
+                return jsonify({"status": "ok", "altitude": altitude, "command_id": future.id})
             except Exception as e:
                 return jsonify({"status": "error", "message": str(e)}), 400
         
@@ -2642,21 +3170,167 @@ function downloadLogs() { if (confirm("Télécharger les logs?")) window.locatio
             except Exception as e:
                 return jsonify({"status": "error", "message": str(e)}), 400
         
+        def _log_query_args():
+            """Paramètres communs: since, until, types=takeoff,mode_change, limit"""
+            types = request.args.get("types")
+            limit = request.args.get("limit", type=int)
+            return {
+                "since": request.args.get("since"),
+                "until": request.args.get("until"),
+                "types": [t.strip() for t in types.split(",") if t.strip()] if types else None,
+                "limit": limit if limit and limit > 0 else None,
+            }
+        
         @app.route("/download_logs")
         def download_logs():
             try:
-                self.action_logger.finalize()
-                return send_file(self.action_logger.log_file, as_attachment=True, download_name=f"drone_log_{self.action_logger.sesifon_id}.json")
-            except:
+                download_name = f"drone_log_{self.action_logger.sesifon_id}.json"
+                if self.action_logger.storage == STORAGE_JSONL and request.args.get("format") == "jsonl":
+                    # 🆕 Segments bruts: déjà compressés -> envoyés tels quels (Content-Encoding: gzip)
+                    accept_gzip = "gzip" in request.headers.get("Accept-Encoding", "")
+                    body, encoding = self.action_logger.iter_segments_download(
+                        request.args.get("since"), request.args.get("until"), accept_gzip)
+                    headers = {"Content-Disposition": f'attachment; filename="{download_name}l"'}
+                    if encoding:
+                        headers["Content-Encoding"] = encoding
+                    return Response(stream_with_context(body), mimetype="application/x-ndjson", headers=headers)
+                if self.action_logger.storage == STORAGE_JSONL:
+                    # 🆕 Streaming segment par segment (sélection via l'index), rien n'est réécrit
+                    document = self.action_logger.iter_document(**_log_query_args())
+                    return Response(stream_with_context(document),
+                                    mimetype="application/json",
+                                    headers={"Content-Disposition": f'attachment; filename="{download_name}"'})
+                log_path = self.action_logger.export_document()
+                return send_file(log_path, as_attachment=True, download_name=download_name)
+            except ValueError as e:
+                # since / until invalides
+                return jsonify({"status": "error", "message": str(e)}), 400
+            except OSError:
                 return jsonify({"error": "No logs"}), 404
         
+        @app.route("/events")
+        def events():
+            """🆕 Événements depuis un curseur: /events?cursor=3:1024&types=mode_change"""
+            try:
+                args = _log_query_args()
+                args["limit"] = min(args["limit"] or 500, 5000)
+                evts, cursor = self.action_logger.poll_events(request.args.get("cursor"), **args)
+                return jsonify({"status": "ok", "events": evts, "cursor": cursor})
+            except Exception as e:
+                return jsonify({"status": "error", "message": str(e)}), 400
+        
+        @app.route("/download_segment/<int:seq>")
+        def download_segment(seq):
+            """🆕 Un segment tel qu'il est stocké (.jsonl, .jsonl.gz ou .jsonl.xz)"""
+            seg, path = self.action_logger.get_segment(seq)
+            if seg is None or not os.path.exists(path):
+                return jsonify({"status": "error", "message": "Unknown segment"}), 404
+            if path.endswith(".gz") and "gzip" in request.headers.get("Accept-Encoding", ""):
+                response = send_file(path, mimetype="application/x-ndjson")
+                response.headers["Content-Encoding"] = "gzip"
+                return response
+            return send_file(path, as_attachment=True, download_name=os.path.basename(path))
+        
+        @app.route("/log_index")
+        def log_index():
+            """Index des segments du journal (plages temporelles, comptes par type)"""
+            return jsonify({"status": "ok", "index": self.action_logger.get_index()})
+        
+        # 🆕 PROFILAGE DE LA BOUCLE DE CONTRÔLE
+        @app.route("/profiler", methods=["GET", "POST"])
+        def profiler():
+            """GET: histogrammes par phase (p50/p95/p99/max, dépassements). POST: {enabled, reset}"""
+            if request.method == "POST":
+                data = request.get_json(silent=True) or {}
+                if data.get("reset"):
+                    self.profiler.reset()
+                if "enabled" in data:
+                    self.profiler.set_enabled(data["enabled"])
+                    status_msg = "✅ enabled" if self.profiler.enabled else "❌ désenabled"
+                    self._ring(logging.INFO, f"⏱️ Profiler: {status_msg}")
+            return jsonify({"status": "ok", "profiler": self.profiler.snapshot()})
+        
+        @app.route("/load_shedding", methods=["GET", "POST"])
+        def load_shedding():
+            """GET: décisions et compteurs de délestage. POST: {enabled}"""
+            if request.method == "POST":
+                data = request.get_json(silent=True) or {}
+                if "enabled" in data:
+                    self.load_shedder.set_enabled(data["enabled"])
+                    status_msg = "✅ enabled" if self.load_shedder.enabled else "❌ désenabled"
+                    self._ring(logging.INFO, f"⚖️ Load shedding: {status_msg}")
+            return jsonify({"status": "ok", "load_shedding": self.load_shedder.stats()})
+        
+        # 🆕 ORDONNANCEMENT DES RE-DÉTECTIONS YOLO
+        @app.route("/detection_scheduler", methods=["GET", "POST"])
+        def detection_scheduler():
+            """GET: intervalle, taux de détection effectif, budget. POST: {max_rate_hz, max_busy, min_interval, ...}"""
+            try:
+                if request.method == "POST":
+                    params = request.get_json(silent=True) or {}
+                    DetectionScheduler().configure(**params)  # validation avant application
+                    self.detection_budget.update(params)
+                    tracker = self.hybrid_tracker
+                    if tracker:
+                        tracker.scheduler.configure(**params)
+                    self._ring(logging.INFO, "⏲️ Detection scheduler: {}".format(
+                        ", ".join("{}={}".format(k, v) for k, v in params.items())))
+                tracker = self.hybrid_tracker
+                return jsonify({"status": "ok", "budget": self.detection_budget,
+                                "scheduler": tracker.scheduler.stats() if tracker else None})
+            except (TypeError, ValueError) as e:
+                return jsonify({"status": "error", "message": str(e)}), 400
+        
+        # 🆕 SERVICE D'INFÉRENCE PARTAGÉ
+        @app.route("/inference")
+        def inference():
+            """Clients enregistrés, taille moyenne des batchs, file d'attente, latence par client"""
+            return jsonify({"status": "ok", "inference": self.inference.stats()})
+        
+        # 🆕 TRACES DE DEBUG FOLLOW/SEARCH
+        @app.route("/trace", methods=["GET", "POST"])
+        def trace():
+            """GET: traces ?since=<seq>&topics=follow.zone,search.lock&limit=200. POST: {enabled, echo, topic, rate_hz, clear}"""
+            try:
+                if request.method == "POST":
+                    data = request.get_json(silent=True) or {}
+                    if data.get("clear"):
+                        self.tracer.clear()
+                    if "enabled" in data:
+                        self.tracer.set_enabled(data["enabled"])
+                        status_msg = "✅ enabled" if self.tracer.enabled else "❌ désenabled"
+                        self._ring(logging.INFO, f"🔬 Trace: {status_msg}")
+                    if "echo" in data:
+                        self.tracer.echo = bool(data["echo"])
+                    if data.get("topic") and data.get("rate_hz") is not None:
+                        self.tracer.set_rate(data["topic"], data["rate_hz"])
+                        self._ring(logging.INFO, f"🔬 Trace '{data['topic']}': max {float(data['rate_hz']):g} Hz")
+                    return jsonify({"status": "ok", "trace": self.tracer.stats()})
+                topics = request.args.get("topics")
+                entries = self.tracer.entries(
+                    since=request.args.get("since", 0, type=int),
+                    topics=set(topics.split(",")) if topics else None,
+                    limit=min(request.args.get("limit", 200, type=int), 5000))
+                return jsonify({"status": "ok", "entries": entries, "last_seq": self.tracer.last_seq})
+            except Exception as e:
+                return jsonify({"status": "error", "message": str(e)}), 400
+        
+        @app.route("/trace/dump")
+        def trace_dump():
+            """Écrit l'anneau de traces en JSONL et le télécharge"""
+            filename = "trace_{}.jsonl".format(time.strftime("%Y%m%d_%H%M%S"))
+            count = self.tracer.dump(filename)
+            self._ring(logging.INFO, "🔬 Trace dumped: {} ({} entries)".format(filename, count))
+            return send_file(os.path.abspath(filename), as_attachment=True, download_name=filename)
+        
         # 🆕 ROUTES POUR GESTION DES FILTRES D'ÉVÉNEMENTS
         @app.route("/get_event_filters")
         def get_event_filters():
             """Return current filter state d'événements"""
             try:
                 filters = self.action_logger.get_event_filters()
-                return jsonify({"status": "ok", "filters": filters})
+                rates = self.action_logger.get_event_rates()
+                return jsonify({"status": "ok", "filters": filters, "rates": rates})
             except Exception as e:
                 return jsonify({"status": "error", "message": str(e)}), 400
         
@@ -2666,12 +3340,20 @@ function downloadLogs() { if (confirm("Télécharger les logs?")) window.locatio
             try:
                 data = request.get_json()
                 event_type = data.get("event_type")
-                enabled = data.get("enabled", True)
+                enabled = data.get("enabled")
+                rate_hz = data.get("rate_hz")  # 🆕 Optionnel: Hz max (0 = tous les pas)
+                if enabled is None and rate_hz is None:
+                    enabled = True
+                if rate_hz is not None:
+                    rate_hz = float(rate_hz)
                 
-                if self.action_logger.set_event_filter(event_type, enabled):
-                    status_msg = "✅ enabled" if enabled else "❌ désenabled"
-                    self._ring(logging.INFO, f"📋 Filter '{event_type}': {status_msg}")
-                    return jsonify({"status": "ok", "event_type": event_type, "enabled": enabled})
+                if self.action_logger.set_event_filter(event_type, enabled, rate_hz):
+                    if enabled is not None:
+                        status_msg = "✅ enabled" if enabled else "❌ désenabled"
+                        self._ring(logging.INFO, f"📋 Filter '{event_type}': {status_msg}")
+                    if rate_hz is not None:
+                        self._ring(logging.INFO, f"📋 Filter '{event_type}': max {rate_hz:g} Hz")
+                    return jsonify({"status": "ok", "event_type": event_type, "enabled": enabled, "rate_hz": rate_hz})
                 else:
                     return jsonify({"status": "error", "message": "Type d'événement invalide"}), 400
             except Exception as e:
@@ -2700,10 +3382,13 @@ function downloadLogs() { if (confirm("Télécharger les logs?")) window.locatio
         while not self._shutdown and self.step(self.time_step) != -1:
             self._control_step()
         
-        # Cleanup
-        self.action_logger.finalize()
+        # Cleanup (journal fermé en dernier: video_stop et arrêt télémétrie y sont encore écrits)
         if self.video_recorder:
             self._cmd_stop_recording()
+        if self.telemetry_recorder:
+            self._cmd_stop_telemetry(wait=True)
+        self.inference.stop()
+        self.action_logger.close()
         
         self._ring(logging.INFO, "✅ Shutdown complete")
 
@@ -0,0 +1,1102 @@
+# -*- coding: utf-8 -*-
+"""
+📊 FLIGHT LOGGER
+================
+
+DroneActionLogger et stockage du journal de vol.
+
+Deux modes de stockage:
+- "json"  : document unique drone_flight_log.json (ancien format, relu et
+            réécrit à chaque flush -> O(n²) sur un vol complet)
+- "jsonl" : segments append-only drone_flight_log.00000.jsonl, .00001...
+            (un événement par ligne, rotation par taille ou par durée) +
+            index drone_flight_log.index.json (segment -> plage temporelle,
+            comptes par type) + sidecar drone_flight_log.meta.json (en-tête /
+            pied de session). Chaque flush coûte O(batch).
+
+iter_legacy_document() reconstruit le document unique attendu par
+/download_logs à partir des segments, en streaming (mémoire constante).
+
+Les segments fermés peuvent être compressés en arrière-plan (gzip ou lzma):
+drone_flight_log.00000.jsonl.gz. iter_compressed_segments() les sert tels
+quels (Content-Encoding: gzip), sans décompression/recompression.
+"""
+
+import os
+import gzip
+import lzma
+import json
+import time
+import zlib
+import queue
+import shutil
+import threading
+from datetime import datetime
+
+
+# Filtres par défaut (activables en temps réel depuis l'UI)
+DEFAULT_EVENT_FILTERS = {
+    "takeoff": True,
+    "land": True,
+    "emergency": True,
+    "detection": False,
+    "velocity": False,  # Disabled by default for performance
+    "position": False,
+    "mode_change": True,   # Basse fréquence: timeline des modes (flightlog.py)
+    "tracking": False,
+    "command": False,
+    "photo": False,
+    "video": False,
+    "waypoint": False,
+    "geofence": False,
+    "battery": False,
+    "imu_data": False,           # 🆕 IMU data (very high frequency)
+    "altitude_control": False,   # 🆕 Altitude control (very high frequency)
+    "control_commands": False,
+    "motor_velocities": False,   # 🆕 Motor speeds (very high frequency)
+    "follow_active": False,
+    "other": False
+}
+
+# 🆕 Décimation par canal (Hz max, 0 = pas de limite). Les canaux à 125 Hz
+# gardent leur valeur diagnostique sans payer le coût de chaque pas.
+DEFAULT_EVENT_RATES = {
+    "imu_data": 20.0,
+    "altitude_control": 20.0,
+    "control_commands": 20.0,
+    "motor_velocities": 10.0,
+    "follow_active": 5.0,
+    "position": 0.5,   # remplace l'ancien throttle de 2 s dans _control_step
+}
+
+# Événements critiques: jamais perdus, le producteur attend si la file est pleine
+CRITICAL_EVENTS = ("takeoff", "land", "emergency")
+
+STORAGE_JSON = "json"
+STORAGE_JSONL = "jsonl"
+
+# Politiques de débordement de la file d'événements
+OVERFLOW_DROP_OLDEST = "drop_oldest"
+OVERFLOW_DROP_NEWEST = "drop_newest"
+OVERFLOW_BLOCK = "block"
+OVERFLOW_POLICIES = (OVERFLOW_DROP_OLDEST, OVERFLOW_DROP_NEWEST, OVERFLOW_BLOCK)
+
+
+# Codecs de compression des segments fermés -> extension de fichier
+COMPRESSION_CODECS = {"gzip": ".gz", "lzma": ".xz"}
+
+_STREAM_CHUNK = 64 * 1024
+
+
+def open_segment_file(path, mode='rb'):
+    """Ouvre un segment, compressé ou non, selon son extension"""
+    if path.endswith(".gz"):
+        return gzip.open(path, mode)
+    if path.endswith(".xz"):
+        return lzma.open(path, mode)
+    return open(path, mode)
+
+
+def segment_path(directory, seg):
+    """Chemin d'un segment d'index (suit une compression survenue entre-temps)"""
+    path = os.path.join(directory, seg["file"])
+    if not os.path.exists(path):
+        for ext in COMPRESSION_CODECS.values():
+            if os.path.exists(path + ext):
+                return path + ext
+    return path
+
+
+def log_paths(log_file):
+    """Return (base, index_path, meta_path) for a log file name"""
+    base, _ = os.path.splitext(log_file)
+    return base, base + ".index.json", base + ".meta.json"
+
+
+def _write_json_atomic(path, data):
+    """Écrit un petit fichier JSON via un fichier temporaire + rename"""
+    tmp = path + ".tmp"
+    with open(tmp, 'w') as f:
+        json.dump(data, f, indent=2)
+    os.replace(tmp, path)
+
+
+def iter_jsonl_records(events_path, start=0, max_bytes=None):
+    """
+    Itère sur (événement, offset de fin) d'un segment JSONL à partir de
+    l'octet start (ligne tronquée ignorée). max_bytes limite la lecture à
+    la taille connue par l'index, pour lire un segment encore ouvert sans
+    voir un batch à moitié écrit.
+    """
+    if not os.path.exists(events_path):
+        return
+    pos = start
+    with open_segment_file(events_path) as f:
+        f.seek(start)
+        for line in f:
+            pos += len(line)
+            if max_bytes is not None and pos > max_bytes:
+                break
+            line = line.strip()
+            if not line:
+                continue
+            try:
+                yield json.loads(line), pos
+            except ValueError:
+                # Dernière ligne incomplète (crash pendant l'écriture)
+                continue
+
+
+def iter_jsonl_events(events_path, max_bytes=None):
+    """Itère sur les événements d'un segment JSONL"""
+    for event, _ in iter_jsonl_records(events_path, 0, max_bytes):
+        yield event
+
+
+def export_event(event, meta):
+    """
+    Ajoute l'horodatage ISO (mur) au moment de l'export: les événements
+    stockés ne portent que t_ns (perf_counter_ns), elapsed_time et sim_time.
+    """
+    if "timestamp" in event or "t_ns" not in event:
+        return event
+    wall = meta["start_epoch"] + (event["t_ns"] - meta["start_perf_ns"]) / 1e9
+    out = {"timestamp": datetime.fromtimestamp(wall).isoformat()}
+    out.update(event)
+    return out
+
+
+def iter_legacy_document(meta, events):
+    """
+    Génère (par morceaux de texte) le document unique historique:
+    {sesifon_id, start_time, events: [...], event_filters, last_update,
+     total_events, end_time, total_duration}
+
+    Les événements sont sérialisés un par un: la mémoire reste constante
+    quelle que soit la durée du vol.
+    """
+    yield '{\n'
+    yield '  "sesifon_id": {},\n'.format(json.dumps(meta.get("sesifon_id")))
+    yield '  "start_time": {},\n'.format(json.dumps(meta.get("start_time")))
+    yield '  "events": ['
+    total = 0
+    for event in events:
+        yield (',\n    ' if total else '\n    ') + json.dumps(export_event(event, meta))
+        total += 1
+    yield '\n  ],\n' if total else '],\n'
+    tail = {
+        "event_filters": meta.get("event_filters", {}),
+        "last_update": meta.get("last_update", datetime.now().isoformat()),
+        "total_events": total,
+    }
+    if "end_time" in meta:
+        tail["end_time"] = meta["end_time"]
+        tail["total_duration"] = meta.get("total_duration")
+    items = list(tail.items())
+    for i, (key, value) in enumerate(items):
+        yield '  {}: {}{}\n'.format(json.dumps(key), json.dumps(value), ',' if i < len(items) - 1 else '')
+    yield '}'
+
+
+def read_log_index(log_file):
+    """Charge (meta, index) d'un journal segmenté depuis le disque"""
+    _, index_path, meta_path = log_paths(log_file)
+    meta, index = {}, {"segments": []}
+    if os.path.exists(meta_path):
+        with open(meta_path, 'r') as f:
+            meta = json.load(f)
+    if os.path.exists(index_path):
+        with open(index_path, 'r') as f:
+            index = json.load(f)
+    return meta, index
+
+
+def iter_segment_events(directory, segments):
+    """Événements des segments donnés (entrées d'index), dans l'ordre"""
+    for seg in segments:
+        yield from iter_jsonl_events(segment_path(directory, seg), seg.get("bytes"))
+
+
+def format_cursor(seq, offset):
+    return "{}:{}".format(seq, offset)
+
+
+def parse_cursor(cursor):
+    """'seq:offset' -> (seq, offset); None/'' -> début du journal"""
+    if not cursor:
+        return -1, 0
+    seq, _, offset = str(cursor).partition(":")
+    return int(seq), int(offset or 0)
+
+
+class EventQuery:
+    """
+    Filtre d'événements: since/until (elapsed_time en secondes, ou horodatage
+    ISO converti via start_epoch de la session), types (liste d'event_type).
+    segment_matches() utilise l'index pour sauter un segment entier sans
+    l'ouvrir.
+    """
+
+    def __init__(self, since=None, until=None, types=None, start_epoch=0.0):
+        self.start_epoch = start_epoch
+        self.since = self._parse_bound(since)
+        self.until = self._parse_bound(until)
+        self.types = frozenset(types) if types else None
+
+    def _parse_bound(self, value):
+        if value is None or value == "":
+            return None
+        try:
+            return float(value)
+        except (TypeError, ValueError):
+            return datetime.fromisoformat(str(value)).timestamp() - self.start_epoch
+
+    def segment_matches(self, seg):
+        if not seg["events"]:
+            return False
+        if self.types is not None and not any(seg["counts"].get(t) for t in self.types):
+            return False
+        if self.since is not None and seg["last_elapsed"] is not None and seg["last_elapsed"] < self.since:
+            return False
+        if self.until is not None and seg["first_elapsed"] is not None and seg["first_elapsed"] > self.until:
+            return False
+        return True
+
+    def matches(self, event):
+        if self.types is not None and event.get("event_type") not in self.types:
+            return False
+        elapsed = event.get("elapsed_time")
+        if self.since is not None and (elapsed is None or elapsed < self.since):
+            return False
+        if self.until is not None and (elapsed is None or elapsed > self.until):
+            return False
+        return True
+
+
+def query_segments(directory, segments, query, cursor=None, limit=None):
+    """
+    Générateur (événement, curseur) sur les segments sélectionnés par
+    l'index. Lecture incrémentale: un seul événement en mémoire à la fois.
+    """
+    start_seq, start_offset = parse_cursor(cursor)
+    count = 0
+    for seg in segments:
+        if seg["seq"] < start_seq:
+            continue
+        offset = start_offset if seg["seq"] == start_seq else 0
+        if offset >= seg["bytes"] or not query.segment_matches(seg):
+            continue
+        path = segment_path(directory, seg)
+        for event, end in iter_jsonl_records(path, offset, seg["bytes"]):
+            if not query.matches(event):
+                continue
+            yield event, format_cursor(seg["seq"], end)
+            count += 1
+            if limit and count >= limit:
+                return
+
+
+def iter_compressed_segments(directory, segments):
+    """
+    Corps gzip multi-membres des segments donnés: un segment déjà compressé
+    en gzip est envoyé octet pour octet; les autres (segment ouvert, pas
+    encore compressé) sont compressés à la volée. La concaténation de
+    membres gzip est un flux gzip valide (Content-Encoding: gzip).
+    """
+    for seg in segments:
+        path = segment_path(directory, seg)
+        if not os.path.exists(path):
+            continue
+        if path.endswith(".gz"):
+            with open(path, 'rb') as f:
+                while True:
+                    chunk = f.read(_STREAM_CHUNK)
+                    if not chunk:
+                        break
+                    yield chunk
+            continue
+        compressor = zlib.compressobj(6, zlib.DEFLATED, 31)  # wbits 31 = en-tête gzip
+        remaining = seg["bytes"]
+        with open_segment_file(path) as f:
+            while remaining > 0:
+                chunk = f.read(min(_STREAM_CHUNK, remaining))
+                if not chunk:
+                    break
+                remaining -= len(chunk)
+                data = compressor.compress(chunk)
+                if data:
+                    yield data
+        yield compressor.flush()
+
+
+def iter_raw_segments(directory, segments):
+    """Contenu JSONL brut (décompressé) des segments donnés"""
+    for seg in segments:
+        path = segment_path(directory, seg)
+        if not os.path.exists(path):
+            continue
+        remaining = seg["bytes"]
+        with open_segment_file(path) as f:
+            while remaining > 0:
+                chunk = f.read(min(_STREAM_CHUNK, remaining))
+                if not chunk:
+                    break
+                remaining -= len(chunk)
+                yield chunk
+
+
+def convert_jsonl_log(log_file, output_path):
+    """
+    Convertit un journal segmenté (index + meta + segments) vers le document
+    unique historique. Retourne le nombre d'événements écrits.
+    """
+    meta, index = read_log_index(log_file)
+    directory = os.path.dirname(os.path.abspath(log_file))
+    total = 0
+    tmp = output_path + ".tmp"
+    with open(tmp, 'w') as out:
+        for part in iter_legacy_document(meta, iter_segment_events(directory, index["segments"])):
+            out.write(part)
+    os.replace(tmp, output_path)
+    for seg in index["segments"]:
+        total += seg.get("events", 0)
+    return total
+
+
+# ============================================================================
+# SEGMENT STORE
+# ============================================================================
+
+class JsonlSegmentStore:
+    """
+    Segments JSONL tournants + index.
+
+    Un segment est fermé quand il dépasse max_segment_bytes ou
+    max_segment_seconds; au-delà de max_segments (ou max_total_bytes) les
+    plus anciens sont supprimés. L'index garde pour chaque segment sa plage
+    temporelle (elapsed_time / sim_time), son nombre d'événements par type
+    et sa taille: /download_logs sélectionne les segments sans les ouvrir.
+
+    Avec compression="gzip" ou "lzma", chaque segment fermé est compressé
+    par un thread dédié (le thread d'écriture n'attend jamais le codec),
+    puis l'entrée d'index pointe vers le fichier .gz/.xz. "bytes" reste la
+    taille décompressée, "compressed_bytes" la taille sur disque.
+    """
+
+    def __init__(self, base, max_segment_bytes=4 * 1024 * 1024, max_segment_seconds=300.0,
+                 max_segments=100, max_total_bytes=None, compression=None):
+        if compression is not None and compression not in COMPRESSION_CODECS:
+            raise ValueError("Unknown compression codec: {}".format(compression))
+        self.base = base
+        self.compression = compression
+        self.directory = os.path.dirname(os.path.abspath(base))
+        self.index_path = base + ".index.json"
+        self.max_segment_bytes = max_segment_bytes
+        self.max_segment_seconds = max_segment_seconds
+        self.max_segments = max_segments
+        self.max_total_bytes = max_total_bytes
+        self.segments = []
+        self.current = None
+        self.dropped_segments = 0
+        self.dropped_events = 0
+        self._seq = 0
+        self._lock = threading.Lock()  # protège l'index (lecteurs HTTP)
+        self._index_write_lock = threading.Lock()
+        self._compress_queue = queue.Queue()
+        self._compressor = None
+        if compression:
+            self._compressor = threading.Thread(target=self._compress_loop, name="FlightLogCompressor", daemon=True)
+            self._compressor.start()
+        self._open_segment()
+
+    def _open_segment(self):
+        name = "{}.{:05d}.jsonl".format(os.path.basename(self.base), self._seq)
+        open(os.path.join(self.directory, name), 'w').close()
+        entry = {
+            "seq": self._seq,
+            "file": name,
+            "first_elapsed": None,
+            "last_elapsed": None,
+            "first_sim_time": None,
+            "last_sim_time": None,
+            "events": 0,
+            "bytes": 0,
+            "counts": {},
+            "closed": False,
+        }
+        self._opened_at = time.monotonic()
+        self._seq += 1
+        with self._lock:
+            self.segments.append(entry)
+            self.current = entry
+
+    def _should_roll(self):
+        cur = self.current
+        if not cur["events"]:
+            return False
+        return (cur["bytes"] >= self.max_segment_bytes or
+                time.monotonic() - self._opened_at >= self.max_segment_seconds)
+
+    def roll(self):
+        """Ferme le segment courant, applique la rétention, ouvre le suivant"""
+        with self._lock:
+            self.current["closed"] = True
+        if self._compressor:
+            self._compress_queue.put(self.current)
+        self._apply_retention()
+        self._open_segment()
+        self.write_index()
+
+    def _compress_loop(self):
+        """Compression des segments fermés en arrière-plan"""
+        while True:
+            entry = self._compress_queue.get()
+            if entry is None:
+                break
+            try:
+                self._compress_segment(entry)
+            except Exception as e:
+                print("[FlightLog] Compression error {}: {}".format(entry["file"], e))
+
+    def _compress_segment(self, entry):
+        src = os.path.join(self.directory, entry["file"])
+        dst = src + COMPRESSION_CODECS[self.compression]
+        codec_open = gzip.open if self.compression == "gzip" else lzma.open
+        with open(src, 'rb') as fin, codec_open(dst + ".tmp", 'wb') as fout:
+            shutil.copyfileobj(fin, fout, _STREAM_CHUNK)
+        os.replace(dst + ".tmp", dst)
+        with self._lock:
+            retained = entry in self.segments
+            if retained:
+                entry["file"] = os.path.basename(dst)
+                entry["compressed"] = self.compression
+                entry["compressed_bytes"] = os.path.getsize(dst)
+        # Un lecteur qui a déjà ouvert src continue de le lire (unlink POSIX)
+        for path in ((src,) if retained else (src, dst)):
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+        if retained:
+            self.write_index()
+
+    def _apply_retention(self):
+        with self._lock:
+            closed = [s for s in self.segments if s["closed"]]
+            total_bytes = sum(s["bytes"] for s in self.segments)
+            while closed and (len(self.segments) >= self.max_segments or
+                              (self.max_total_bytes and total_bytes > self.max_total_bytes)):
+                old = closed.pop(0)
+                self.segments.remove(old)
+                total_bytes -= old["bytes"]
+                self.dropped_segments += 1
+                self.dropped_events += old["events"]
+                try:
+                    os.remove(segment_path(self.directory, old))
+                except OSError:
+                    pass
+
+    def append(self, events):
+        """
+        Ajoute un batch d'événements (dicts). Le batch est coupé à la limite
+        max_segment_bytes: un segment ne la dépasse que pour un événement
+        seul plus gros que la limite.
+        """
+        if self._should_roll():
+            self.roll()
+        lines = [json.dumps(e, separators=(",", ":")) + "\n" for e in events]
+        start, size = 0, self.current["bytes"]
+        for i, line in enumerate(lines):
+            if size + len(line) > self.max_segment_bytes and (i > start or self.current["events"]):
+                self._write(events[start:i], lines[start:i])
+                self.roll()
+                start, size = i, 0
+            size += len(line)
+        self._write(events[start:], lines[start:])
+
+    def _write(self, events, lines):
+        """Écrit des événements sérialisés dans le segment courant et met l'index à jour"""
+        if not events:
+            return
+        chunk = "".join(lines)
+        with open(os.path.join(self.directory, self.current["file"]), 'a') as f:
+            f.write(chunk)
+        counts = {}
+        for e in events:
+            counts[e["event_type"]] = counts.get(e["event_type"], 0) + 1
+        with self._lock:
+            cur = self.current
+            if cur["first_elapsed"] is None:
+                cur["first_elapsed"] = events[0]["elapsed_time"]
+                cur["first_sim_time"] = events[0]["sim_time"]
+            cur["last_elapsed"] = events[-1]["elapsed_time"]
+            cur["last_sim_time"] = events[-1]["sim_time"]
+            cur["events"] += len(events)
+            cur["bytes"] += len(chunk)  # json.dumps -> ASCII: 1 caractère = 1 octet
+            for k, n in counts.items():
+                cur["counts"][k] = cur["counts"].get(k, 0) + n
+
+    def snapshot(self):
+        """Copie cohérente de l'index (tailles figées pour la lecture)"""
+        with self._lock:
+            return {
+                "segments": [dict(s, counts=dict(s["counts"])) for s in self.segments],
+                "dropped_segments": self.dropped_segments,
+                "dropped_events": self.dropped_events,
+            }
+
+    def write_index(self):
+        index = self.snapshot()
+        index["max_segment_bytes"] = self.max_segment_bytes
+        index["max_segment_seconds"] = self.max_segment_seconds
+        index["max_segments"] = self.max_segments
+        index["compression"] = self.compression
+        with self._index_write_lock:  # thread d'écriture + compresseur
+            _write_json_atomic(self.index_path, index)
+
+    def close(self):
+        with self._lock:
+            already_closed = self.current["closed"]
+            self.current["closed"] = True
+        if self._compressor:
+            if not already_closed and self.current["events"]:
+                self._compress_queue.put(self.current)
+            self._compress_queue.put(None)
+            self._compressor.join()
+            self._compressor = None
+        self.write_index()
+
+
+# ============================================================================
+# EVENT RING QUEUE
+# ============================================================================
+
+class EventRingQueue:
+    """
+    File circulaire bornée et préallouée entre le thread de contrôle
+    (producteur) et le thread d'écriture (consommateur).
+
+    put() est O(1) et ne touche jamais le disque. Quand la file est pleine,
+    la politique de débordement s'applique: drop_oldest écrase l'événement
+    le plus ancien, drop_newest rejette le nouvel événement, block attend
+    (au plus block_timeout) qu'une place se libère.
+
+    Les éléments critiques (put(..., critical=True)) ne sortent de la file
+    que par pop_batch: l'éviction saute par-dessus, et si la file ne contient
+    plus que des critiques, un nouvel élément non critique est rejeté et un
+    nouvel élément critique attend le thread d'écriture.
+    """
+
+    def __init__(self, capacity=4096, overflow=OVERFLOW_DROP_OLDEST, block_timeout=0.5):
+        if capacity < 1:
+            raise ValueError("capacity must be >= 1")
+        if overflow not in OVERFLOW_POLICIES:
+            raise ValueError("Unknown overflow policy: {}".format(overflow))
+        self.capacity = capacity
+        self.overflow = overflow
+        self.block_timeout = block_timeout
+        self._slots = [None] * capacity
+        self._critical = [False] * capacity
+        self._critical_queued = 0
+        self._head = 0
+        self._size = 0
+        self._lock = threading.Lock()
+        self._not_empty = threading.Condition(self._lock)
+        self._not_full = threading.Condition(self._lock)
+
+        # Compteurs (exposés dans l'UI)
+        self.enqueued = 0
+        self.dropped_oldest = 0
+        self.dropped_newest = 0
+        self.blocked = 0
+        self.high_watermark = 0
+
+    def __len__(self):
+        return self._size
+
+    def put(self, item, policy=None, critical=False):
+        """Ajoute un élément; retourne False s'il a été rejeté (jamais pour un élément critique)"""
+        policy = policy or self.overflow
+        with self._lock:
+            if self._size == self.capacity:
+                if policy == OVERFLOW_DROP_NEWEST and not critical:
+                    self.dropped_newest += 1
+                    return False
+                if policy == OVERFLOW_BLOCK:
+                    self.blocked += 1
+                    self._not_full.wait_for(lambda: self._size < self.capacity, self.block_timeout)
+                # drop_oldest (ou block expiré): on écarte le plus ancien non critique
+                if self._size == self.capacity and not self._evict_oldest():
+                    if not critical:
+                        self.dropped_newest += 1
+                        return False
+                    # File entièrement critique: on attend le thread d'écriture
+                    self._not_full.wait_for(lambda: self._size < self.capacity)
+            tail = (self._head + self._size) % self.capacity
+            self._slots[tail] = item
+            self._critical[tail] = critical
+            self._critical_queued += critical
+            self._size += 1
+            self.enqueued += 1
+            if self._size > self.high_watermark:
+                self.high_watermark = self._size
+            self._not_empty.notify()
+            return True
+
+    def _evict_oldest(self):
+        """Retire le plus ancien élément non critique (sous verrou); False si tous critiques"""
+        cap, head = self.capacity, self._head
+        if self._critical_queued:
+            for k in range(self._size):
+                if not self._critical[(head + k) % cap]:
+                    break
+            else:
+                return False
+            # Les k critiques qui le précèdent avancent d'une case (ordre conservé)
+            for i in range(k, 0, -1):
+                dst, src = (head + i) % cap, (head + i - 1) % cap
+                self._slots[dst] = self._slots[src]
+                self._critical[dst] = self._critical[src]
+        self._slots[head] = None
+        self._critical[head] = False
+        self._head = (head + 1) % cap
+        self._size -= 1
+        self.dropped_oldest += 1
+        return True
+
+    def wait(self, timeout):
+        """Attend qu'au moins un élément soit disponible"""
+        with self._lock:
+            return self._not_empty.wait_for(lambda: self._size > 0, timeout)
+
+    def pop_batch(self, max_items=None):
+        """Retire jusqu'à max_items éléments (sans attendre)"""
+        with self._lock:
+            n = self._size if max_items is None else min(self._size, max_items)
+            batch = [None] * n
+            for i in range(n):
+                idx = (self._head + i) % self.capacity
+                batch[i] = self._slots[idx]
+                self._slots[idx] = None
+                if self._critical[idx]:
+                    self._critical[idx] = False
+                    self._critical_queued -= 1
+            self._head = (self._head + n) % self.capacity
+            self._size -= n
+            if n:
+                self._not_full.notify_all()
+            return batch
+
+    def stats(self):
+        with self._lock:
+            return {
+                "queued": self._size,
+                "capacity": self.capacity,
+                "overflow_policy": self.overflow,
+                "enqueued": self.enqueued,
+                "dropped_oldest": self.dropped_oldest,
+                "dropped_newest": self.dropped_newest,
+                "dropped": self.dropped_oldest + self.dropped_newest,
+                "blocked": self.blocked,
+                "high_watermark": self.high_watermark,
+            }
+
+
+# ============================================================================
+# DRONE ACTION LOGGER
+# ============================================================================
+
+class DroneActionLogger:
+    """
+    Journal d'événements de vol.
+
+    log_event() est appelé depuis le thread de contrôle Webots: il se limite
+    à un put() O(1) dans une EventRingQueue. Un thread d'écriture dédié vide
+    la file par batch et fait toutes les entrées/sorties disque.
+    """
+
+    def __init__(self, log_file="drone_flight_log.json", storage=STORAGE_JSON,
+                 queue_capacity=4096, overflow=OVERFLOW_DROP_OLDEST,
+                 critical_events=CRITICAL_EVENTS, batch_size=256, flush_interval=0.2,
+                 max_segment_bytes=4 * 1024 * 1024, max_segment_seconds=300.0, max_segments=100,
+                 compression=None):
+        if storage not in (STORAGE_JSON, STORAGE_JSONL):
+            raise ValueError("Unknown log storage: {}".format(storage))
+        self.log_file = log_file
+        self.storage = storage
+        self.base, self.index_file, self.meta_file = log_paths(log_file)
+        self.store = None
+        self._segment_limits = (max_segment_bytes, max_segment_seconds, max_segments)
+        self.compression = compression
+        self.sesifon_id = datetime.now().strftime("%Y%m%d_%H%M%S")
+        self.lock = threading.Lock()
+        # Horloges de session: epoch mur (export ISO) + perf_counter_ns (événements)
+        self.start_time = time.time()
+        self.start_perf_ns = time.perf_counter_ns()
+        # Temps simulation Webots, publié à chaque pas par le contrôleur
+        self.sim_time = None
+        self.start_iso = datetime.fromtimestamp(self.start_time).isoformat()
+        self.total_events = 0
+        self.write_errors = 0
+
+        # 🆕 REAL-TIME ACTIVATABLE EVENT FILTERS
+        self.event_filters = DEFAULT_EVENT_FILTERS.copy()
+        # Copie en lecture seule pour is_enabled(): remplacée (jamais modifiée)
+        # à chaque changement de filtre, donc lisible sans verrou
+        self._enabled = self.event_filters.copy()
+        # Décimation temporelle: période min entre deux événements d'un canal
+        self.event_rates = {k: DEFAULT_EVENT_RATES.get(k, 0.0) for k in self.event_filters}
+        self._periods = self._compute_periods()
+        self._next_due = {}
+        self.decimated = {}
+
+        # File bornée + thread d'écriture
+        self.queue = EventRingQueue(queue_capacity, overflow)
+        self.critical_events = frozenset(critical_events)
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self._io_lock = threading.Lock()
+        self._writer_running = False
+        self._writer_thread = None
+
+        self._init_log_file()
+        self.start_writer()
+
+    def _init_log_file(self):
+        if self.storage == STORAGE_JSONL:
+            # Premier segment vide + en-tête de session
+            max_bytes, max_seconds, max_segments = self._segment_limits
+            self.store = JsonlSegmentStore(self.base, max_bytes, max_seconds, max_segments,
+                                           compression=self.compression)
+            self.store.write_index()
+            self._write_meta()
+            return
+        with open(self.log_file, 'w') as f:
+            json.dump({
+                "sesifon_id": self.sesifon_id,
+                "start_time": self.start_iso,
+                "events": [],
+                "event_filters": self.event_filters.copy()
+            }, f, indent=2)
+
+    def _meta(self, footer=None):
+        meta = {
+            "sesifon_id": self.sesifon_id,
+            "start_time": self.start_iso,
+            "start_epoch": self.start_time,
+            "start_perf_ns": self.start_perf_ns,
+            "storage": self.storage,
+            "index_file": os.path.basename(self.index_file),
+            "event_filters": self.get_event_filters(),
+            "event_rates": self.get_event_rates(),
+            "last_update": datetime.now().isoformat(),
+            "total_events": self.total_events,
+        }
+        if footer:
+            meta.update(footer)
+        return meta
+
+    def _write_meta(self, footer=None):
+        """Sidecar JSONL: en-tête de session (+ pied si fourni)"""
+        _write_json_atomic(self.meta_file, self._meta(footer))
+
+    # ------------------------------------------------------------------
+    # Writer thread
+    # ------------------------------------------------------------------
+
+    def start_writer(self):
+        """Démarre le thread d'écriture"""
+        if not self._writer_running:
+            self._writer_running = True
+            self._writer_thread = threading.Thread(target=self._writer_loop, name="FlightLogWriter", daemon=True)
+            self._writer_thread.start()
+
+    def stop_writer(self):
+        """Arrête le thread d'écriture (les événements restants sont écrits)"""
+        self._writer_running = False
+        if self._writer_thread:
+            self._writer_thread.join(timeout=2.0)
+            self._writer_thread = None
+        self.flush()
+
+    def _writer_loop(self):
+        """Boucle d'écriture en arrière-plan"""
+        while self._writer_running:
+            if not self.queue.wait(self.flush_interval):
+                continue
+            with self._io_lock:
+                self._flush_to_file(self.queue.pop_batch(self.batch_size))
+
+    def flush(self):
+        """Écrit immédiatement tout ce qui est en file (appelant bloqué)"""
+        with self._io_lock:
+            while True:
+                batch = self.queue.pop_batch(self.batch_size)
+                if not batch:
+                    break
+                self._flush_to_file(batch)
+
+    # ------------------------------------------------------------------
+    # Filters
+    # ------------------------------------------------------------------
+
+    def set_event_filter(self, event_type, enabled=None, rate_hz=None):
+        """Enable/disable an event type and/or set its max rate (Hz) in real-time"""
+        with self.lock:
+            if event_type not in self.event_filters:
+                return False
+            if enabled is not None:
+                self.event_filters[event_type] = enabled
+                self._enabled = self.event_filters.copy()  # swap atomique
+            if rate_hz is not None:
+                self.event_rates[event_type] = max(0.0, float(rate_hz))
+                self._periods = self._compute_periods()
+                self._next_due.pop(event_type, None)
+            return True
+
+    def get_event_filters(self):
+        """Return current filter state"""
+        with self.lock:
+            return self.event_filters.copy()
+
+    def get_event_rates(self):
+        """Return current max rate per event type (0 = every sample)"""
+        with self.lock:
+            return self.event_rates.copy()
+
+    def _compute_periods(self):
+        return {k: int(1e9 / hz) for k, hz in self.event_rates.items() if hz > 0}
+
+    def set_overflow_policy(self, policy):
+        """Change la politique de débordement des événements non critiques"""
+        if policy not in OVERFLOW_POLICIES:
+            return False
+        self.queue.overflow = policy
+        return True
+
+    def get_stats(self):
+        """Compteurs de la file + du thread d'écriture"""
+        stats = self.queue.stats()
+        stats["written"] = self.total_events
+        stats["write_errors"] = self.write_errors
+        stats["writer_alive"] = bool(self._writer_thread and self._writer_thread.is_alive())
+        stats["decimated"] = dict(self.decimated)
+        return stats
+
+    # ------------------------------------------------------------------
+    # Logging
+    # ------------------------------------------------------------------
+
+    def is_enabled(self, event_type):
+        """Fast path sans verrou: l'événement serait-il enregistré ?"""
+        enabled = self._enabled
+        flag = enabled.get(event_type)
+        if flag is None:
+            # Types inconnus -> catégorie "other"
+            flag = enabled.get("other", True)
+        return flag
+
+    def log_event(self, event_type, data=None, *args):
+        """
+        Log an event only if its filter is enabled and its channel rate
+        limit (event_rates) allows it.
+
+        data peut être un dict, ou un callable (payload paresseux) appelé
+        plus tard comme data(*args) sur le thread d'écriture. Un canal
+        désactivé ne coûte alors qu'une lecture de dict: pas de round(),
+        pas de dict construit. Les args doivent être des valeurs immuables.
+        """
+        # 🆕 FILTER CHECK (sans verrou)
+        if not self.is_enabled(event_type):
+            return
+
+        # Horodatage entier monotone: pas de formatage de chaîne ici
+        now = time.perf_counter_ns()
+
+        # 🆕 DÉCIMATION: au plus un événement par période pour ce canal
+        period = self._periods.get(event_type)
+        if period:
+            if now < self._next_due.get(event_type, 0):
+                self.decimated[event_type] = self.decimated.get(event_type, 0) + 1
+                return
+            self._next_due[event_type] = now + period
+
+        # O(1): aucune I/O sur le thread appelant
+        entry = (now, self.sim_time, event_type, data, args)
+        if event_type in self.critical_events:
+            self.queue.put(entry, OVERFLOW_BLOCK, critical=True)
+        else:
+            self.queue.put(entry)
+
+    def _materialize(self, entry):
+        """Construit le dict final (payload paresseux résolu ici)"""
+        t_ns, sim_time, event_type, data, args = entry
+        if callable(data):
+            try:
+                data = data(*args)
+            except Exception as e:
+                data = {"payload_error": str(e)}
+        return {
+            "t_ns": t_ns,
+            "elapsed_time": round((t_ns - self.start_perf_ns) / 1e9, 3),
+            "sim_time": sim_time,
+            "event_type": event_type,
+            "data": data
+        }
+
+    def _flush_to_file(self, batch):
+        if not batch:
+            return
+        batch = [self._materialize(entry) for entry in batch]
+        if self.storage == STORAGE_JSONL:
+            self._append_jsonl(batch)
+            return
+        try:
+            with open(self.log_file, 'r') as f:
+                data = json.load(f)
+            meta = {"start_epoch": self.start_time, "start_perf_ns": self.start_perf_ns}
+            data['events'].extend(export_event(e, meta) for e in batch)
+            data['last_update'] = datetime.now().isoformat()
+            data['total_events'] = len(data['events'])
+            with open(self.log_file, 'w') as f:
+                json.dump(data, f, indent=2)
+            self.total_events = data['total_events']
+        except Exception:
+            self.write_errors += 1
+
+    def _append_jsonl(self, batch):
+        """Append-only: une seule écriture par batch, O(batch)"""
+        try:
+            self.store.append(batch)
+            self.total_events += len(batch)
+        except Exception:
+            self.write_errors += 1
+
+    def finalize(self):
+        self.flush()
+        with self._io_lock:
+            end_time = datetime.now().isoformat()
+            total_duration = round(time.time() - self.start_time, 2)
+            try:
+                if self.storage == STORAGE_JSONL:
+                    self.store.write_index()
+                    self._write_meta({"end_time": end_time, "total_duration": total_duration})
+                    return
+                with open(self.log_file, 'r') as f:
+                    data = json.load(f)
+                data['end_time'] = end_time
+                data['total_duration'] = total_duration
+                with open(self.log_file, 'w') as f:
+                    json.dump(data, f, indent=2)
+            except Exception:
+                self.write_errors += 1
+
+    def close(self):
+        """Fin de session: arrêt du thread d'écriture puis finalisation"""
+        self.stop_writer()
+        if self.store:
+            with self._io_lock:
+                self.store.close()
+        self.finalize()
+
+    def get_segment(self, seq):
+        """Entrée d'index + chemin sur disque d'un segment (ou (None, None))"""
+        for seg in self.get_index()["segments"]:
+            if seg["seq"] == seq:
+                return seg, segment_path(self.store.directory, seg)
+        return None, None
+
+    def get_index(self):
+        """Index courant des segments (JSONL uniquement)"""
+        if not self.store:
+            return {"segments": []}
+        return self.store.snapshot()
+
+    def _json_file_events(self, query, limit=None):
+        """Événements filtrés du document JSON unique (stockage STORAGE_JSON)"""
+        with self._io_lock:
+            with open(self.log_file, 'r') as f:
+                events = json.load(f).get("events", [])
+        selected = [event for event in events if query.matches(event)]
+        return selected[:limit] if limit else selected
+
+    def iter_document(self, since=None, until=None, types=None, limit=None):
+        """
+        Document unique historique généré à la volée depuis les segments
+        retenus par l'index (JSONL), filtré par plage temporelle / types.
+        Rien n'est réécrit sur disque. En stockage JSON, filtre le document
+        existant. Lève ValueError si since/until sont invalides.
+        """
+        query = EventQuery(since, until, types, self.start_time)
+        self.flush()
+        meta = self._meta({"end_time": datetime.now().isoformat(),
+                           "total_duration": round(time.time() - self.start_time, 2)})
+        if not self.store:
+            return iter_legacy_document(meta, self._json_file_events(query, limit))
+        index = self.get_index()
+        events = (event for event, _ in query_segments(self.store.directory, index["segments"], query, None, limit))
+        return iter_legacy_document(meta, events)
+
+    def poll_events(self, cursor=None, types=None, since=None, until=None, limit=500):
+        """
+        Événements écrits après le curseur -> (events, next_cursor).
+        Le client renvoie next_cursor au prochain appel pour ne recevoir que
+        les nouveautés.
+        """
+        if not self.store:
+            return [], cursor
+        self.flush()
+        index = self.get_index()
+        query = EventQuery(since, until, types, self.start_time)
+        meta = {"start_epoch": self.start_time, "start_perf_ns": self.start_perf_ns}
+        events = []
+        next_cursor = cursor
+        for event, position in query_segments(self.store.directory, index["segments"], query, cursor, limit):
+            events.append(export_event(event, meta))
+            next_cursor = position
+        if not limit or len(events) < limit:
+            # Tout le snapshot a été parcouru: le curseur passe à sa fin
+            segments = index["segments"]
+            if segments:
+                next_cursor = format_cursor(segments[-1]["seq"], segments[-1]["bytes"])
+        return events, next_cursor
+
+    def iter_segments_download(self, since=None, until=None, accept_gzip=False):
+        """
+        Segments JSONL sélectionnés par l'index (plage since/until, au
+        segment près) -> (générateur d'octets, content_encoding).
+        Avec compression gzip et un client qui l'accepte, les segments
+        compressés sont servis tels quels; sinon le JSONL est décompressé.
+        En stockage JSON, les événements du document sont émis en JSONL.
+        """
+        query = EventQuery(since, until, None, self.start_time)
+        self.flush()
+        if not self.store:
+            events = self._json_file_events(query)
+            return (json.dumps(e, separators=(",", ":")).encode("utf-8") + b"\n" for e in events), None
+        segments = [seg for seg in self.get_index()["segments"] if query.segment_matches(seg)]
+        if accept_gzip and self.compression == "gzip":
+            return iter_compressed_segments(self.store.directory, segments), "gzip"
+        return iter_raw_segments(self.store.directory, segments), None
+
+    def export_document(self):
+        """
+        Finalise et retourne le chemin du document JSON unique (format
+        historique).
+        """
+        self.finalize()
+        if self.storage == STORAGE_JSONL:
+            with self._io_lock:
+                convert_jsonl_log(self.log_file, self.log_file)
+        return self.log_file
+
+
+if __name__ == "__main__":
+    # Conversion hors-ligne: python flight_logger.py drone_flight_log.json [out.json]
+    import sys
+    if len(sys.argv) < 2:
+        raise SystemExit("usage: flight_logger.py <drone_flight_log.json> [output.json]")
+    src = sys.argv[1]
+    out = sys.argv[2] if len(sys.argv) > 2 else src
+    n = convert_jsonl_log(src, out)
+    print("[flight_logger] {} events -> {}".format(n, out))
@@ -0,0 +1,315 @@
+# -*- coding: utf-8 -*-
+"""
+🔎 FLIGHTLOG - moteur de requêtes hors-ligne sur les journaux de vol
+===================================================================
+
+Ingestion d'un journal DroneActionLogger (document unique
+drone_flight_log.json ou segments JSONL + index) puis index en mémoire:
+
+- par event_type (tableaux d'indices de lignes)
+- elapsed_time trié (global et par type) pour les requêtes de plage
+- timeline des modes reconstruite depuis les événements mode_change
+- colonnes numériques par (event_type, champ) construites à la demande
+
+Exemples:
+    log = FlightLog.load("drone_flight_log.json")
+    rows = log.select("follow_active", where=[("bbox_percent", "<", 15)])
+    rows, anchors = log.window_before("control_commands", "emergency", 5.0)
+    arr = log.to_numpy(rows, ["pitch_corr", "yaw_corr"])
+
+CLI:
+    python flightlog.py drone_flight_log.json --type follow_active --where "bbox_percent<15"
+    python flightlog.py drone_flight_log.json --type control_commands --before emergency --window 5 --npy out.npy
+    python flightlog.py drone_flight_log.json --summary
+"""
+
+import os
+import re
+import sys
+import json
+import argparse
+import operator
+
+import numpy as np
+
+from flight_logger import log_paths, read_log_index, iter_segment_events
+
+
+_OPS = {
+    "<": operator.lt, "<=": operator.le, ">": operator.gt, ">=": operator.ge,
+    "==": operator.eq, "!=": operator.ne,
+}
+
+_WHERE_RE = re.compile(r"^\s*(\w+)\s*(<=|>=|==|!=|<|>)\s*(.+?)\s*$")
+
+# Types JSON numériques (bool exclu: type() et non isinstance)
+_NUMERIC_TYPES = frozenset((int, float))
+
+# Événements qui remettent le drone en mode manuel (cf. _cmd_takeoff/_cmd_land/_cmd_emergency_stop)
+MODE_RESET_EVENTS = ("takeoff", "land", "emergency")
+
+
+def parse_where(text):
+    """'bbox_percent<15' -> ('bbox_percent', '<', 15.0)"""
+    match = _WHERE_RE.match(text)
+    if not match:
+        raise ValueError("Invalid condition: {}".format(text))
+    field, op, value = match.groups()
+    try:
+        value = float(value)
+    except ValueError:
+        value = value.strip("'\"")
+    return field, op, value
+
+
+def iter_log_events(path):
+    """Événements d'un journal: segments JSONL (si index présent) ou document unique"""
+    base, index_path, _ = log_paths(path)
+    if os.path.exists(index_path):
+        _, index = read_log_index(path)
+        directory = os.path.dirname(os.path.abspath(path))
+        yield from iter_segment_events(directory, index["segments"])
+        return
+    with open(path, 'r') as f:
+        document = json.load(f)
+    yield from document.get("events", [])
+
+
+class FlightLog:
+    """Journal de vol indexé en mémoire"""
+
+    def __init__(self, events):
+        type_codes = {}
+        codes, elapsed, sim_time, payloads = [], [], [], []
+        for event in events:
+            etype = event.get("event_type", "other")
+            code = type_codes.setdefault(etype, len(type_codes))
+            codes.append(code)
+            elapsed.append(event.get("elapsed_time", np.nan))
+            sim = event.get("sim_time")
+            sim_time.append(np.nan if sim is None else sim)
+            payloads.append(event.get("data") or {})
+
+        self.type_names = list(type_codes)
+        self.type_codes = type_codes
+        codes = np.asarray(codes, dtype=np.int32)
+        elapsed = np.asarray(elapsed, dtype=np.float64)
+        sim_time = np.asarray(sim_time, dtype=np.float64)
+
+        # Index temporel global (tri stable: l'ordre d'écriture départage)
+        order = np.argsort(elapsed, kind="stable")
+        self.codes = codes[order]
+        self.elapsed = elapsed[order]
+        self.sim_time = sim_time[order]
+        self.payloads = [payloads[i] for i in order]
+
+        # Index par type: lignes (triées par temps) + leurs temps
+        self._rows_by_type = {}
+        self._elapsed_by_type = {}
+        for name, code in type_codes.items():
+            rows = np.flatnonzero(self.codes == code)
+            self._rows_by_type[name] = rows
+            self._elapsed_by_type[name] = self.elapsed[rows]
+
+        self._columns = {}
+        self.mode_timeline = self._build_mode_timeline()
+
+    @classmethod
+    def load(cls, path):
+        return cls(iter_log_events(path))
+
+    def __len__(self):
+        return len(self.codes)
+
+    # ------------------------------------------------------------------
+    # Index
+    # ------------------------------------------------------------------
+
+    def rows(self, event_type):
+        """Lignes d'un type (triées par temps)"""
+        return self._rows_by_type.get(event_type, np.empty(0, dtype=np.int64))
+
+    def counts(self):
+        return {name: len(rows) for name, rows in self._rows_by_type.items()}
+
+    def column(self, event_type, field):
+        """
+        Colonne numérique data[field] alignée sur rows(event_type), NaN si
+        absente ou non numérique. Construite une fois puis mise en cache.
+        """
+        key = (event_type, field)
+        col = self._columns.get(key)
+        if col is None:
+            payloads = self.payloads
+            values = [payloads[i].get(field) for i in self.rows(event_type).tolist()]
+            col = np.fromiter((v if type(v) in _NUMERIC_TYPES else np.nan for v in values),
+                              dtype=np.float64, count=len(values))
+            self._columns[key] = col
+        return col
+
+    def _build_mode_timeline(self):
+        """[(début, fin, mode)] depuis mode_change (manual avant le premier)"""
+        rows = np.sort(np.concatenate([self.rows(t) for t in ("mode_change",) + MODE_RESET_EVENTS]))
+        timeline = []
+        start, mode = -np.inf, "manual"
+        for i in rows:
+            if self.codes[i] == self.type_codes.get("mode_change"):
+                new_mode = self.payloads[i].get("mode")
+            else:
+                new_mode = "manual"
+            if new_mode is None or new_mode == mode:
+                continue
+            t = float(self.elapsed[i])
+            timeline.append((start, t, mode))
+            start, mode = t, new_mode
+        timeline.append((start, np.inf, mode))
+        return timeline
+
+    def mode_at(self, t):
+        for start, end, mode in self.mode_timeline:
+            if start <= t < end:
+                return mode
+        return None
+
+    # ------------------------------------------------------------------
+    # Requêtes
+    # ------------------------------------------------------------------
+
+    def select(self, event_type, where=None, since=None, until=None, mode=None):
+        """
+        Lignes d'un type filtrées par plage temporelle, conditions sur les
+        champs ([(champ, op, valeur)], vectorisé) et mode de vol.
+        """
+        rows = self.rows(event_type)
+        times = self._elapsed_by_type.get(event_type, np.empty(0))
+        lo = 0 if since is None else np.searchsorted(times, since, side="left")
+        hi = len(rows) if until is None else np.searchsorted(times, until, side="right")
+        mask = np.zeros(len(rows), dtype=bool)
+        mask[lo:hi] = True
+        for field, op, value in where or ():
+            if isinstance(value, str):
+                col = np.array([self.payloads[i].get(field) for i in rows], dtype=object)
+            else:
+                col = self.column(event_type, field)
+            mask &= _OPS[op](col, value)
+        if mode is not None:
+            mask &= self._mode_mask(times, mode)
+        return rows[mask]
+
+    def _mode_mask(self, times, mode):
+        mask = np.zeros(len(times), dtype=bool)
+        for start, end, m in self.mode_timeline:
+            if m != mode:
+                continue
+            lo = np.searchsorted(times, start, side="left")
+            hi = np.searchsorted(times, end, side="left")
+            mask[lo:hi] = True
+        return mask
+
+    def window_before(self, event_type, anchor_type, seconds):
+        """
+        Lignes d'event_type dans les `seconds` précédant chaque événement
+        anchor_type -> (rows, anchor_rows) alignés.
+        """
+        anchors = self.rows(anchor_type)
+        rows = self.rows(event_type)
+        times = self._elapsed_by_type.get(event_type, np.empty(0))
+        anchor_times = self.elapsed[anchors]
+        lo = np.searchsorted(times, anchor_times - seconds, side="left")
+        hi = np.searchsorted(times, anchor_times, side="right")
+        lengths = hi - lo
+        if not lengths.sum():
+            return np.empty(0, dtype=np.int64), np.empty(0, dtype=np.int64)
+        # Concaténation vectorisée des plages [lo, hi)
+        starts = np.repeat(lo - np.concatenate(([0], np.cumsum(lengths)[:-1])), lengths)
+        idx = starts + np.arange(lengths.sum())
+        return rows[idx], np.repeat(anchors, lengths)
+
+    # ------------------------------------------------------------------
+    # Export
+    # ------------------------------------------------------------------
+
+    def to_numpy(self, rows, fields=None):
+        """
+        Tableau structuré (elapsed_time, sim_time, event_type, champs...)
+        pour les lignes données. Champs non numériques -> NaN.
+        """
+        rows = np.asarray(rows, dtype=np.int64)
+        if fields is None:
+            fields = sorted({k for i in rows[:1000] for k, v in self.payloads[i].items()
+                             if isinstance(v, (int, float)) and not isinstance(v, bool)})
+        dtype = [("elapsed_time", "<f8"), ("sim_time", "<f8"), ("event_type", "<i4")]
+        dtype += [(f, "<f8") for f in fields]
+        out = np.empty(len(rows), dtype=dtype)
+        out["elapsed_time"] = self.elapsed[rows]
+        out["sim_time"] = self.sim_time[rows]
+        codes = self.codes[rows]
+        out["event_type"] = codes
+        # Par type présent: colonnes en cache (column) indexées par position dans rows(type)
+        for name in (self.type_names[c] for c in np.unique(codes)):
+            mask = codes == self.type_codes[name]
+            pos = np.searchsorted(self.rows(name), rows[mask])
+            for f in fields:
+                out[f][mask] = self.column(name, f)[pos]
+        return out
+
+    def event(self, row):
+        """Événement reconstruit (dict) d'une ligne"""
+        return {
+            "elapsed_time": float(self.elapsed[row]),
+            "sim_time": None if np.isnan(self.sim_time[row]) else float(self.sim_time[row]),
+            "event_type": self.type_names[self.codes[row]],
+            "data": self.payloads[row],
+        }
+
+
+# ============================================================================
+# CLI
+# ============================================================================
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Requêtes hors-ligne sur un journal de vol")
+    parser.add_argument("log", help="drone_flight_log.json (document unique ou segments JSONL + index)")
+    parser.add_argument("--type", dest="event_type", help="event_type à sélectionner")
+    parser.add_argument("--where", action="append", default=[], help="condition, ex: 'bbox_percent<15'")
+    parser.add_argument("--since", type=float, help="elapsed_time min (s)")
+    parser.add_argument("--until", type=float, help="elapsed_time max (s)")
+    parser.add_argument("--mode", help="seulement pendant ce mode (timeline mode_change)")
+    parser.add_argument("--before", help="fenêtre avant chaque événement de ce type (ex: emergency)")
+    parser.add_argument("--window", type=float, default=5.0, help="taille de la fenêtre --before (s)")
+    parser.add_argument("--fields", help="champs exportés, séparés par des virgules")
+    parser.add_argument("--npy", help="exporte le résultat en .npy (tableau structuré)")
+    parser.add_argument("--limit", type=int, default=20, help="lignes affichées")
+    parser.add_argument("--summary", action="store_true", help="comptes par type et timeline des modes")
+    args = parser.parse_args(argv)
+
+    log = FlightLog.load(args.log)
+
+    if args.summary or not args.event_type:
+        # Bornes ouvertes de la timeline (±inf) -> null: JSON valide
+        modes = [tuple(float(t) if np.isfinite(t) else None for t in (s, e)) + (m,) for s, e, m in log.mode_timeline]
+        print(json.dumps({"events": len(log), "counts": log.counts(), "modes": modes}, indent=2, allow_nan=False))
+        if not args.event_type:
+            return 0
+
+    where = [parse_where(w) for w in args.where]
+    if args.before:
+        rows, _ = log.window_before(args.event_type, args.before, args.window)
+        if where or args.mode or args.since is not None or args.until is not None:
+            keep = log.select(args.event_type, where, args.since, args.until, args.mode)
+            rows = rows[np.isin(rows, keep)]
+    else:
+        rows = log.select(args.event_type, where, args.since, args.until, args.mode)
+
+    print("[flightlog] {} rows".format(len(rows)))
+    if args.npy:
+        fields = args.fields.split(",") if args.fields else None
+        np.save(args.npy, log.to_numpy(rows, fields))
+        print("[flightlog] saved {}".format(args.npy))
+    for row in rows[:args.limit]:
+        print(json.dumps(log.event(row)))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
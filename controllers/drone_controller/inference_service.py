@@ -0,0 +1,309 @@
+# -*- coding: utf-8 -*-
+"""
+🧮 INFERENCE SERVICE - inférence YOLO partagée et mise en batch
+================================================================
+
+Un seul thread possède le détecteur (detectors.py). Chaque HybridTracker
+(une cible de recherche, un drone...) s'enregistre comme client et reçoit
+un InferenceClient qui expose la même interface qu'un détecteur:
+detect(image, conf, classes, imgsz) -> (xyxy, scores, cls). L'appel dépose
+une requête et attend son résultat; le thread du service regroupe les
+requêtes arrivées pendant une courte fenêtre (batch_window) et les passe
+en un seul detect_batch, puis route chaque résultat par identifiant.
+
+- Équité: le batch est composé en round-robin sur les clients (une requête
+  par client et par tour), un client bavard ne peut pas affamer les autres.
+- File bornée: au plus max_pending_per_client requêtes par client (la plus
+  ancienne est abandonnée au profit de l'image la plus récente) et au plus
+  max_pending au total (au-delà, la requête est refusée immédiatement).
+- Les requêtes d'un batch partagent imgsz; leurs classes sont réunies pour
+  l'inférence puis chaque résultat est refiltré (classes, conf) par requête.
+
+Le service est partagé par tous les trackers du processus contrôleur.
+"""
+
+import time
+import itertools
+import threading
+from collections import deque, OrderedDict
+
+import numpy as np
+
+from detectors import empty_detections
+
+
+PENDING = "pending"
+DONE = "done"
+DROPPED = "dropped"
+REJECTED = "rejected"
+
+
+class InferenceRequest:
+    """Une image à détecter + son résultat"""
+
+    __slots__ = ("id", "client", "image", "conf", "classes", "imgsz", "submitted",
+                 "state", "result", "latency", "_event")
+
+    def __init__(self, req_id, client, image, conf, classes, imgsz):
+        self.id = req_id
+        self.client = client
+        self.image = image
+        self.conf = conf
+        self.classes = classes
+        self.imgsz = imgsz
+        self.submitted = time.perf_counter()
+        self.state = PENDING
+        self.result = None
+        self.latency = None
+        self._event = threading.Event()
+
+    def _resolve(self, state, result=None):
+        self.state = state
+        self.result = result if result is not None else empty_detections()
+        self.latency = time.perf_counter() - self.submitted
+        self.image = None  # libère l'image au plus tôt
+        self._event.set()
+
+    def wait(self, timeout=None):
+        self._event.wait(timeout)
+        return self.result if self.state != PENDING else None
+
+
+class InferenceClient:
+    """Vue d'un client: interface détecteur (detect, names) adossée au service"""
+
+    def __init__(self, service, client_id, name):
+        self.service = service
+        self.id = client_id
+        self.name = name
+        self.names = service.detector.names
+        self.backend = "{}+batch".format(service.detector.backend)
+        self.timeout = 2.0
+
+    def detect(self, image, conf=0.25, classes=None, imgsz=None):
+        """Soumet et attend le résultat (thread de détection du tracker)"""
+        request = self.service.submit(self.id, image, conf, classes, imgsz)
+        result = request.wait(self.timeout)
+        return result if result is not None else empty_detections()
+
+    def close(self):
+        self.service.unregister(self.id)
+
+
+class _ClientState:
+    __slots__ = ("name", "pending", "submitted", "completed", "dropped", "rejected", "latency_s")
+
+    def __init__(self, name):
+        self.name = name
+        self.pending = deque()
+        self.submitted = 0
+        self.completed = 0
+        self.dropped = 0
+        self.rejected = 0
+        self.latency_s = 0.0
+
+
+class InferenceService:
+    """Thread d'inférence partagé: fenêtre de batching, round-robin, file bornée"""
+
+    def __init__(self, detector, max_batch=8, batch_window=0.005,
+                 max_pending=32, max_pending_per_client=2):
+        self.detector = detector
+        self.max_batch = max_batch
+        self.batch_window = batch_window
+        self.max_pending = max_pending
+        self.max_pending_per_client = max_pending_per_client
+        self._cond = threading.Condition()
+        self._clients = OrderedDict()  # ordre = tour de round-robin
+        self._ids = itertools.count(1)
+        self._req_ids = itertools.count(1)
+        self._pending = 0
+        self._running = False
+        self._thread = None
+        self.batches = 0
+        self.batched_images = 0
+        self.max_batch_seen = 0
+        self.infer_s = 0.0
+        self.errors = 0
+
+    # ------------------------------------------------------------------
+    # Clients
+    # ------------------------------------------------------------------
+
+    def register(self, name):
+        """Nouveau client -> InferenceClient (démarre le service au besoin)"""
+        with self._cond:
+            client_id = next(self._ids)
+            self._clients[client_id] = _ClientState(name)
+        self.start()
+        return InferenceClient(self, client_id, name)
+
+    def unregister(self, client_id):
+        """Retire un client; ses requêtes en attente sont abandonnées"""
+        with self._cond:
+            state = self._clients.pop(client_id, None)
+            if state is None:
+                return
+            self._pending -= len(state.pending)
+            dropped = list(state.pending)
+        for request in dropped:
+            request._resolve(DROPPED)
+
+    def submit(self, client_id, image, conf=0.25, classes=None, imgsz=None):
+        """Dépose une requête (non bloquant) et retourne l'InferenceRequest"""
+        request = InferenceRequest(next(self._req_ids), client_id, image, conf, classes, imgsz)
+        evicted = None
+        with self._cond:
+            state = self._clients.get(client_id)
+            if state is None:
+                request._resolve(REJECTED)
+                return request
+            state.submitted += 1
+            if len(state.pending) >= self.max_pending_per_client:
+                # Image la plus récente prioritaire: on abandonne la plus ancienne de ce client
+                evicted = state.pending.popleft()
+                state.dropped += 1
+                self._pending -= 1
+            if self._pending >= self.max_pending:
+                state.rejected += 1
+                request._resolve(REJECTED)
+                if evicted is not None:
+                    evicted._resolve(DROPPED)
+                return request
+            state.pending.append(request)
+            self._pending += 1
+            self._cond.notify()
+        if evicted is not None:
+            evicted._resolve(DROPPED)
+        return request
+
+    # ------------------------------------------------------------------
+    # Thread d'inférence
+    # ------------------------------------------------------------------
+
+    def start(self):
+        with self._cond:
+            if self._running:
+                return
+            self._running = True
+            self._thread = threading.Thread(target=self._loop, name="inference", daemon=True)
+            self._thread.start()
+
+    def stop(self, timeout=1.0):
+        with self._cond:
+            self._running = False
+            self._cond.notify_all()
+        if self._thread:
+            self._thread.join(timeout)
+        for client_id in list(self._clients):
+            self.unregister(client_id)
+
+    def _take_batch(self):
+        """Compose un batch en round-robin (sous verrou): une requête par client et par tour"""
+        batch = []
+        imgsz = None
+        progress = True
+        while len(batch) < self.max_batch and progress:
+            progress = False
+            for client_id in list(self._clients):
+                state = self._clients[client_id]
+                if not state.pending:
+                    continue
+                head = state.pending[0]
+                if batch and head.imgsz != imgsz:
+                    continue  # taille d'entrée différente: batch suivant
+                imgsz = head.imgsz
+                batch.append(state.pending.popleft())
+                self._pending -= 1
+                progress = True
+                # Le client servi passe en fin de tour (équité entre batchs)
+                self._clients.move_to_end(client_id)
+                if len(batch) >= self.max_batch:
+                    break
+        return batch
+
+    def _loop(self):
+        while True:
+            with self._cond:
+                while self._running and self._pending == 0:
+                    self._cond.wait(0.1)
+                if not self._running:
+                    return
+                # Fenêtre de batching: laisse les autres clients déposer leur image
+                deadline = time.perf_counter() + self.batch_window
+                while self._pending < min(self.max_batch, len(self._clients)):
+                    remaining = deadline - time.perf_counter()
+                    if remaining <= 0 or not self._cond.wait(remaining):
+                        break
+                batch = self._take_batch()
+            if batch:
+                self._run_batch(batch)
+
+    def _run_batch(self, batch):
+        classes = None
+        if all(r.classes is not None for r in batch):
+            classes = sorted({c for r in batch for c in r.classes})
+        conf = min(r.conf for r in batch)
+        t0 = time.perf_counter()
+        try:
+            results = self.detector.detect_batch([r.image for r in batch], conf, classes, batch[0].imgsz)
+        except Exception as e:
+            self.errors += 1
+            print(f"[InferenceService] Batch error: {e}")
+            results = [None] * len(batch)
+        dt = time.perf_counter() - t0
+        with self._cond:
+            self.batches += 1
+            self.batched_images += len(batch)
+            self.max_batch_seen = max(self.max_batch_seen, len(batch))
+            self.infer_s += dt
+        for request, result in zip(batch, results):
+            if result is not None:
+                result = _refilter(result, request.conf, request.classes)
+            request._resolve(DONE, result)
+            with self._cond:
+                state = self._clients.get(request.client)
+                if state is not None:
+                    state.completed += 1
+                    state.latency_s += request.latency
+
+    # ------------------------------------------------------------------
+    # Lecture
+    # ------------------------------------------------------------------
+
+    def stats(self):
+        with self._cond:
+            clients = {
+                "{}#{}".format(state.name, client_id): {
+                    "pending": len(state.pending),
+                    "submitted": state.submitted,
+                    "completed": state.completed,
+                    "dropped": state.dropped,
+                    "rejected": state.rejected,
+                    "latency_ms": round(state.latency_s / state.completed * 1000, 2) if state.completed else None,
+                }
+                for client_id, state in self._clients.items()
+            }
+            return {
+                "backend": self.detector.backend,
+                "running": self._running,
+                "pending": self._pending,
+                "max_pending": self.max_pending,
+                "batches": self.batches,
+                "mean_batch": round(self.batched_images / self.batches, 2) if self.batches else 0.0,
+                "max_batch_seen": self.max_batch_seen,
+                "infer_ms_per_image": round(self.infer_s / self.batched_images * 1000, 2) if self.batched_images else None,
+                "errors": self.errors,
+                "clients": clients,
+            }
+
+
+def _refilter(result, conf, classes):
+    """Résultat d'un batch (classes réunies, conf minimale) -> filtres de la requête"""
+    xyxy, scores, cls = result
+    keep = scores >= conf
+    if classes is not None:
+        keep &= np.isin(cls, classes)
+    if keep.all():
+        return result
+    return xyxy[keep], scores[keep], cls[keep]
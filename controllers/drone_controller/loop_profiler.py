@@ -0,0 +1,272 @@
+# -*- coding: utf-8 -*-
+"""
+⏱️ LOOP PROFILER - temps par phase de _control_step
+===================================================
+
+Chaque phase du pas de contrôle (capteurs, logging, tracker, contrôle,
+annotation, écriture vidéo...) est chronométrée avec perf_counter_ns et
+cumulée sur le pas; à la fin du pas les cumuls tombent dans des histogrammes
+à buckets fixes (aucune allocation, bisect en C). Les percentiles
+p50/p95/p99 sont estimés depuis les buckets (borne haute), le max est exact.
+Les pas plus longs que basicTimeStep sont comptés comme dépassements.
+
+Coût quasi nul quand désactivé: _control_step ne garde qu'une référence
+locale `prof = None` et chaque point de mesure est un simple `if prof:`.
+
+    prof = profiler.begin_step()      # None si désactivé
+    ...
+    if prof: t = prof.mark("sensors", t)
+    ...
+    if prof: prof.end_step()
+
+LoadShedder applique l'échéance du pas: la stabilisation (IMU -> mixage
+moteurs) est temps réel dur et toujours exécutée; le travail "soft"
+(tracker KCF, annotation vidéo, logging télémétrie) est
+délesté quand il ne tient plus dans le budget restant, ou tout le pas si
+le pas précédent a dépassé basicTimeStep.
+"""
+
+import threading
+from bisect import bisect_right
+from time import perf_counter_ns
+
+
+# Bornes des buckets (ns): 1 µs -> 1 s, ~3 buckets par décade
+DEFAULT_BUCKETS_NS = [
+    int(v * 1000) for v in (
+        1, 2, 5, 10, 20, 50, 100, 200, 500,
+        1000, 2000, 4000, 6000, 8000, 10000, 12000, 16000, 20000, 30000, 50000,
+        100000, 200000, 500000, 1000000,
+    )
+]
+
+STEP_PHASE = "step"
+
+
+class PhaseHistogram:
+    """Histogramme à buckets fixes d'une phase"""
+
+    __slots__ = ("edges", "counts", "count", "total_ns", "max_ns")
+
+    def __init__(self, edges):
+        self.edges = edges
+        self.counts = [0] * (len(edges) + 1)
+        self.count = 0
+        self.total_ns = 0
+        self.max_ns = 0
+
+    def add(self, dt):
+        self.counts[bisect_right(self.edges, dt)] += 1
+        self.count += 1
+        self.total_ns += dt
+        if dt > self.max_ns:
+            self.max_ns = dt
+
+    def percentile(self, q):
+        """Borne haute du bucket contenant le quantile q (ns), bornée par le max"""
+        if not self.count:
+            return 0
+        rank = q * self.count
+        seen = 0
+        for i, c in enumerate(self.counts):
+            seen += c
+            if seen >= rank and c:
+                upper = self.edges[i] if i < len(self.edges) else self.max_ns
+                return min(upper, self.max_ns)
+        return self.max_ns
+
+    def summary(self):
+        us = 1e-3
+        return {
+            "count": self.count,
+            "mean_us": round(self.total_ns / self.count * us, 1) if self.count else 0.0,
+            "p50_us": round(self.percentile(0.50) * us, 1),
+            "p95_us": round(self.percentile(0.95) * us, 1),
+            "p99_us": round(self.percentile(0.99) * us, 1),
+            "max_us": round(self.max_ns * us, 1),
+        }
+
+
+class LoopProfiler:
+    """Profileur par phase du pas de contrôle, activable à chaud"""
+
+    def __init__(self, budget_ms, buckets_ns=None, enabled=False):
+        self.budget_ns = int(budget_ms * 1e6)
+        self.edges = list(buckets_ns or DEFAULT_BUCKETS_NS)
+        self.enabled = enabled
+        self.lock = threading.Lock()
+        self._reset_locked()
+
+    def _reset_locked(self):
+        self._hist = {}
+        self._step_acc = {}
+        self._step_start = 0
+        self.steps = 0
+        self.overruns = 0
+        self.worst_overrun_ns = 0
+
+    def reset(self):
+        with self.lock:
+            self._reset_locked()
+
+    def set_enabled(self, enabled):
+        self.enabled = bool(enabled)
+
+    # ------------------------------------------------------------------
+    # Points de mesure (thread de contrôle)
+    # ------------------------------------------------------------------
+
+    def begin_step(self):
+        """Début du pas: retourne self si actif, None sinon"""
+        if not self.enabled:
+            return None
+        self._step_acc.clear()
+        self._step_start = perf_counter_ns()
+        return self
+
+    @property
+    def step_start(self):
+        return self._step_start
+
+    def mark(self, phase, t_prev):
+        """Ajoute now - t_prev à la phase et retourne now (début de la phase suivante)"""
+        now = perf_counter_ns()
+        acc = self._step_acc
+        acc[phase] = acc.get(phase, 0) + (now - t_prev)
+        return now
+
+    def end_step(self):
+        """Fin du pas: cumuls -> histogrammes, comptage des dépassements"""
+        total = perf_counter_ns() - self._step_start
+        with self.lock:
+            hist = self._hist
+            for phase, dt in self._step_acc.items():
+                h = hist.get(phase)
+                if h is None:
+                    h = hist[phase] = PhaseHistogram(self.edges)
+                h.add(dt)
+            h = hist.get(STEP_PHASE)
+            if h is None:
+                h = hist[STEP_PHASE] = PhaseHistogram(self.edges)
+            h.add(total)
+            self.steps += 1
+            if total > self.budget_ns:
+                self.overruns += 1
+                self.worst_overrun_ns = max(self.worst_overrun_ns, total - self.budget_ns)
+        return total
+
+    # ------------------------------------------------------------------
+    # Lecture (thread Flask)
+    # ------------------------------------------------------------------
+
+    def snapshot(self):
+        with self.lock:
+            phases = {name: h.summary() for name, h in self._hist.items()}
+            return {
+                "enabled": self.enabled,
+                "budget_ms": self.budget_ns / 1e6,
+                "steps": self.steps,
+                "overruns": self.overruns,
+                "overrun_ratio": round(self.overruns / self.steps, 4) if self.steps else 0.0,
+                "worst_overrun_us": round(self.worst_overrun_ns * 1e-3, 1),
+                "phases": phases,
+            }
+
+
+# ============================================================================
+# LOAD SHEDDING
+# ============================================================================
+
+# Tâches délestables, de la moins à la plus importante
+SOFT_TASKS = ("telemetry", "annotate", "tracker")
+
+# Délestées d'office quand le pas précédent a dépassé le budget
+PRESSURE_SHED = ("telemetry", "annotate")
+
+
+class LoadShedder:
+    """
+    Ordonnanceur d'échéance du pas de contrôle.
+
+    try_start(task) -> t0 (ns) si la tâche tient dans le budget restant
+    (coût estimé par EMA + réserve pour la fin du pas dur), None sinon.
+    finish(task, t0) met à jour l'estimation de coût. Une tâche délestée
+    max_defer pas d'affilée est forcée au pas suivant (pas de famine).
+    """
+
+    def __init__(self, budget_ms, reserve_ms=1.0, max_defer=4, enabled=True):
+        self.budget_ns = int(budget_ms * 1e6)
+        self.reserve_ns = int(reserve_ms * 1e6)
+        self.max_defer = max_defer
+        self.enabled = enabled
+        self.lock = threading.Lock()
+        self._step_start = 0
+        self.pressure = False
+        self._cost_ns = {task: 0 for task in SOFT_TASKS}
+        self._deferred = {task: 0 for task in SOFT_TASKS}
+        self._shed_now = []
+        self.last_shed = []
+        self.steps = 0
+        self.overruns = 0
+        self.shed = {task: 0 for task in SOFT_TASKS}
+        self.forced = {task: 0 for task in SOFT_TASKS}
+
+    def set_enabled(self, enabled):
+        self.enabled = bool(enabled)
+
+    def begin_step(self):
+        self._step_start = perf_counter_ns()
+        self._shed_now = []
+        return self._step_start
+
+    def try_start(self, task):
+        """Début d'une tâche soft: t0 si autorisée, None si délestée"""
+        now = perf_counter_ns()
+        if not self.enabled:
+            return now
+        over = (self.pressure and task in PRESSURE_SHED) or \
+            now - self._step_start + self._cost_ns[task] + self.reserve_ns > self.budget_ns
+        if not over:
+            self._deferred[task] = 0
+            return now
+        if self._deferred[task] >= self.max_defer:
+            self._deferred[task] = 0
+            self.forced[task] += 1
+            return now
+        self._deferred[task] += 1
+        self.shed[task] += 1
+        self._shed_now.append(task)
+        return None
+
+    def allow(self, task):
+        return self.try_start(task) is not None
+
+    def finish(self, task, t0):
+        """Fin d'une tâche: EMA de son coût (alpha 1/8)"""
+        dt = perf_counter_ns() - t0
+        cost = self._cost_ns[task]
+        self._cost_ns[task] = dt if not cost else cost + ((dt - cost) >> 3)
+
+    def end_step(self):
+        total = perf_counter_ns() - self._step_start
+        self.pressure = total > self.budget_ns
+        with self.lock:
+            self.steps += 1
+            if self.pressure:
+                self.overruns += 1
+            self.last_shed = self._shed_now
+        return total
+
+    def stats(self):
+        with self.lock:
+            return {
+                "enabled": self.enabled,
+                "budget_ms": self.budget_ns / 1e6,
+                "pressure": self.pressure,
+                "steps": self.steps,
+                "overruns": self.overruns,
+                "shed": dict(self.shed),
+                "forced": dict(self.forced),
+                "last_shed": list(self.last_shed),
+                "cost_us": {task: round(ns * 1e-3, 1) for task, ns in self._cost_ns.items()},
+            }
@@ -0,0 +1,228 @@
+# -*- coding: utf-8 -*-
+"""
+📈 TELEMETRY RECORDER
+=====================
+
+Enregistreur binaire colonnaire pour les canaux haute fréquence (125 Hz):
+IMU, gyro, GPS, commandes de contrôle, vitesses moteurs, altitude.
+
+Chaque canal a un schéma NumPy (structured dtype) dérivé des champs que
+_control_step journalisait en JSON. Les échantillons sont écrits dans des
+chunks préalloués; un chunk plein est remplacé par un chunk libre et sauvé
+en segment .npy par un thread d'arrière-plan. Les segments se relisent en
+memory-map (np.load(..., mmap_mode="r")) sans tout charger.
+
+Arborescence:
+    <out_dir>/manifest.json
+    <out_dir>/<channel>/<channel>_00000.npy
+    <out_dir>/<channel>/<channel>_00001.npy
+    ...
+
+Les événements lisibles (takeoff, land, mode_change...) restent dans
+DroneActionLogger.
+"""
+
+import os
+import json
+import glob
+import queue
+import threading
+from datetime import datetime
+
+import numpy as np
+
+
+# Colonnes communes: temps simulation Webots (s) + compteur de pas
+_BASE_FIELDS = [("sim_time", "<f8"), ("step", "<u4")]
+
+# Un schéma par canal (mêmes champs que les anciens événements JSON)
+CHANNEL_SCHEMAS = {
+    "imu": np.dtype(_BASE_FIELDS + [
+        ("roll", "<f4"), ("pitch", "<f4"), ("yaw", "<f4"),
+    ]),
+    "gyro": np.dtype(_BASE_FIELDS + [
+        ("roll_rate", "<f4"), ("pitch_rate", "<f4"), ("yaw_rate", "<f4"),
+    ]),
+    "gps": np.dtype(_BASE_FIELDS + [
+        ("x", "<f8"), ("y", "<f8"), ("z", "<f8"),
+    ]),
+    "altitude_control": np.dtype(_BASE_FIELDS + [
+        ("target", "<f4"), ("current", "<f4"), ("vertical_input", "<f4"),
+    ]),
+    "control_commands": np.dtype(_BASE_FIELDS + [
+        ("pitch_corr", "<f4"), ("yaw_corr", "<f4"),
+        ("pitch_input", "<f4"), ("yaw_input", "<f4"),
+        ("roll_input", "<f4"), ("vertical_input", "<f4"),
+        ("mode", "u1"),
+    ]),
+    "motor_velocities": np.dtype(_BASE_FIELDS + [
+        ("front_left", "<f4"), ("front_right", "<f4"),
+        ("rear_left", "<f4"), ("rear_right", "<f4"),
+    ]),
+}
+
+
+class _ChannelBuffer:
+    """Chunk courant d'un canal + pool de chunks libres"""
+
+    def __init__(self, name, dtype, chunk_size, spare_chunks):
+        self.name = name
+        self.dtype = dtype
+        self.chunk_size = chunk_size
+        self.chunk = np.empty(chunk_size, dtype=dtype)
+        self.free = queue.Queue()
+        for _ in range(spare_chunks):
+            self.free.put(np.empty(chunk_size, dtype=dtype))
+        self.allocated = spare_chunks + 1
+        self.count = 0
+        self.segment = 0
+        self.samples = 0
+        self.dropped = 0
+
+
+class TelemetryRecorder:
+    """Enregistreur colonnaire par chunks NumPy préalloués"""
+
+    def __init__(self, out_dir, channels=None, chunk_size=4096, spare_chunks=3, max_chunks=16, metadata=None):
+        self.out_dir = out_dir
+        self.chunk_size = chunk_size
+        self.max_chunks = max_chunks
+        self.metadata = metadata or {}
+        self.start_iso = datetime.now().isoformat()
+        self.lock = threading.Lock()
+        self.closed = False
+        self._on_closed = None
+
+        names = channels or list(CHANNEL_SCHEMAS)
+        self._channels = {}
+        for name in names:
+            os.makedirs(os.path.join(out_dir, name), exist_ok=True)
+            self._channels[name] = _ChannelBuffer(name, CHANNEL_SCHEMAS[name], chunk_size, spare_chunks)
+
+        # Sauvegarde des chunks pleins en arrière-plan
+        self._pending = queue.Queue()
+        self._writer = threading.Thread(target=self._writer_loop, name="TelemetryWriter", daemon=True)
+        self._writer.start()
+        self._write_manifest()
+
+    def _write_manifest(self, footer=None):
+        manifest = {
+            "format": "npy-segments",
+            "start_time": self.start_iso,
+            "chunk_size": self.chunk_size,
+            "channels": {
+                name: {
+                    "dtype": [list(f) for f in ch.dtype.descr],
+                    "segments": ch.segment,
+                    "samples": ch.samples,
+                    "dropped": ch.dropped,
+                }
+                for name, ch in self._channels.items()
+            },
+            "metadata": self.metadata,
+        }
+        if footer:
+            manifest.update(footer)
+        path = os.path.join(self.out_dir, "manifest.json")
+        with open(path + ".tmp", 'w') as f:
+            json.dump(manifest, f, indent=2)
+        os.replace(path + ".tmp", path)
+
+    def record(self, channel, sim_time, step, *values):
+        """Ajoute un échantillon (O(1), aucune allocation hors swap de chunk)"""
+        with self.lock:
+            if self.closed:
+                return
+            ch = self._channels.get(channel)
+            if ch is None:
+                return
+            ch.chunk[ch.count] = (sim_time, step) + values
+            ch.count += 1
+            ch.samples += 1
+            if ch.count == ch.chunk_size:
+                self._swap_chunk(ch)
+
+    def _swap_chunk(self, ch):
+        """Remplace le chunk plein par un chunk libre (appelé sous self.lock)"""
+        try:
+            fresh = ch.free.get_nowait()
+        except queue.Empty:
+            if ch.allocated >= self.max_chunks:
+                # Disque trop lent: on réutilise le chunk courant (échantillons perdus)
+                ch.dropped += ch.count
+                ch.samples -= ch.count
+                ch.count = 0
+                return
+            fresh = np.empty(self.chunk_size, dtype=ch.dtype)
+            ch.allocated += 1
+        self._pending.put((ch, ch.chunk, ch.count, ch.segment))
+        ch.segment += 1
+        ch.chunk = fresh
+        ch.count = 0
+
+    def _writer_loop(self):
+        while True:
+            item = self._pending.get()
+            if item is None:
+                # Fermeture: tous les chunks sont écrits, manifeste final puis notification
+                self._write_manifest({"end_time": datetime.now().isoformat()})
+                if self._on_closed:
+                    self._on_closed(self)
+                break
+            ch, chunk, count, segment = item
+            path = os.path.join(self.out_dir, ch.name, "{}_{:05d}.npy".format(ch.name, segment))
+            try:
+                np.save(path, chunk[:count])
+            except Exception as e:
+                print("[TelemetryRecorder] Write error {}: {}".format(path, e))
+            # Le chunk retourne dans le pool (taille complète)
+            ch.free.put(chunk)
+
+    def stats(self):
+        with self.lock:
+            return {name: {"samples": ch.samples, "segments": ch.segment, "dropped": ch.dropped}
+                    for name, ch in self._channels.items()}
+
+    def close(self, wait=True, on_closed=None):
+        """
+        Écrit les chunks partiels et le manifeste final. wait=False (thread de
+        contrôle): ne fait que signaler le writer, qui appelle on_closed(recorder)
+        une fois tout écrit.
+        """
+        with self.lock:
+            if self.closed:
+                return
+            self.closed = True
+            self._on_closed = on_closed
+            for ch in self._channels.values():
+                if ch.count:
+                    self._pending.put((ch, ch.chunk, ch.count, ch.segment))
+                    ch.segment += 1
+                    ch.chunk = np.empty(0, dtype=ch.dtype)
+                    ch.count = 0
+        self._pending.put(None)
+        if wait:
+            self._writer.join()
+
+
+# ============================================================================
+# LECTURE
+# ============================================================================
+
+def channel_segments(out_dir, channel):
+    """Chemins des segments d'un canal, dans l'ordre"""
+    return sorted(glob.glob(os.path.join(out_dir, channel, "{}_*.npy".format(channel))))
+
+
+def open_channel(out_dir, channel, mmap=True):
+    """Liste des segments d'un canal (memory-mappés par défaut)"""
+    mode = "r" if mmap else None
+    return [np.load(path, mmap_mode=mode) for path in channel_segments(out_dir, channel)]
+
+
+def load_channel(out_dir, channel):
+    """Concatène tous les segments d'un canal en un seul tableau structuré"""
+    segments = open_channel(out_dir, channel)
+    if not segments:
+        return np.empty(0, dtype=CHANNEL_SCHEMAS.get(channel))
+    return np.concatenate(segments)
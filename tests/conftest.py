@@ -0,0 +1,7 @@
+# -*- coding: utf-8 -*-
+"""Tests hors Webots des modules de controllers/drone_controller"""
+
+import os
+import sys
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "controllers", "drone_controller"))
@@ -0,0 +1,91 @@
+# -*- coding: utf-8 -*-
+"""decode_camera_image sur des buffers synthétiques (sans Webots)"""
+
+import numpy as np
+import pytest
+
+from camera_frames import decode_camera_image
+
+W, H = 7, 5
+
+
+def _bgr():
+    return np.random.default_rng(0).integers(0, 256, (H, W, 3), dtype=np.uint8)
+
+
+def _pixels(layout, bgr):
+    alpha = np.full((H, W, 1), 255, dtype=np.uint8)
+    return np.ascontiguousarray({
+        "BGRA": np.concatenate([bgr, alpha], axis=2),
+        "RGBA": np.concatenate([bgr[:, :, ::-1], alpha], axis=2),
+        "ARGB": np.concatenate([alpha, bgr[:, :, ::-1]], axis=2),
+        "ABGR": np.concatenate([alpha, bgr], axis=2),
+        "BGR": bgr,
+        "RGB": bgr[:, :, ::-1],
+    }[layout])
+
+
+def _padded(pixels, align=16):
+    row = pixels.reshape(H, -1)
+    padded = np.zeros((H, (row.shape[1] + align - 1) // align * align), dtype=np.uint8)
+    padded[:, :row.shape[1]] = row
+    return padded
+
+
+LAYOUTS = ["BGRA", "RGBA", "ARGB", "ABGR", "BGR", "RGB"]
+
+
+@pytest.mark.parametrize("layout", LAYOUTS)
+def test_layouts(layout):
+    bgr = _bgr()
+    assert np.array_equal(decode_camera_image(_pixels(layout, bgr).tobytes(), W, H, layout), bgr)
+
+
+@pytest.mark.parametrize("layout", LAYOUTS)
+def test_padded_rows(layout):
+    bgr = _bgr()
+    padded = _padded(_pixels(layout, bgr))
+    assert np.array_equal(decode_camera_image(padded.tobytes(), W, H, layout), bgr)
+
+
+@pytest.mark.parametrize("layout", LAYOUTS)
+def test_explicit_stride_without_last_row_padding(layout):
+    bgr = _bgr()
+    pixels = _pixels(layout, bgr)
+    padded = _padded(pixels)
+    raw = padded.tobytes()[:padded.shape[1] * (H - 1) + pixels[0].size]
+    assert np.array_equal(decode_camera_image(raw, W, H, layout, stride=padded.shape[1]), bgr)
+
+
+@pytest.mark.parametrize("extra", [3, H, 2 * H])
+def test_unexpected_size_raises(extra):
+    # Ni lignes compactes ni stride aligné (un surplus divisible par la hauteur ne suffit pas): pas de lecture décalée
+    raw = _pixels("BGRA", _bgr()).tobytes() + b"\0" * extra
+    with pytest.raises(ValueError):
+        decode_camera_image(raw, W, H, "BGRA")
+
+
+def test_trailing_bytes_with_explicit_stride():
+    bgr = _bgr()
+    raw = _pixels("BGRA", bgr).tobytes() + b"\0" * H
+    assert np.array_equal(decode_camera_image(raw, W, H, "BGRA", stride=W * 4), bgr)
+
+
+def test_three_channel_buffer_announced_bgra_into_dst():
+    bgr = _bgr()
+    dst = np.empty((H, W, 3), dtype=np.uint8)
+    assert decode_camera_image(bgr.tobytes(), W, H, "BGRA", dst=dst) is dst
+    assert np.array_equal(dst, bgr)
+
+
+def test_short_buffer():
+    with pytest.raises(ValueError):
+        decode_camera_image(b"\0" * 10, W, H)
+
+
+def test_invalid_stride():
+    raw = _pixels("BGRA", _bgr()).tobytes()
+    with pytest.raises(ValueError):
+        decode_camera_image(raw, W, H, stride=W * 4 - 1)
+    with pytest.raises(ValueError):
+        decode_camera_image(raw, W, H, stride=W * 4 + 16)
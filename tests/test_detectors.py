@@ -0,0 +1,127 @@
+# -*- coding: utf-8 -*-
+"""Pré / post-traitement de detectors.py sur des sorties synthétiques (sans modèle)"""
+
+import numpy as np
+
+from detectors import (letterbox, decode_yolo_output, largest_box, resolve_class_id, expand_roi, roi_imgsz,
+                       COCO_NAMES)
+
+
+def _yolo_output(detections, scale, pad, nc=80, anchors=8):
+    """Sortie brute (1, 4 + nc, anchors) pour des boîtes du repère image d'origine"""
+    output = np.zeros((1, 4 + nc, anchors), dtype=np.float32)
+    for i, ((x1, y1, x2, y2), cls, score) in enumerate(detections):
+        output[0, 0:4, i] = [(x1 + x2) / 2 * scale + pad[0], (y1 + y2) / 2 * scale + pad[1],
+                             (x2 - x1) * scale, (y2 - y1) * scale]
+        output[0, 4 + cls, i] = score
+    return output
+
+
+def test_letterbox_pads_short_side():
+    image = np.full((240, 400, 3), 7, dtype=np.uint8)
+    canvas, scale, pad_x, pad_y = letterbox(image, 640)
+    assert canvas.shape == (640, 640, 3)
+    assert (pad_x, pad_y) == (0, 128) and scale == 1.6
+    assert (canvas[:pad_y] == 114).all() and (canvas[-pad_y:] == 114).all()
+    assert (canvas[pad_y:640 - pad_y] == 7).all()
+
+
+def test_letterbox_reuses_dst():
+    image = np.zeros((160, 160, 3), dtype=np.uint8)
+    dst = np.empty((320, 320, 3), dtype=np.uint8)
+    canvas, scale, pad_x, pad_y = letterbox(image, 320, dst=dst)
+    assert canvas is dst and scale == 2.0 and (pad_x, pad_y) == (0, 0)
+
+
+def test_decode_unmaps_letterbox_and_applies_nms():
+    image = np.zeros((240, 400, 3), dtype=np.uint8)
+    _, scale, pad_x, pad_y = letterbox(image, 640)
+    output = _yolo_output([
+        ((100, 50, 160, 200), 0, 0.90),
+        ((102, 52, 162, 198), 0, 0.80),  # doublon -> supprimé par NMS
+        ((250, 100, 350, 160), 2, 0.70),
+        ((10, 10, 30, 30), 2, 0.10),     # sous le seuil
+    ], scale, (pad_x, pad_y))
+    xyxy, scores, cls = decode_yolo_output(output, 0.25, None, 0.45, scale, (pad_x, pad_y), image.shape)
+    assert list(cls) == [0, 2]
+    assert np.allclose(xyxy, [(100, 50, 160, 200), (250, 100, 350, 160)], atol=1e-3)
+    assert np.allclose(scores, [0.9, 0.7])
+    assert xyxy.dtype == np.float32 and cls.dtype == np.int32
+
+
+def test_decode_clips_to_image():
+    image_shape = (240, 400, 3)
+    _, scale, pad_x, pad_y = letterbox(np.zeros(image_shape, dtype=np.uint8), 640)
+    output = _yolo_output([((-20, -10, 50, 60), 0, 0.9), ((380, 200, 430, 260), 0, 0.8)], scale, (pad_x, pad_y))
+    xyxy, _, _ = decode_yolo_output(output, 0.25, None, 0.45, scale, (pad_x, pad_y), image_shape)
+    assert np.allclose(xyxy, [(0, 0, 50, 60), (380, 200, 400, 240)], atol=1e-3)
+
+
+def test_decode_class_filter():
+    output = _yolo_output([((0, 0, 50, 50), 0, 0.9), ((100, 100, 150, 150), 2, 0.7)], 1.0, (0, 0))
+    # La personne a aussi un score faible en "car": le filtre ne garde que le meilleur score parmi [2]
+    output[0, 4 + 2, 0] = 0.3
+    xyxy, scores, cls = decode_yolo_output(output, 0.25, [2], 0.45)
+    assert list(cls) == [2, 2]
+    assert np.allclose(scores, [0.7, 0.3])  # ordre NMS: score décroissant
+    xyxy, scores, cls = decode_yolo_output(output, 0.5, [2], 0.45)
+    assert list(cls) == [2] and np.allclose(xyxy, [(100, 100, 150, 150)])
+
+
+def test_decode_batch_item_and_empty():
+    output = _yolo_output([((0, 0, 50, 50), 1, 0.9)], 1.0, (0, 0))
+    xyxy, _, cls = decode_yolo_output(output[0])  # sortie d'un élément de batch: (4 + nc, anchors)
+    assert list(cls) == [1] and np.allclose(xyxy, [(0, 0, 50, 50)])
+    xyxy, scores, cls = decode_yolo_output(np.zeros_like(output))
+    assert xyxy.shape == (0, 4) and scores.shape == (0,) and cls.shape == (0,)
+
+
+def test_largest_box_respects_min_size():
+    boxes = np.array([[0, 0, 10, 100], [0, 0, 40, 40.9], [5, 5, 60, 50], [0, 0, 100, 14]], dtype=np.float32)
+    assert largest_box(boxes, 15) == 2
+    assert largest_box(boxes[:2], 15) == 1
+    assert largest_box(boxes[:1], 15) == -1  # 10 px de large
+    assert largest_box(boxes[3:], 15) == -1  # 14 px de haut
+    assert largest_box(np.empty((0, 4), dtype=np.float32), 15) == -1
+
+
+def test_largest_box_truncates_to_pixels():
+    # 14.9 px -> 14 px tronqués, comme les int() de _detect_with_yolo_sync
+    boxes = np.array([[0, 0, 14.9, 50], [0, 0, 15, 15]], dtype=np.float32)
+    assert largest_box(boxes, 15) == 1
+
+
+def test_largest_box_after_class_filter():
+    # Sélection de HybridTracker: plus grande boîte parmi la classe cible seulement
+    xyxy = np.array([[0, 0, 200, 200], [0, 0, 30, 30], [50, 50, 120, 100]], dtype=np.float32)
+    cls = np.array([2, 0, 0], dtype=np.int32)
+    person = resolve_class_id(dict(enumerate(COCO_NAMES)), "person")
+    best = largest_box(xyxy[cls == person], 15)
+    assert np.array_equal(xyxy[cls == person][best], [50, 50, 120, 100])
+
+
+def test_resolve_class_id():
+    names = dict(enumerate(COCO_NAMES))
+    assert resolve_class_id(names, "Car") == 2
+    assert resolve_class_id(names, "teddy bear") == 77
+    assert resolve_class_id(names, "spaceship") is None
+
+
+def test_expand_roi_scales_around_center():
+    assert expand_roi((150, 100, 190, 140), 400, 240) == (122, 72, 218, 168)  # 2x40 < 96 -> 96
+    assert expand_roi((150, 80, 210, 160), 400, 240) == (120, 40, 240, 200)
+
+
+def test_expand_roi_shifts_inside_image():
+    # Décalée plutôt que rognée au bord, jamais plus grande que l'image
+    assert expand_roi((100, 50, 160, 200), 400, 240) == (70, 0, 190, 240)
+    assert expand_roi((0, 0, 20, 20), 400, 240) == (0, 0, 96, 96)
+    assert expand_roi((380, 220, 400, 240), 400, 240) == (304, 144, 400, 240)
+    assert expand_roi((0, 0, 400, 240), 400, 240) == (0, 0, 400, 240)
+
+
+def test_roi_imgsz_clamped_multiple_of_step():
+    assert roi_imgsz((0, 0, 96, 96)) == 160
+    assert roi_imgsz((0, 0, 190, 240)) == 256
+    assert roi_imgsz((0, 0, 400, 240)) == 416
+    assert roi_imgsz((0, 0, 1000, 100)) == 640
@@ -0,0 +1,99 @@
+# -*- coding: utf-8 -*-
+"""File d'événements et journal de vol (flight_logger.py)"""
+
+import json
+
+from flight_logger import (EventRingQueue, DroneActionLogger, OVERFLOW_DROP_NEWEST, OVERFLOW_BLOCK,
+                           STORAGE_JSON, STORAGE_JSONL)
+
+
+def test_drop_oldest_skips_critical_head():
+    q = EventRingQueue(capacity=4)
+    q.put("takeoff", critical=True)
+    for i in range(10):
+        assert q.put(i)
+    assert q.pop_batch() == ["takeoff", 7, 8, 9]
+    assert q.stats()["dropped_oldest"] == 7
+
+
+def test_drop_oldest_keeps_order_around_criticals():
+    q = EventRingQueue(capacity=4)
+    q.put("takeoff", critical=True)
+    q.put(0)
+    q.put("land", critical=True)
+    q.put(1)
+    q.put(2)  # évince 0, pas les critiques
+    assert q.pop_batch() == ["takeoff", "land", 1, 2]
+
+
+def test_full_of_criticals_rejects_non_critical():
+    q = EventRingQueue(capacity=2, overflow=OVERFLOW_DROP_NEWEST)
+    q.put("takeoff", critical=True)
+    q.put("land", critical=True)
+    assert not q.put(0)
+    q = EventRingQueue(capacity=2)
+    q.put("takeoff", critical=True)
+    q.put("land", critical=True)
+    assert not q.put(0)
+    assert q.pop_batch() == ["takeoff", "land"]
+
+
+def test_block_timeout_evicts_non_critical_only():
+    q = EventRingQueue(capacity=3, block_timeout=0.01)
+    q.put("takeoff", critical=True)
+    q.put(0)
+    q.put(1)
+    assert q.put("land", OVERFLOW_BLOCK, critical=True)
+    assert q.pop_batch() == ["takeoff", 1, "land"]
+
+
+def _events(path, storage):
+    if storage == STORAGE_JSON:
+        with open(path) as f:
+            return json.load(f)["events"]
+    from flightlog import iter_log_events
+    return list(iter_log_events(path))
+
+
+def test_critical_event_written_behind_full_queue(tmp_path):
+    for storage in (STORAGE_JSON, STORAGE_JSONL):
+        path = str(tmp_path / "log_{}.json".format(storage))
+        log = DroneActionLogger(path, storage=storage, queue_capacity=8)
+        log.set_event_filter("control_commands", True, 0)
+        log.stop_writer()  # plus de consommateur: la file se remplit derrière le takeoff
+        log.log_event("takeoff", {"message": "x"})
+        for i in range(100):
+            log.log_event("control_commands", {"i": i})
+        assert log.queue.stats()["dropped_oldest"] > 0
+        log.close()
+        types = [e["event_type"] for e in _events(path, storage)]
+        assert types[0] == "takeoff" and types.count("takeoff") == 1, storage
+        assert len(types) == 8
+
+
+def test_segments_respect_max_bytes_within_a_batch(tmp_path):
+    from flight_logger import JsonlSegmentStore
+    store = JsonlSegmentStore(str(tmp_path / "log.json"), max_segment_bytes=1000)
+    batch = [{"elapsed_time": i * 0.01, "sim_time": i * 0.01, "event_type": "imu_data", "data": {"i": i}}
+             for i in range(256)]
+    store.append(batch)
+    store.append(batch[:10])
+    store.close()
+    segments = store.snapshot()["segments"]
+    assert len(segments) > 1
+    assert all(seg["bytes"] <= 1000 for seg in segments)
+    assert sum(seg["events"] for seg in segments) == 266
+    for seg in segments:
+        path = tmp_path / seg["file"]
+        assert path.stat().st_size == seg["bytes"]
+        assert len(path.read_text().splitlines()) == seg["events"]
+
+
+def test_oversized_event_gets_its_own_segment(tmp_path):
+    from flight_logger import JsonlSegmentStore
+    store = JsonlSegmentStore(str(tmp_path / "log.json"), max_segment_bytes=100)
+    small = {"elapsed_time": 0.0, "sim_time": 0.0, "event_type": "a", "data": {}}
+    big = {"elapsed_time": 0.1, "sim_time": 0.1, "event_type": "b", "data": {"x": "y" * 200}}
+    store.append([small, big, small])
+    store.close()
+    assert [seg["events"] for seg in store.snapshot()["segments"]] == [1, 1, 1]